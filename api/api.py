@@ -0,0 +1,250 @@
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config.config import API_CACHE_SIZE, API_CONNECTIONS, API_PORT, ensure_directories_exist, setup_logging
+from database.database import (SEARCH_FILTERS, SEARCH_MAX_PER_PAGE, SEARCH_RANGE_FILTERS, connect_readonly, create_table,
+                               job_counts, list_changes, recent_jobs, search_jobs)
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = metrics.counter('api_requests_total', 'Query API requests, by endpoint and status')
+CACHE_HITS = metrics.counter('api_cache_hits_total', 'Query API responses served from the in-memory cache, by endpoint')
+QUERY_SECONDS = metrics.histogram('api_query_seconds', 'Time to answer a query API request from the database, by endpoint')
+
+# One entity tag in an If-None-Match list: "abc", W/"abc" or *
+ETAG_PATTERN = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+class BadRequest(ValueError):
+    pass
+
+def _int(params, name, default, low=None, high=None):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+    if low is not None:
+        value = max(value, low)
+    if high is not None:
+        value = min(value, high)
+    return value
+
+def etag_matches(if_none_match, etag):
+    """True when an If-None-Match header lists etag (or is *). Weak tags match too, as the header compares weakly."""
+    for tag in ETAG_PATTERN.findall(if_none_match or ''):
+        if tag == '*' or (tag[2:] if tag.startswith('W/') else tag) == etag:
+            return True
+    return False
+
+def _check_params(params, allowed):
+    unknown = set(params) - set(allowed)
+    if unknown:
+        raise BadRequest(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+def recent(conn, params):
+    """GET /jobs?limit=&before=: newest jobs first; pass next_cursor back as before for the next page."""
+    _check_params(params, ('limit', 'before'))
+    limit = _int(params, 'limit', 20, 1, SEARCH_MAX_PER_PAGE)
+    jobs = recent_jobs(limit, _int(params, 'before', None), conn=conn)
+    return {'results': jobs, 'next_cursor': jobs[-1]['id'] if len(jobs) == limit else None}
+
+def search(conn, params):
+    """GET /jobs/search?q=&location=&company=&category=&min_salary=&max_salary=&listed_since=&page=&per_page="""
+    filters = tuple(SEARCH_FILTERS) + tuple(SEARCH_RANGE_FILTERS)
+    _check_params(params, ('q', 'page', 'per_page') + filters)
+    values = {name: params[name] for name in filters if name in params}
+    for name in ('min_salary', 'max_salary'):
+        if name in values:
+            try:
+                values[name] = float(values[name])
+            except ValueError:
+                raise BadRequest(f"{name} must be a number") from None
+    return search_jobs(params.get('q'), page=_int(params, 'page', 1, 1),
+                       per_page=_int(params, 'per_page', 20, 1, SEARCH_MAX_PER_PAGE), conn=conn, **values)
+
+def counts(conn, params):
+    """GET /jobs/counts: totals, open and expired jobs, top categories and the last change id."""
+    _check_params(params, ())
+    return job_counts(conn=conn)
+
+def changes(conn, params):
+    """GET /changes?after=&limit=&uniqueId=: the change log after a cursor; poll again with next_cursor."""
+    _check_params(params, ('after', 'limit', 'uniqueId'))
+    after = _int(params, 'after', 0, 0)
+    entries = list_changes(after, _int(params, 'limit', 100, 1, SEARCH_MAX_PER_PAGE), params.get('uniqueId'), conn=conn)
+    return {'results': entries, 'next_cursor': entries[-1]['id'] if entries else after}
+
+ENDPOINTS = {'/jobs': recent, '/jobs/search': search, '/jobs/counts': counts, '/changes': changes}
+
+class QueryApi:
+    """Answer the read-only endpoints from a small pool of read-only connections.
+
+    Responses are kept in an LRU cache keyed by path and parameters, and
+    served with an ETag (a hash of the body) so clients can revalidate. Before
+    each request the cache checks PRAGMA data_version, which changes whenever
+    any other connection commits: the worker in this process or another one.
+    The first request after new jobs are stored runs against the database
+    again, and until then hot queries never touch it.
+    """
+
+    def __init__(self, cache_size=API_CACHE_SIZE, connections=API_CONNECTIONS):
+        self.cache_size = cache_size
+        self.max_connections = connections
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._pool_lock = threading.Lock()
+        self._watch = None
+        self._data_version = None
+        self._watch_lock = threading.Lock()
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = self._opened < self.max_connections
+                if create:
+                    self._opened += 1
+            if not create:
+                conn = self._idle.get()
+            else:
+                try:
+                    conn = connect_readonly()
+                except Exception:
+                    # The slot was never filled; give it back or waiting requests would block forever
+                    with self._pool_lock:
+                        self._opened -= 1
+                    raise
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def data_version(self):
+        """Check the database for commits since the last call, emptying the cache if there were any."""
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = connect_readonly()
+            version = self._watch.execute('PRAGMA data_version').fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                self.invalidate()
+            return version
+
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def get(self, path, params):
+        """Answer GET path?params: (status, JSON body bytes, ETag or None)."""
+        endpoint = ENDPOINTS.get(path)
+        if endpoint is None:
+            return 404, self._error(f"Unknown endpoint {path}; try {', '.join(ENDPOINTS)}"), None
+        try:
+            return self._answer(path, endpoint, params)
+        except ValueError as e:
+            return 400, self._error(str(e)), None
+        except sqlite3.Error as e:
+            # e.g. the database is missing, locked past busy_timeout, or not yet migrated
+            logger.error("Query API could not read the database for %s: %s", path, e)
+            return 503, self._error(f"Database unavailable: {e}"), None
+
+    def _answer(self, path, endpoint, params):
+        key = (path, tuple(sorted(params.items())))
+        version = self.data_version()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+        if cached is not None:
+            CACHE_HITS.inc(endpoint=path)
+            return (200,) + cached
+
+        with QUERY_SECONDS.time(endpoint=path), self._connection() as conn:
+            result = endpoint(conn, params)
+        body = json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = f'"{sha256(body).hexdigest()[:16]}"'
+        # A commit that landed while the query ran may not be in the result; don't keep it
+        if self.data_version() == version:
+            with self._cache_lock:
+                self._cache[key] = (body, etag)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return 200, body, etag
+
+    @staticmethod
+    def _error(message):
+        return json.dumps({'error': message}).encode('utf-8')
+
+    def close(self):
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+class ApiHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        status, body, etag = self.server.api.get(path, params)
+        REQUESTS.inc(endpoint=path if path in ENDPOINTS else 'other', status=status)
+
+        if etag and etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve_api(port, host='127.0.0.1', api=None):
+    """Serve the query API at http://host:port/ from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.api = api or QueryApi()
+    threading.Thread(target=server.serve_forever, name='api', daemon=True).start()
+    logger.info("Serving the query API on http://%s:%s/", host, server.server_address[1])
+    return server
+
+if __name__ == "__main__":
+    # Standalone, next to a worker running elsewhere (e.g. the GitHub Action) on the same data/jobs.db
+    ensure_directories_exist()
+    setup_logging()
+    create_table()
+    server = serve_api(API_PORT)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        server.api.close()
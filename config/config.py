@@ -3,16 +3,110 @@ import os
 
 # Toggle to enable or disable robots.txt check
 CHECK_ROBOTS = False
+ROBOTS_TTL = 24 * 60 * 60 # Seconds a host's robots.txt is trusted before it is fetched again
+ROBOTS_ERROR_TTL = 10 * 60 # Shorter retry when robots.txt could not be fetched (network error or 5xx)
 
 # Scraper configuration
-URL_TO_SCRAPE = "https://my.jobstreet.com/engineering-intern-jobs/in-Kuala-Lumpur" # Separate words with hyphen symbol (-)
-BASE_URL = "/".join(URL_TO_SCRAPE.split("/")[:3]) # A Funny way to extract the base URL =P
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:95.0) Gecko/20100101 Firefox/95.0"
+USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 18_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.5 Mobile/15E148 Safari/604.1"
+SESSION_USER_AGENTS = [
+    USER_AGENT,
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.5 Safari/605.1.15",
+] # The n-th cookie in JOBSTREET_COOKIES is always sent with the n-th user agent (wrapping around)
+SESSION_COOKIE_FILE = "data/sessions.json" # Cookies refreshed by the site and retired sessions, kept between runs
+SESSION_RETIRE_TTL = 6 * 60 * 60 # Seconds a session that hit a captcha sits out before it is tried again
+SITES = ["jobstreet-my"] # Sites a keyword search fans out to by default (registered in scraper/sites.py: jobstreet-my, jobstreet-sg, jobstreet-id)
+
+# Crawl configuration
+CRAWL_MAX_PAGES = 5 # Result pages to follow per seed URL
+CRAWL_MAX_WORKERS = 8 # Fetch threads shared by all seeds
+CRAWL_HOST_CONCURRENCY = 4 # Max in-flight requests per host
+HOST_RATE = 2.0 # Starting requests/second per host; adapts between HOST_RATE_MIN and HOST_RATE_MAX
+HOST_RATE_MIN = 0.1
+HOST_RATE_MAX = 10.0
+HOST_RATE_INCREASE = 0.1 # Added to a host's rate per good response
+HOST_RATE_DECREASE = 0.5 # Multiplies a host's rate on a 403/429/challenge page
+HOST_BURST = 4 # Requests a host may get back to back before the rate applies
+BREAKER_THRESHOLD = 3 # Blocks in a row that pause a host
+BREAKER_COOLDOWN = 15 * 60 # Seconds a paused host is left alone before one probe request
+BREAKER_MAX_COOLDOWN = 4 * 60 * 60 # The cooldown doubles each time a probe is blocked, up to this
+REQUEST_TIMEOUT = 10 # Seconds
+STOP_WHEN_SEEN = True # Stop paginating a search once a whole page is already in the database
+EXPIRE_AFTER_CYCLES = 3 # Complete runs of a search in a row that must miss a job before it is marked expired
+
+# Crawl frontier (threaded mode): a named search's pages are queued in data/jobs.db, so an interrupted run
+# resumes where it stopped and several worker processes running the same search share its pages
+FRONTIER_ENABLED = True
+FRONTIER_LEASE_SECONDS = 5 * 60 # A claimed page not finished within this is handed to another worker
+FRONTIER_MAX_ATTEMPTS = 3 # Fetches of a page (blocked, 5xx, network error) before it is dropped
+FRONTIER_RETRY_DELAY = 30 # Seconds before a failed page is retried, doubling each attempt
+
+# HTTP cache configuration
+HTTP_CACHE_DIR = "data/http_cache" # ETag/Last-Modified validators and parse results per page
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024 # Least recently used pages are evicted past this size
+DEBUG_DUMP_HTML = False # Save every page fetched by scraper.fetch_data to debug_page.html
+
+# Detail page enrichment
+DETAIL_ENRICHMENT = True # After new jobs are announced, fetch their detail pages in the background for the description, category and posting date
+DETAIL_MAX_WORKERS = 4 # Detail fetch threads; requests still go through the per-host rate limit shared with the crawl
+DETAIL_HOST_BUDGET = 50 # Detail pages fetched per host per batch of new jobs; the rest stay unenriched
+DETAIL_CACHE_DIR = "data/detail_cache" # Validators and parse results per detail page
+DETAIL_CACHE_TTL = 7 * 24 * 60 * 60 # Seconds a detail page is reused without asking the site again
+DETAIL_PAGE_DIR = "data/detail_pages" # Fetched detail pages, gzip'd, stored once per distinct content
+
+# Known job ids index
+KNOWN_IDS_MODE = "bloom" # "bloom" is compact and confirmed against the database, "set" is exact but holds every id in memory
+KNOWN_IDS_ERROR_RATE = 0.001 # Bloom filter false-positive rate
+NEAR_DUP_DETECTION = True # Link reposts (small title edits, reordered locations) to the first copy and don't announce them
+NEAR_DUP_THRESHOLD = 0.7 # Estimated Jaccard similarity of title/location shingles, same company only
+NEAR_DUP_PERMUTATIONS = 64 # MinHash signature length
+NEAR_DUP_BANDS = 16 # LSH bands; more bands find lower-similarity candidates
+
+# Parser configuration
+PARSER_ENGINE = "auto" # "auto" picks the fastest installed: selectolax, lxml, then the stdlib "stream" engine ("bs4" is the slow reference)
+
+APP_STATE_EXTRACTION = True # Read jobs from the page's embedded JSON when present, falling back to the job cards
+
+# Scheduler configuration (python job_scraper_main.py runs each search on its own interval)
+# A search crawls its "keywords" (narrowed to "location") on every site in "sites" (default SITES) in
+# parallel, plus any seed pages listed in "urls". Result pagination is followed automatically.
+SEARCHES = [
+    {
+        "name": "electrical-engineering-intern-kl",
+        "keywords": "electrical engineering intern",
+        "location": "Kuala Lumpur",
+        "interval": 6 * 60 * 60, # Seconds between runs
+        "jitter": 10 * 60, # Up to this many extra seconds, so runs don't look robotic
+    },
+]
+SCHEDULER_WORKERS = 2 # Searches allowed to run at the same time
+
+# Pipeline configuration
+PIPELINE_MODE = "threaded" # "threaded" runs the crawl then the sinks, "asyncio" overlaps fetch, parse and persist
+PIPELINE_QUEUE_SIZE = 16 # Pages buffered between asyncio pipeline stages
+PIPELINE_PARSE_WORKERS = 2 # Parser processes used by the asyncio pipeline
+
+# Subscriptions
+SUBSCRIPTIONS_FILE = "data/subscriptions.json" # Saved filters, e.g. [{"id": "ee-kl", "subscriber": "ali", "keywords": "electrical engineer", "location": "Kuala Lumpur", "min_salary": 3000, "webhook": "https://discord.com/api/webhooks/..."}]; reloaded when it changes
+
+# Discord notifier
+DISCORD_MAX_RETRIES = 5 # Attempts per message before it is queued for the next run
+DISCORD_QUEUE_FILE = "data/discord_queue.jsonl" # Undelivered messages, retried before the next report
+
+# Metrics
+METRICS_ENABLED = True # Record fetch/parse/DB/sink timings and counts; False turns every metric call into a no-op
+METRICS_PORT = 9108 # job_scraper_main.py serves them at http://127.0.0.1:9108/metrics (None to disable)
+
+# Query API (read-only JSON over data/jobs.db, for the Telegram bot and other readers)
+API_PORT = 9109 # job_scraper_main.py serves it at http://127.0.0.1:9109/ (None to disable); python -m api.api runs it alone
+API_CACHE_SIZE = 256 # Responses kept in memory until the database changes
+API_CONNECTIONS = 4 # Read-only connections shared by request threads
 
 # File configuration
 LOG_FILE = "logs/scraper.log"
 DATABASE_FILE = "data/jobs.db"
 CSV_FILE = "data/job_listings.csv"
+ARCHIVE_DIR = "data/archive" # Monthly gzip'd JSON Lines history with a batch index per month
 
 # Logging setup
 def setup_logging():
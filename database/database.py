@@ -1,12 +1,191 @@
+import re
 import sqlite3
-from config.config import DATABASE_FILE
+import threading
+from datetime import datetime, timezone
+from hashlib import sha256
+from pathlib import Path
+from config.config import DATABASE_FILE, EXPIRE_AFTER_CYCLES
+from database.normalize import normalize_jobs
+from metrics import metrics
+from records.records import JobRecord, values_getter
 import logging
 
 logger = logging.getLogger(__name__)
 
+INSERT_SECONDS = metrics.histogram('db_insert_seconds', 'Time to store one batch of jobs in a single transaction')
+JOBS_STORED = metrics.counter('db_jobs_total', 'Jobs offered to the database, by outcome (new, duplicate)')
+DB_ERRORS = metrics.counter('db_errors_total', 'Database errors, by operation')
+
+# Applied once to every pooled connection. WAL lets readers work alongside the
+# writer, and synchronous=NORMAL only fsyncs at checkpoints instead of per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+# Read-only connections can't change the journal mode; query_only makes a stray write fail loudly
+READ_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+
+# Secondary indexes for the filters and facets search_jobs offers
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_jobs_location ON jobs (jobLocation)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_company ON jobs (jobCompany)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_listing_date ON jobs (jobListingDate)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_salary_min ON jobs (salary_min)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_salary_max ON jobs (salary_max)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_listed_at ON jobs (listed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_seen_by ON jobs (seen_by, last_seen)",
+    "CREATE INDEX IF NOT EXISTS idx_job_changes_job ON job_changes (uniqueId)",
+)
+
+# Typed columns parsed from jobSalary/jobListingDate by database.normalize
+NORMALIZED_COLUMNS = (
+    ('salary_min', 'REAL'),
+    ('salary_max', 'REAL'),
+    ('salary_period', 'TEXT'),
+    ('currency', 'TEXT'),
+    ('listed_at', 'TEXT'),
+)
+# Change tracking: a content fingerprint, when and by which search a job was last seen,
+# and how many runs of that search in a row have missed it
+TRACKING_COLUMNS = (
+    ('fingerprint', 'TEXT'),
+    ('first_seen', 'TEXT'),
+    ('last_seen', 'TEXT'),
+    ('seen_by', 'TEXT'),
+    ('missed_cycles', 'INTEGER NOT NULL DEFAULT 0'),
+    ('expired_at', 'TEXT'),
+)
+# Filled from each new job's detail page by scraper.details.Enricher
+ENRICHMENT_COLUMNS = (
+    ('jobDescription', 'TEXT'),
+    ('enriched_at', 'TEXT'),
+)
+# The job fields insert_job(s) stores, in _job_params order
+JOB_PARAM_FIELDS = ('uniqueId', 'jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'jobCategory', 'jobSubCategory',
+                    'jobListingDate', 'jobURL')
+_job_param_values = values_getter(JOB_PARAM_FIELDS)
+# Columns whose changes are logged. The listing date is left out: on job cards it is relative
+# ("3d ago") and would change every day.
+TRACKED_COLUMNS = ('jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'jobCategory', 'jobSubCategory', 'jobURL')
+SCHEMA_VERSION = 3
+
+# Columns in the full-text index and their bm25 weights (title matches rank highest)
+FTS_COLUMNS = ('jobTitle', 'jobCompany', 'jobLocation', 'jobCategory', 'jobSubCategory')
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 1.0)
+
+_FTS_VALUES = ', '.join(FTS_COLUMNS)
+FTS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts (rowid, {_FTS_VALUES}) VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+        INSERT INTO jobs_fts (jobs_fts, rowid, {_FTS_VALUES}) VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)});
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF {_FTS_VALUES} ON jobs BEGIN
+        INSERT INTO jobs_fts (jobs_fts, rowid, {_FTS_VALUES}) VALUES ('delete', old.id, {', '.join('old.' + c for c in FTS_COLUMNS)});
+        INSERT INTO jobs_fts (rowid, {_FTS_VALUES}) VALUES (new.id, {', '.join('new.' + c for c in FTS_COLUMNS)});
+    END''',
+)
+
+# Filters search_jobs accepts, mapped to their columns, and the default facets
+SEARCH_FILTERS = {'location': 'jobLocation', 'company': 'jobCompany', 'category': 'jobCategory'}
+SEARCH_RANGE_FILTERS = {
+    'min_salary': ('salary_max', '>='),
+    'max_salary': ('salary_min', '<='),
+    'listed_since': ('listed_at', '>='),
+}
+SEARCH_FACETS = ('jobLocation', 'jobCompany', 'jobCategory')
+SEARCH_MAX_PER_PAGE = 100
+RESULT_COLUMNS = ('uniqueId', 'jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'jobCategory',
+                  'jobSubCategory', 'jobListingDate', 'jobURL', 'salary_min', 'salary_max',
+                  'salary_period', 'currency', 'listed_at', 'first_seen', 'last_seen', 'expired_at')
+CHANGE_COLUMNS = ('id', 'uniqueId', 'changed_at', 'kind', 'field', 'old_value', 'new_value')
+
+_local = threading.local()
+_pool = {}
+_pool_lock = threading.Lock()
+_generation = 0
+
 def connect_db():
-    """Establish a connection to the SQLite database."""
-    return sqlite3.connect(DATABASE_FILE)
+    """Return the calling thread's long-lived connection to the SQLite database."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == DATABASE_FILE and _local.generation == _generation:
+        return conn
+
+    conn = sqlite3.connect(DATABASE_FILE, timeout=30, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+
+    _local.conn = conn
+    _local.path = DATABASE_FILE
+    _local.generation = _generation
+    with _pool_lock:
+        stale = _pool.get(threading.get_ident())
+        _pool[threading.get_ident()] = conn
+    if stale is not None:
+        stale.close()
+    logger.debug("Opened pooled database connection to %s", DATABASE_FILE)
+    return conn
+
+def connect_readonly():
+    """Open a new read-only connection to the database, owned by the caller.
+
+    In WAL mode its reads never block the writer or wait for it. The
+    database must already exist (create_table()).
+    """
+    uri = Path(DATABASE_FILE).absolute().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def close_connections():
+    """Close every pooled connection, e.g. at shutdown or when switching databases."""
+    global _generation
+    with _pool_lock:
+        connections = list(_pool.values())
+        _pool.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Error closing database connection: %s", e)
+
+def utc_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def fingerprint(job):
+    """Hash of a job's TRACKED_COLUMNS, to spot a stored job whose content changed."""
+    raw = '\x1f'.join(job.get(column) or '' for column in TRACKED_COLUMNS)
+    return sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+def _job_params(job):
+    """Build the INSERT parameter tuple for a job record."""
+    if isinstance(job, JobRecord):
+        params = _job_param_values(job)
+        if params[0] is None:
+            raise KeyError('uniqueId')
+        return params
+    return (
+        job['uniqueId'],
+        job.get('jobTitle'),
+        job.get('jobCompany'),
+        job.get('jobLocation'),
+        job.get('jobSalary'),
+        job.get('jobCategory'),
+        job.get('jobSubCategory'),
+        job.get('jobListingDate'),
+        job.get('jobURL')
+    )
 
 def create_table():
     """Create the jobs table if it does not exist."""
@@ -24,67 +203,462 @@ def create_table():
                 jobCategory TEXT,
                 jobSubCategory TEXT,
                 jobListingDate TEXT,
-                jobURL TEXT
+                jobURL TEXT,
+                salary_min REAL,
+                salary_max REAL,
+                salary_period TEXT,
+                currency TEXT,
+                listed_at TEXT,
+                fingerprint TEXT,
+                first_seen TEXT,
+                last_seen TEXT,
+                seen_by TEXT,
+                missed_cycles INTEGER NOT NULL DEFAULT 0,
+                expired_at TEXT,
+                jobDescription TEXT,
+                enriched_at TEXT
+            )
+        ''')
+        # Compact change log: one row per new job, per changed field, per expiry or reopening
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS job_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uniqueId TEXT NOT NULL,
+                changed_at TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                field TEXT,
+                old_value TEXT,
+                new_value TEXT
             )
         ''')
         conn.commit()
+        migrate(conn)
+        for statement in INDEXES:
+            cursor.execute(statement)
+        conn.commit()
+        create_search_index(conn)
         logger.info("Jobs table created or already exists.")
     except sqlite3.Error as e:
         logger.error("Error creating jobs table: %s", e)
-    finally:
-        conn.close()
+
+def migrate(conn):
+    """Bring a jobs table created by an older version up to SCHEMA_VERSION.
+
+    Version 1 adds the normalized salary/listing-date columns and fills them
+    for the rows already stored. Version 2 adds the change-tracking columns;
+    rows stored before it count as first and last seen at the migration.
+    Version 3 adds the detail-page columns, left empty for existing rows.
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+    with conn:
+        for column, column_type in NORMALIZED_COLUMNS + TRACKING_COLUMNS + ENRICHMENT_COLUMNS:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+    backfilled = backfill_normalized(conn) if version < 1 else 0
+    if version < 2:
+        with conn:
+            now = utc_now()
+            conn.execute('UPDATE jobs SET first_seen = ?, last_seen = ? WHERE first_seen IS NULL', (now, now))
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    logger.info("Migrated jobs table to schema version %s (%s rows normalized).", SCHEMA_VERSION, backfilled)
+
+def backfill_normalized(conn, batch_size=5000, now=None):
+    """Fill the normalized columns of every stored job, a batch per transaction.
+
+    Relative listing dates ("3d ago") were stored without the time they were
+    scraped, so they resolve against now; already absolute dates are exact.
+    """
+    now = now or datetime.now(timezone.utc)
+    total, last_id = 0, 0
+    assignments = ', '.join(f'{column} = ?' for column, _ in NORMALIZED_COLUMNS)
+    while True:
+        rows = conn.execute(
+            'SELECT id, jobSalary, jobListingDate FROM jobs WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            return total
+        jobs = [{'jobSalary': salary, 'jobListingDate': listing_date} for _, salary, listing_date in rows]
+        with conn:
+            conn.executemany(
+                f'UPDATE jobs SET {assignments} WHERE id = ?',
+                [values + (row[0],) for values, row in zip(normalize_jobs(jobs, now), rows)],
+            )
+        total += len(rows)
+        last_id = rows[-1][0]
+
+def create_search_index(conn):
+    """Create the FTS5 index over jobs and the triggers that keep it in sync."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'jobs_fts'").fetchone()
+    try:
+        with conn:
+            conn.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+                    {', '.join(FTS_COLUMNS)},
+                    content='jobs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+            for statement in FTS_TRIGGERS:
+                conn.execute(statement)
+            if not exists:
+                # Index the rows stored before the FTS table existed
+                conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search_jobs falls back to LIKE
+        logger.warning("Full-text search unavailable: %s", e)
+
+def _has_search_index(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'jobs_fts'").fetchone() is not None
 
 def insert_job(job):
     """Insert a job into the database if it does not already exist."""
+    conn = connect_db()
     try:
-        conn = connect_db()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO jobs (
-                uniqueId, jobTitle, jobCompany, jobLocation, 
-                jobSalary, jobCategory, jobSubCategory, 
+                uniqueId, jobTitle, jobCompany, jobLocation,
+                jobSalary, jobCategory, jobSubCategory,
                 jobListingDate, jobURL
             )
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            job['uniqueId'],
-            job.get('jobTitle'),
-            job.get('jobCompany'),
-            job.get('jobLocation'),
-            job.get('jobSalary'),
-            job.get('jobCategory'),
-            job.get('jobSubCategory'),
-            job.get('jobListingDate'),
-            job.get('jobURL')
-        ))
+        ''', _job_params(job))
+        now = utc_now()
+        cursor.execute(
+            f"UPDATE jobs SET {', '.join(f'{column} = ?' for column, _ in NORMALIZED_COLUMNS)}, "
+            "fingerprint = ?, first_seen = ?, last_seen = ? WHERE uniqueId = ?",
+            normalize_jobs([job])[0] + (fingerprint(job), now, now, job['uniqueId']),
+        )
         conn.commit()
+        JOBS_STORED.inc(outcome='new')
         logger.info("Job inserted into the database: %s", job['jobTitle'])
     except sqlite3.IntegrityError:
+        conn.rollback()
+        JOBS_STORED.inc(outcome='duplicate')
         logger.warning("Job already exists in the database: %s", job['uniqueId'])
     except sqlite3.Error as e:
+        conn.rollback()
+        DB_ERRORS.inc(operation='insert_job')
         logger.error("Error inserting job into the database: %s", e)
-    finally:
-        conn.close()
+
+_CONTENT_COLUMNS = ('jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'jobCategory', 'jobSubCategory',
+                    'jobListingDate', 'jobURL') + tuple(column for column, _ in NORMALIZED_COLUMNS)
+_STAGED_COLUMNS = ('uniqueId',) + _CONTENT_COLUMNS + ('fingerprint', 'position')
+
+# insert_jobs runs each of these once per batch, over every staged job at once
+_LOG_NEW = '''
+    INSERT INTO job_changes (uniqueId, changed_at, kind)
+    SELECT uniqueId, :now, 'new' FROM staged_jobs
+    WHERE uniqueId NOT IN (SELECT uniqueId FROM jobs) ORDER BY position
+'''
+# A field the crawl didn't provide (NULL, e.g. the category on a job card) is never a change
+# and keeps the stored value, such as one filled in from the detail page
+_LOG_UPDATES = 'INSERT INTO job_changes (uniqueId, changed_at, kind, field, old_value, new_value)' + ' UNION ALL'.join(
+    f'''
+    SELECT s.uniqueId, :now, 'updated', '{column}', j.{column}, s.{column}
+    FROM staged_jobs s JOIN jobs j ON j.uniqueId = s.uniqueId
+    WHERE j.fingerprint IS NOT s.fingerprint AND s.{column} IS NOT NULL AND j.{column} IS NOT s.{column}'''
+    for column in TRACKED_COLUMNS
+)
+_LOG_REOPENED = '''
+    INSERT INTO job_changes (uniqueId, changed_at, kind)
+    SELECT s.uniqueId, :now, 'reopened'
+    FROM staged_jobs s JOIN jobs j ON j.uniqueId = s.uniqueId WHERE j.expired_at IS NOT NULL
+'''
+# How a changed job's staged values merge into its row. Like _LOG_UPDATES, a field the crawl didn't
+# provide keeps the stored value. The parsed salary columns follow jobSalary, so they always describe
+# the text that is kept, and a posting date read from the detail page outranks the card's estimate.
+_SALARY_COLUMNS = ('salary_min', 'salary_max', 'salary_period', 'currency')
+_MERGED_CONTENT = {
+    column: (f'CASE WHEN s.jobSalary IS NULL THEN jobs.{column} ELSE s.{column} END' if column in _SALARY_COLUMNS
+             else 'CASE WHEN jobs.enriched_at IS NULL THEN COALESCE(s.listed_at, jobs.listed_at) ELSE jobs.listed_at END'
+             if column == 'listed_at' else f'COALESCE(s.{column}, jobs.{column})')
+    for column in _CONTENT_COLUMNS
+}
+_UPDATE_CONTENT = f'''
+    UPDATE jobs SET ({', '.join(_CONTENT_COLUMNS)}, fingerprint) =
+        (SELECT {', '.join(_MERGED_CONTENT.values())}, s.fingerprint
+         FROM staged_jobs s WHERE s.uniqueId = jobs.uniqueId)
+    WHERE uniqueId IN (SELECT s.uniqueId FROM staged_jobs s JOIN jobs j ON j.uniqueId = s.uniqueId
+                       WHERE j.fingerprint IS NOT s.fingerprint)
+'''
+_MARK_SEEN = '''
+    UPDATE jobs SET last_seen = :now, seen_by = COALESCE(:search, seen_by), missed_cycles = 0, expired_at = NULL
+    WHERE uniqueId IN (SELECT uniqueId FROM staged_jobs)
+'''
+_INSERT_NEW = f'''
+    INSERT INTO jobs (uniqueId, {', '.join(_CONTENT_COLUMNS)}, fingerprint, first_seen, last_seen, seen_by)
+    SELECT uniqueId, {', '.join(_CONTENT_COLUMNS)}, fingerprint, :now, :now, :search FROM staged_jobs
+    WHERE uniqueId NOT IN (SELECT uniqueId FROM jobs) ORDER BY position
+'''
+
+def insert_jobs(jobs, search=None, now=None):
+    """Store a batch of crawled jobs in a single transaction and return the uniqueIds that were new.
+
+    Jobs already stored are compared by fingerprint: each changed field is
+    written to job_changes and the row takes the fresh values. Every job in
+    the batch is marked last seen now (by search), and an expired job seen
+    again is reopened. The batch is staged in a temporary table and merged
+    with set-based statements.
+    """
+    if not jobs:
+        return []
+
+    conn = connect_db()
+    params = {'now': now or utc_now(), 'search': search}
+    try:
+        with INSERT_SECONDS.time(), conn:
+            conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS staged_jobs (uniqueId TEXT PRIMARY KEY, "
+                         f"{', '.join(_STAGED_COLUMNS[1:])})")
+            conn.execute('DELETE FROM staged_jobs')
+            # A job listed twice in the batch keeps its first copy
+            conn.executemany(
+                f"INSERT OR IGNORE INTO staged_jobs ({', '.join(_STAGED_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_STAGED_COLUMNS))})",
+                [_job_params(job) + normalized + (fingerprint(job), position)
+                 for position, (job, normalized) in enumerate(zip(jobs, normalize_jobs(jobs)))],
+            )
+            new_ids = [row[0] for row in conn.execute(
+                'SELECT uniqueId FROM staged_jobs WHERE uniqueId NOT IN (SELECT uniqueId FROM jobs) ORDER BY position')]
+            for statement in (_LOG_NEW, _LOG_UPDATES, _LOG_REOPENED, _UPDATE_CONTENT, _MARK_SEEN, _INSERT_NEW):
+                conn.execute(statement, params)
+            conn.execute('DELETE FROM staged_jobs')
+    except sqlite3.Error as e:
+        DB_ERRORS.inc(operation='insert_jobs')
+        logger.error("Error inserting job batch into the database: %s", e)
+        return []
+
+    JOBS_STORED.inc(len(new_ids), outcome='new')
+    JOBS_STORED.inc(len(jobs) - len(new_ids), outcome='duplicate')
+    logger.info("Inserted %s new jobs (%s already known).", len(new_ids), len(jobs) - len(new_ids))
+    return new_ids
+
+def expire_unseen(search, since, after_cycles=EXPIRE_AFTER_CYCLES, now=None):
+    """Count a missed run against each open job search last saw before since, and expire
+    the ones missed after_cycles runs in a row. Returns the uniqueIds expired now.
+
+    Call it once after a complete run of search that started at since; the
+    jobs that run found again have last_seen >= since.
+    """
+    conn = connect_db()
+    params = {'search': search, 'since': since, 'now': now or utc_now(), 'after': after_cycles}
+    stale = 'seen_by = :search AND expired_at IS NULL AND missed_cycles >= :after'
+    try:
+        with conn:
+            conn.execute('UPDATE jobs SET missed_cycles = missed_cycles + 1 '
+                         'WHERE seen_by = :search AND expired_at IS NULL AND last_seen < :since', params)
+            expired = [row[0] for row in conn.execute(f'SELECT uniqueId FROM jobs WHERE {stale}', params)]
+            conn.execute("INSERT INTO job_changes (uniqueId, changed_at, kind) "
+                         f"SELECT uniqueId, :now, 'expired' FROM jobs WHERE {stale}", params)
+            conn.execute(f'UPDATE jobs SET expired_at = :now WHERE {stale}', params)
+    except sqlite3.Error as e:
+        DB_ERRORS.inc(operation='expire_unseen')
+        logger.error("Error expiring unseen jobs: %s", e)
+        return []
+    if expired:
+        logger.info("Expired %s jobs that %s missed %s runs in a row.", len(expired), search, after_cycles)
+    return expired
+
+def list_changes(after_id=0, limit=100, unique_id=None, conn=None):
+    """Read the change log in order, starting after after_id (the last entry a reader has seen)."""
+    sql = f"SELECT {', '.join(CHANGE_COLUMNS)} FROM job_changes WHERE id > ?"
+    params = [after_id]
+    if unique_id is not None:
+        sql += ' AND uniqueId = ?'
+        params.append(unique_id)
+    rows = (conn or connect_db()).execute(sql + ' ORDER BY id LIMIT ?', params + [limit]).fetchall()
+    return [dict(zip(CHANGE_COLUMNS, row)) for row in rows]
+
+def recent_jobs(limit=20, before_id=None, conn=None):
+    """The newest stored jobs, newest first, each with its row id.
+
+    Pages by keyset: pass the last id of a page as before_id for the next
+    one, which stays one index range scan however deep the reader goes.
+    """
+    columns = ', '.join(('id',) + RESULT_COLUMNS)
+    sql, params = f'SELECT {columns} FROM jobs', []
+    if before_id is not None:
+        sql += ' WHERE id < ?'
+        params.append(before_id)
+    rows = (conn or connect_db()).execute(sql + ' ORDER BY id DESC LIMIT ?', params + [limit]).fetchall()
+    return [dict(zip(('id',) + RESULT_COLUMNS, row)) for row in rows]
+
+def job_counts(facet_limit=10, conn=None):
+    """Totals for the stored jobs: all, still open, expired, enriched, the top categories and the last change id."""
+    conn = conn or connect_db()
+    total, open_jobs, enriched = conn.execute(
+        'SELECT COUNT(*), COUNT(*) - COUNT(expired_at), COUNT(enriched_at) FROM jobs').fetchone()
+    categories = conn.execute(
+        'SELECT jobCategory, COUNT(*) FROM jobs WHERE expired_at IS NULL '
+        'GROUP BY jobCategory ORDER BY COUNT(*) DESC, jobCategory LIMIT ?', (facet_limit,)).fetchall()
+    last_change = conn.execute('SELECT MAX(id) FROM job_changes').fetchone()[0]
+    return {
+        'total': total,
+        'open': open_jobs,
+        'expired': total - open_jobs,
+        'enriched': enriched,
+        'categories': categories,
+        'last_change': last_change or 0,
+    }
+
+def jobs_to_enrich(unique_ids):
+    """Return (uniqueId, jobURL) for the given jobs that have a URL and no detail-page data yet."""
+    conn = connect_db()
+    rows = []
+    unique_ids = list(unique_ids)
+    for start in range(0, len(unique_ids), 500):
+        chunk = unique_ids[start:start + 500]
+        rows += conn.execute(
+            f"SELECT uniqueId, jobURL FROM jobs WHERE uniqueId IN ({', '.join('?' * len(chunk))}) "
+            "AND enriched_at IS NULL AND jobURL IS NOT NULL AND jobURL != 'N/A'",
+            chunk,
+        ).fetchall()
+    return rows
+
+def update_enrichment(details, now=None):
+    """Fill the detail-page columns for a batch of jobs in one transaction.
+
+    details maps uniqueId to the dict scraper.details.parse_job_detail
+    returned. Missing values leave the stored ones alone; a posting date
+    replaces the listed_at estimated from the search card.
+    """
+    if not details:
+        return 0
+    now = now or utc_now()
+    conn = connect_db()
+    try:
+        with conn:
+            conn.executemany(
+                """UPDATE jobs SET jobDescription = COALESCE(?, jobDescription), jobCategory = COALESCE(?, jobCategory),
+                                   jobSubCategory = COALESCE(?, jobSubCategory), listed_at = COALESCE(?, listed_at),
+                                   enriched_at = ?
+                   WHERE uniqueId = ?""",
+                [(detail.get('jobDescription'), detail.get('jobCategory'), detail.get('jobSubCategory'),
+                  detail.get('listed_at'), now, unique_id) for unique_id, detail in details.items()],
+            )
+    except sqlite3.Error as e:
+        DB_ERRORS.inc(operation='update_enrichment')
+        logger.error("Error storing job details: %s", e)
+        return 0
+    return len(details)
 
 def job_exists(unique_id):
     """Check if a job with the given unique ID exists in the database."""
     try:
-        conn = connect_db()
-        cursor = conn.cursor()
+        cursor = connect_db().cursor()
         cursor.execute('SELECT 1 FROM jobs WHERE uniqueId = ?', (unique_id,))
-        exists = cursor.fetchone() is not None
-        return exists
+        return cursor.fetchone() is not None
     except sqlite3.Error as e:
         logger.error("Error checking if job exists in the database: %s", e)
         return False
-    finally:
-        conn.close()
-    
+
+def iter_unique_ids(batch_size=5000):
+    """Yield every stored uniqueId, fetching rows in batches to keep memory flat."""
+    cursor = connect_db().cursor()
+    cursor.execute('SELECT uniqueId FROM jobs')
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for (unique_id,) in rows:
+            yield unique_id
+
+def existing_ids(unique_ids, chunk_size=500):
+    """Return the subset of unique_ids already stored, using one query per chunk."""
+    unique_ids = list(unique_ids)
+    found = set()
+    try:
+        cursor = connect_db().cursor()
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT uniqueId FROM jobs WHERE uniqueId IN ({placeholders})', chunk)
+            found.update(row[0] for row in cursor.fetchall())
+    except sqlite3.Error as e:
+        logger.error("Error looking up existing jobs in the database: %s", e)
+    return found
+
 def count_jobs():
     """Return the total count of jobs in the database."""
-    conn = connect_db()
-    cursor = conn.cursor()
+    cursor = connect_db().cursor()
     cursor.execute('SELECT COUNT(*) FROM jobs')
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    return cursor.fetchone()[0]
+
+def fts_query(text):
+    """Turn free text into an FTS5 query that ANDs every word as a prefix match."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text or ''))
+
+def search_jobs(query=None, page=1, per_page=20, facets=SEARCH_FACETS, facet_limit=10, conn=None, **filters):
+    """Search stored jobs, best match first (newest first without a query).
+
+    filters narrow the results by exact value (location=, company=,
+    category=) or by range: min_salary= keeps jobs whose pay can reach it,
+    max_salary= jobs whose pay starts at or below it, and listed_since= (an
+    ISO timestamp) jobs listed at or after it. Returns the total match count, one page of results, and the
+    top facet_limit values with counts for each facet column over all matches.
+    Reads through conn when given (e.g. a read-only connection).
+    """
+    unknown = set(filters) - set(SEARCH_FILTERS) - set(SEARCH_RANGE_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown search filters: {', '.join(sorted(unknown))}")
+    unknown = set(facets) - set(RESULT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown facet columns: {', '.join(sorted(unknown))}")
+
+    conn = conn or connect_db()
+    where, params = [], []
+    match = fts_query(query)
+    use_fts = bool(match) and _has_search_index(conn)
+    if use_fts:
+        where.append('jobs_fts MATCH ?')
+        params.append(match)
+    elif query:
+        like = f'%{query}%'
+        where.append('(jobs.jobTitle LIKE ? OR jobs.jobCompany LIKE ?)')
+        params += [like, like]
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name in SEARCH_RANGE_FILTERS:
+            column, operator = SEARCH_RANGE_FILTERS[name]
+            where.append(f'jobs.{column} {operator} ?')
+        else:
+            where.append(f'jobs.{SEARCH_FILTERS[name]} = ?')
+        params.append(value)
+
+    # CROSS JOIN keeps the FTS match as the outer loop; otherwise the planner may
+    # walk a filter index and re-run the MATCH once per row
+    source = 'jobs_fts CROSS JOIN jobs ON jobs.id = jobs_fts.rowid' if use_fts else 'jobs'
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ''
+    order = f"bm25(jobs_fts, {', '.join(map(str, FTS_WEIGHTS))}), jobs.id DESC" if use_fts else 'jobs.id DESC'
+    page = max(int(page), 1)
+    per_page = min(max(int(per_page), 1), SEARCH_MAX_PER_PAGE)
+    columns = ', '.join(f'jobs.{column}' for column in RESULT_COLUMNS)
+
+    try:
+        total = conn.execute(f'SELECT COUNT(*) FROM {source} {where_sql}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT {columns} FROM {source} {where_sql} ORDER BY {order} LIMIT ? OFFSET ?',
+            params + [per_page, (page - 1) * per_page],
+        ).fetchall()
+        facet_counts = {}
+        for column in facets:
+            facet_counts[column] = conn.execute(
+                f'''SELECT jobs.{column}, COUNT(*) FROM {source} {where_sql}
+                    GROUP BY jobs.{column} ORDER BY COUNT(*) DESC, jobs.{column} LIMIT ?''',
+                params + [facet_limit],
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.error("Error searching jobs: %s", e)
+        return {'total': 0, 'page': page, 'per_page': per_page, 'results': [], 'facets': {}}
+
+    return {
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'results': [dict(zip(RESULT_COLUMNS, row)) for row in rows],
+        'facets': facet_counts,
+    }
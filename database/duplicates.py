@@ -0,0 +1,200 @@
+import logging
+import random
+import re
+import sqlite3
+import struct
+import threading
+import unicodedata
+from hashlib import blake2b
+
+from config.config import NEAR_DUP_BANDS, NEAR_DUP_PERMUTATIONS, NEAR_DUP_THRESHOLD
+from database.database import connect_db
+
+logger = logging.getLogger(__name__)
+
+# Words that carry no meaning in a title, plus company-form suffixes
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'the', 'of', 'for', 'in', 'at', 'to', 'with', 'sdn', 'bhd', 'berhad',
+    'pte', 'ltd', 'plc', 'inc', 'co', 'company', 'corp', 'corporation',
+))
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+_PRIME = (1 << 61) - 1
+
+def normalize_words(text):
+    """Lowercase, strip accents and punctuation, and drop stopwords."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return [word for word in WORD_PATTERN.findall(text) if word not in STOPWORDS]
+
+def group_key(job):
+    """Normalized company and location words, order-insensitive.
+
+    Only postings from the same company in the same place can be
+    near-duplicates; "Kuala Lumpur, Selangor" and "Selangor, Kuala Lumpur"
+    share a key.
+    """
+    company = ' '.join(sorted(set(normalize_words(job.get('jobCompany')))))
+    location = ' '.join(sorted(set(normalize_words(job.get('jobLocation')))))
+    return f"{company}|{location}"
+
+def features(job):
+    """Order-insensitive shingles of a job's title.
+
+    Title words contribute themselves and their character trigrams, so both
+    reordered words and small spelling edits keep most shingles in common.
+    """
+    shingles = set()
+    for word in normalize_words(job.get('jobTitle')):
+        shingles.add('w:' + word)
+        padded = f' {word} '
+        shingles.update('c:' + padded[i:i + 3] for i in range(len(padded) - 2))
+    return shingles
+
+def _hash64(text):
+    return int.from_bytes(blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class NearDuplicates:
+    """MinHash/LSH index linking reposted jobs to the first copy we stored.
+
+    Each job gets a MinHash signature over features(job). Its bands are
+    hashed, together with group_key(job), into LSH buckets stored in SQLite, so
+    finding candidates is one indexed lookup per band, whatever the table
+    size. Candidates whose estimated similarity reaches the threshold are
+    near-duplicates and inherit the canonical uniqueId of the best match.
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, permutations=NEAR_DUP_PERMUTATIONS, bands=NEAR_DUP_BANDS):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.threshold = threshold
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        # Fixed seed: signatures stored in the database must stay comparable across runs
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(permutations)]
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Create the index tables and index any stored jobs that are missing from it."""
+        conn = connect_db()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_minhash (
+                    uniqueId TEXT PRIMARY KEY,
+                    canonicalId TEXT NOT NULL,
+                    signature BLOB NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_lsh_buckets (
+                    bucket INTEGER NOT NULL,
+                    uniqueId TEXT NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_job_lsh_buckets ON job_lsh_buckets (bucket)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_job_minhash_canonical ON job_minhash (canonicalId)')
+        self.backfill()
+        return self
+
+    def signature(self, job):
+        hashes = [_hash64(feature) for feature in features(job)] or [0]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _buckets(self, job, signature):
+        group = group_key(job).encode('utf-8')
+        buckets = []
+        for band in range(self.bands):
+            values = signature[band * self.rows:(band + 1) * self.rows]
+            digest = blake2b(group + struct.pack(f'<I{self.rows}Q', band, *values), digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, 'little', signed=True))
+        return buckets
+
+    def similarity(self, first, second):
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+    def _pack(self, signature):
+        return struct.pack(f'<{self.permutations}Q', *signature)
+
+    def _unpack(self, blob):
+        return struct.unpack(f'<{self.permutations}Q', blob)
+
+    def _best_match(self, cursor, signature, buckets):
+        placeholders = ', '.join('?' * len(buckets))
+        cursor.execute(f'''
+            SELECT m.uniqueId, m.canonicalId, m.signature FROM job_minhash m
+            WHERE m.uniqueId IN (SELECT uniqueId FROM job_lsh_buckets WHERE bucket IN ({placeholders}))
+        ''', buckets)
+        best, best_score = None, self.threshold
+        for unique_id, canonical_id, blob in cursor.fetchall():
+            score = self.similarity(signature, self._unpack(blob))
+            if score >= best_score:
+                best, best_score = canonical_id, score
+        return best
+
+    def find(self, job):
+        """Return the canonical uniqueId of a stored near-duplicate of job, or None."""
+        signature = self.signature(job)
+        try:
+            match = self._best_match(connect_db().cursor(), signature, self._buckets(job, signature))
+        except sqlite3.Error as e:
+            logger.error("Error looking up near-duplicate jobs: %s", e)
+            return None
+        return match if match != job.get('uniqueId') else None
+
+    def link(self, jobs):
+        """Index stored jobs and return {uniqueId: canonicalId} for the ones that are near-duplicates.
+
+        Jobs are indexed in order, so a repost inside the same batch links to
+        the earlier copy.
+        """
+        duplicates = {}
+        conn = connect_db()
+        with self._lock:
+            try:
+                with conn:
+                    cursor = conn.cursor()
+                    for job in jobs:
+                        unique_id = job['uniqueId']
+                        signature = self.signature(job)
+                        buckets = self._buckets(job, signature)
+                        canonical_id = self._best_match(cursor, signature, buckets) or unique_id
+                        cursor.execute(
+                            'INSERT OR IGNORE INTO job_minhash (uniqueId, canonicalId, signature) VALUES (?, ?, ?)',
+                            (unique_id, canonical_id, self._pack(signature)),
+                        )
+                        if cursor.rowcount != 1:
+                            continue  # Already indexed
+                        cursor.executemany('INSERT INTO job_lsh_buckets (bucket, uniqueId) VALUES (?, ?)',
+                                           [(bucket, unique_id) for bucket in buckets])
+                        if canonical_id != unique_id:
+                            duplicates[unique_id] = canonical_id
+            except sqlite3.Error as e:
+                logger.error("Error indexing jobs for near-duplicate detection: %s", e)
+                return {}
+        if duplicates:
+            logger.info("Linked %s near-duplicate jobs to earlier postings.", len(duplicates))
+        return duplicates
+
+    def canonical_id(self, unique_id):
+        """Return the canonical uniqueId recorded for a job (itself if it is the original)."""
+        row = connect_db().execute('SELECT canonicalId FROM job_minhash WHERE uniqueId = ?', (unique_id,)).fetchone()
+        return row[0] if row else None
+
+    def backfill(self, batch_size=1000):
+        """Index stored jobs that have no signature yet, oldest first."""
+        total = 0
+        while True:
+            rows = connect_db().execute('''
+                SELECT uniqueId, jobTitle, jobCompany, jobLocation FROM jobs
+                WHERE uniqueId NOT IN (SELECT uniqueId FROM job_minhash)
+                ORDER BY id LIMIT ?
+            ''', (batch_size,)).fetchall()
+            if not rows:
+                break
+            self.link([dict(zip(('uniqueId', 'jobTitle', 'jobCompany', 'jobLocation'), row)) for row in rows])
+            total += len(rows)
+        if total:
+            logger.info("Indexed %s stored jobs for near-duplicate detection.", total)
+        return total
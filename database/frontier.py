@@ -0,0 +1,199 @@
+import logging
+import os
+import socket
+import time
+import uuid
+
+from config.config import FRONTIER_LEASE_SECONDS, FRONTIER_MAX_ATTEMPTS, FRONTIER_RETRY_DELAY
+from database.database import connect_db, utc_now
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Page states
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+RUN_COLUMNS = ('search', 'started_at', 'jobs_found', 'cut_short')
+
+CLAIMED = metrics.counter('frontier_claimed_total', 'Result pages claimed from the crawl frontier, by search')
+RETRIED = metrics.counter('frontier_retries_total', 'Result pages put back on the frontier after a failed fetch, by search')
+GAVE_UP = metrics.counter('frontier_failed_total', 'Result pages dropped after FRONTIER_MAX_ATTEMPTS, by search')
+
+def new_owner():
+    """A lease owner id unique to this process and run."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class Frontier:
+    """Durable queue of the result pages a search run still has to crawl.
+
+    Pages live in jobs.db, keyed by (search, url), so a URL is crawled once
+    per run however many pages link to it. A worker claims a batch of pages
+    in one write transaction, which leases them to it for lease_seconds;
+    other processes never get the same page, and a page whose worker died is
+    handed out again once its lease runs out. A failed fetch goes back to
+    pending after retry_delay (doubling each attempt) until max_attempts.
+    Pages are claimed by priority, then shallowest page first.
+
+    A run lasts until its last page is done: start() on a search with pages
+    still outstanding resumes (or joins) that run instead of reseeding it,
+    and the worker whose finish() finds nothing outstanding closes it.
+    """
+
+    def __init__(self, lease_seconds=FRONTIER_LEASE_SECONDS, max_attempts=FRONTIER_MAX_ATTEMPTS,
+                 retry_delay=FRONTIER_RETRY_DELAY):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def load(self):
+        """Create the frontier tables."""
+        conn = connect_db()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_frontier (
+                    search TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    page INTEGER NOT NULL DEFAULT 1,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    last_error TEXT,
+                    PRIMARY KEY (search, url)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_runs (
+                    search TEXT PRIMARY KEY,
+                    started_at TEXT NOT NULL,
+                    jobs_found INTEGER NOT NULL DEFAULT 0,
+                    cut_short INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_crawl_frontier_claim '
+                         'ON crawl_frontier (search, state, priority DESC, page)')
+        return self
+
+    def _write(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so a read-then-update is atomic across processes
+        conn = connect_db()
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    def start(self, search, seed_urls, priority=0):
+        """Seed a run of search, or pick up the one still in progress. Returns the run's row
+        ({'search', 'started_at', 'jobs_found', 'cut_short'}) plus 'resumed'."""
+        conn = self._write()
+        with conn:
+            run = conn.execute(f"SELECT {', '.join(RUN_COLUMNS)} FROM crawl_runs WHERE search = ?", (search,)).fetchone()
+            if run is not None:
+                return dict(zip(RUN_COLUMNS, run), resumed=True)
+            started_at = utc_now()
+            conn.execute('DELETE FROM crawl_frontier WHERE search = ?', (search,))
+            conn.execute('INSERT INTO crawl_runs (search, started_at) VALUES (?, ?)', (search, started_at))
+            conn.executemany('INSERT OR IGNORE INTO crawl_frontier (search, url, priority) VALUES (?, ?, ?)',
+                             [(search, url, priority) for url in seed_urls])
+        return {'search': search, 'started_at': started_at, 'jobs_found': 0, 'cut_short': 0, 'resumed': False}
+
+    def add(self, search, url, page, priority=0):
+        """Queue a page found while crawling; a URL already in this run is ignored."""
+        conn = connect_db()
+        with conn:
+            conn.execute('INSERT OR IGNORE INTO crawl_frontier (search, url, page, priority) VALUES (?, ?, ?, ?)',
+                         (search, url, page, priority))
+
+    def claim(self, search, owner, limit, now=None):
+        """Lease up to limit claimable pages of search to owner. Returns [(url, page)]."""
+        now = time.time() if now is None else now
+        conn = self._write()
+        with conn:
+            # A page whose last lease ran out was being fetched by a worker that died; count it as an attempt
+            conn.execute('UPDATE crawl_frontier SET state = ?, last_error = ?, lease_owner = NULL '
+                         'WHERE search = ? AND state = ? AND lease_expires <= ? AND attempts >= ?',
+                         (FAILED, 'lease expired', search, LEASED, now, self.max_attempts))
+            rows = conn.execute('''
+                SELECT url, page FROM crawl_frontier
+                WHERE search = ? AND ((state = ? AND available_at <= ?) OR (state = ? AND lease_expires <= ?))
+                ORDER BY priority DESC, page, rowid LIMIT ?
+            ''', (search, PENDING, now, LEASED, now, limit)).fetchall()
+            conn.executemany('UPDATE crawl_frontier SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 '
+                             'WHERE search = ? AND url = ?',
+                             [(LEASED, owner, now + self.lease_seconds, search, url) for url, _ in rows])
+        CLAIMED.inc(len(rows), search=search)
+        return rows
+
+    def complete(self, search, url, jobs_found=0):
+        conn = connect_db()
+        with conn:
+            conn.execute('UPDATE crawl_frontier SET state = ?, lease_owner = NULL, lease_expires = NULL '
+                         'WHERE search = ? AND url = ?', (DONE, search, url))
+            conn.execute('UPDATE crawl_runs SET jobs_found = jobs_found + ? WHERE search = ?', (jobs_found, search))
+
+    def retry(self, search, url, error, now=None):
+        """Put a page whose fetch failed back on the frontier, or drop it after max_attempts."""
+        now = time.time() if now is None else now
+        conn = connect_db()
+        with conn:
+            row = conn.execute('SELECT attempts FROM crawl_frontier WHERE search = ? AND url = ?', (search, url)).fetchone()
+            if row is None:
+                return
+            attempts = row[0]
+            if attempts >= self.max_attempts:
+                conn.execute('UPDATE crawl_frontier SET state = ?, last_error = ?, lease_owner = NULL, lease_expires = NULL '
+                             'WHERE search = ? AND url = ?', (FAILED, error, search, url))
+                GAVE_UP.inc(search=search)
+                logger.warning("Giving up on %s after %s attempts: %s", url, attempts, error)
+                return
+            conn.execute('UPDATE crawl_frontier SET state = ?, last_error = ?, available_at = ?, lease_owner = NULL, '
+                         'lease_expires = NULL WHERE search = ? AND url = ?',
+                         (PENDING, error, now + self.retry_delay * 2 ** (attempts - 1), search, url))
+        RETRIED.inc(search=search)
+
+    def release(self, search, owner):
+        """Hand back the pages owner still holds, e.g. when a crawl stops early; it isn't their attempt."""
+        conn = connect_db()
+        with conn:
+            conn.execute('UPDATE crawl_frontier SET state = ?, attempts = attempts - 1, lease_owner = NULL, lease_expires = NULL '
+                         'WHERE search = ? AND state = ? AND lease_owner = ?', (PENDING, search, LEASED, owner))
+
+    def next_retry(self, search, now=None):
+        """Seconds until the next pending page of search can be claimed, or None when none is pending."""
+        now = time.time() if now is None else now
+        available_at = connect_db().execute('SELECT MIN(available_at) FROM crawl_frontier WHERE search = ? AND state = ?',
+                                            (search, PENDING)).fetchone()[0]
+        return None if available_at is None else max(0.0, available_at - now)
+
+    def mark_cut_short(self, search):
+        """Record that the run skipped pages (stop-when-seen, CRAWL_MAX_PAGES, a page that couldn't be
+        fetched), so it can't tell which jobs are gone."""
+        conn = connect_db()
+        with conn:
+            conn.execute('UPDATE crawl_runs SET cut_short = 1 WHERE search = ?', (search,))
+
+    def outstanding(self, search):
+        """Pages of search not yet done or dropped."""
+        return connect_db().execute('SELECT COUNT(*) FROM crawl_frontier WHERE search = ? AND state IN (?, ?)',
+                                    (search, PENDING, LEASED)).fetchone()[0]
+
+    def finish(self, search):
+        """Close the run of search if nothing is outstanding and return its row (plus 'failed', the
+        pages dropped); None while pages are left, or when another worker closed it first."""
+        conn = self._write()
+        with conn:
+            counts = dict(conn.execute('SELECT state, COUNT(*) FROM crawl_frontier WHERE search = ? GROUP BY state',
+                                       (search,)).fetchall())
+            if counts.get(PENDING) or counts.get(LEASED):
+                return None
+            run = conn.execute(f"SELECT {', '.join(RUN_COLUMNS)} FROM crawl_runs WHERE search = ?", (search,)).fetchone()
+            if run is None:
+                return None
+            conn.execute('DELETE FROM crawl_frontier WHERE search = ?', (search,))
+            conn.execute('DELETE FROM crawl_runs WHERE search = ?', (search,))
+        if counts.get(FAILED):
+            logger.warning("Search %s finished with %s pages dropped after repeated failures.", search, counts[FAILED])
+        return dict(zip(RUN_COLUMNS, run), failed=counts.get(FAILED, 0))
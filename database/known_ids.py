@@ -0,0 +1,91 @@
+import logging
+import math
+import threading
+from hashlib import blake2b
+
+from config.config import KNOWN_IDS_ERROR_RATE, KNOWN_IDS_MODE
+from database.database import count_jobs, existing_ids, iter_unique_ids
+
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    """Fixed-capacity bloom filter over string keys."""
+
+    def __init__(self, capacity, error_rate=KNOWN_IDS_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class KnownIds:
+    """In-memory index of the uniqueIds already stored in the jobs table.
+
+    "bloom" mode keeps a compact bloom filter and confirms its positives with
+    one batched lookup per page, so answers stay exact. "set" mode holds every
+    id in a Python set and never touches the database after loading.
+    """
+
+    def __init__(self, mode=KNOWN_IDS_MODE, error_rate=KNOWN_IDS_ERROR_RATE):
+        if mode not in ('bloom', 'set'):
+            raise ValueError(f"Unknown known-ids mode: {mode}")
+        self.mode = mode
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._ids = None
+
+    def load(self):
+        """(Re)build the index from the jobs table."""
+        with self._lock:
+            if self.mode == 'set':
+                self._ids = set(iter_unique_ids())
+            else:
+                # Leave headroom so a long-running worker doesn't rebuild every cycle
+                self._ids = BloomFilter(max(count_jobs() * 2, 10000), self.error_rate)
+                for unique_id in iter_unique_ids():
+                    self._ids.add(unique_id)
+            size = len(self._ids) if self.mode == 'set' else self._ids.count
+        logger.info("Loaded %s known job ids (%s mode).", size, self.mode)
+        return self
+
+    def add(self, unique_ids):
+        """Record ids that were just inserted into the jobs table."""
+        rebuild = False
+        with self._lock:
+            for unique_id in unique_ids:
+                self._ids.add(unique_id)
+            if self.mode == 'bloom' and self._ids.count > self._ids.capacity:
+                rebuild = True
+        if rebuild:
+            self.load()
+
+    def unseen(self, unique_ids):
+        """Return the ids from unique_ids that are not stored yet."""
+        unique_ids = set(unique_ids)
+        with self._lock:
+            candidates = [unique_id for unique_id in unique_ids if unique_id in self._ids]
+        if self.mode == 'bloom' and candidates:
+            candidates = existing_ids(candidates)
+        return unique_ids.difference(candidates)
+
+    def has_unseen(self, jobs):
+        """True if any job in a parsed page is new. Pagination stops on pages that aren't."""
+        if not jobs:
+            return True
+        return bool(self.unseen(job['uniqueId'] for job in jobs))
@@ -0,0 +1,115 @@
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Currency markers as they appear in JobStreet/JobsDB salary labels, mapped to ISO 4217
+CURRENCIES = (
+    ('MYR', 'MYR'), ('RM', 'MYR'), ('SGD', 'SGD'), ('S$', 'SGD'), ('IDR', 'IDR'), ('Rp', 'IDR'),
+    ('PHP', 'PHP'), ('₱', 'PHP'), ('HKD', 'HKD'), ('HK$', 'HKD'), ('THB', 'THB'), ('฿', 'THB'),
+    ('AUD', 'AUD'), ('A$', 'AUD'), ('NZD', 'NZD'), ('USD', 'USD'), ('US$', 'USD'),
+)
+CURRENCY_PATTERN = re.compile('|'.join(re.escape(marker) for marker, _ in CURRENCIES))
+CURRENCY_CODES = dict(CURRENCIES)
+
+PERIOD_PATTERNS = (
+    ('hour', re.compile(r'\b(?:per\s+hour|hourly|/\s*(?:hr|hour)|p\.?h)\b', re.IGNORECASE)),
+    ('day', re.compile(r'\b(?:per\s+day|daily|/\s*day)\b', re.IGNORECASE)),
+    ('week', re.compile(r'\b(?:per\s+week|weekly|/\s*(?:wk|week))\b', re.IGNORECASE)),
+    ('month', re.compile(r'\b(?:per\s+month|monthly|/\s*(?:mth|month|mo)|p\.?m)\b', re.IGNORECASE)),
+    ('year', re.compile(r'\b(?:per\s+(?:year|annum)|yearly|annually|annual|/\s*(?:yr|year)|p\.?a)\b', re.IGNORECASE)),
+)
+
+# 3,000 / 3.000.000 / 4.5k / 12.50 / 5 jt
+AMOUNT_PATTERN = re.compile(r'(\d[\d,.]*)\s*(k|m|mil|jt|juta)?\b', re.IGNORECASE)
+MULTIPLIERS = {'k': 1000, 'm': 1000000, 'mil': 1000000, 'jt': 1000000, 'juta': 1000000}
+
+RELATIVE_DATE_PATTERN = re.compile(
+    r'(\d+)\s*\+?\s*(m|min|mins|minutes?|h|hr|hrs|hours?|d|days?|w|wk|weeks?|mo|months?|y|yr|years?)\s*ago',
+    re.IGNORECASE)
+RELATIVE_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks', 'mo': 'months', 'y': 'years'}
+
+def _amount(number, suffix):
+    if re.fullmatch(r'\d{1,3}(?:\.\d{3})+', number):
+        number = number.replace('.', '')  # Dots as thousands separators (IDR)
+    else:
+        number = number.replace(',', '')
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+    return value * MULTIPLIERS.get((suffix or '').lower(), 1)
+
+@lru_cache(maxsize=4096)
+def parse_salary(text):
+    """Parse a salary label into (salary_min, salary_max, salary_period, currency).
+
+    Unknown parts are None, so "Not Specified" is (None, None, None, None).
+    Labels repeat a lot across listings, so results are memoized.
+    """
+    if not text:
+        return None, None, None, None
+    text = text.replace('\xa0', ' ')
+    currency_match = CURRENCY_PATTERN.search(text)
+    currency = CURRENCY_CODES[currency_match.group(0)] if currency_match else None
+
+    amounts = [_amount(number, suffix) for number, suffix in AMOUNT_PATTERN.findall(text)]
+    amounts = [amount for amount in amounts if amount]
+    if not amounts:
+        return None, None, None, None
+
+    period = None
+    for name, pattern in PERIOD_PATTERNS:
+        if pattern.search(text):
+            period = name
+            break
+
+    # "RM 3k - 4k" carries the suffix on both; "RM 3 - 4k" means 3k - 4k
+    if len(amounts) >= 2 and amounts[0] < 1000 <= amounts[1] and amounts[1] / amounts[0] >= 100:
+        amounts[0] *= 1000
+    return min(amounts[:2]), max(amounts[:2]), period, currency
+
+def parse_listing_date(text, now=None):
+    """Turn a listing date (ISO timestamp or "3d ago") into an absolute UTC ISO timestamp, or None."""
+    if not text:
+        return None
+    now = now or datetime.now(timezone.utc)
+    text = text.strip()
+
+    try:
+        listed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        listed = None
+    if listed is not None:
+        if listed.tzinfo is None:
+            listed = listed.replace(tzinfo=timezone.utc)
+        return listed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    lowered = text.lower()
+    if lowered in ('just now', 'today', 'new', 'now'):
+        listed = now
+    elif lowered == 'yesterday':
+        listed = now - timedelta(days=1)
+    else:
+        match = RELATIVE_DATE_PATTERN.search(lowered)
+        if not match:
+            return None
+        count, unit = int(match.group(1)), match.group(2).lower()
+        unit = 'mo' if unit.startswith('mo') else 'm' if unit.startswith('m') else unit[0]
+        if unit == 'mo':
+            listed = now - timedelta(days=30 * count)
+        elif unit == 'y':
+            listed = now - timedelta(days=365 * count)
+        else:
+            listed = now - timedelta(**{RELATIVE_UNITS[unit]: count})
+    return listed.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def normalize_jobs(jobs, now=None):
+    """Return (salary_min, salary_max, salary_period, currency, listed_at) for every job in a batch.
+
+    One "now" is used for the whole batch so relative dates in a page agree.
+    """
+    now = now or datetime.now(timezone.utc)
+    return [
+        parse_salary(job.get('jobSalary')) + (parse_listing_date(job.get('jobListingDate'), now),)
+        for job in jobs
+    ]
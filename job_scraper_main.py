@@ -1,9 +1,18 @@
+import functools
+import os
+import signal
+import sys
 import threading
-import time
-from worker.worker import start_scraping_worker
+from worker.scheduler import Scheduler
+from worker.worker import close_enricher, run_search
 import logging
-from config.config import setup_logging, ensure_directories_exist
-from database.database import create_table, count_jobs
+from api.api import serve_api
+from config.config import API_PORT, METRICS_PORT, SEARCHES, setup_logging, ensure_directories_exist
+from database.database import close_connections, create_table, count_jobs
+from metrics.metrics import enabled as metrics_enabled, serve_metrics
+
+# The log file handler needs logs/ to exist first
+ensure_directories_exist()
 
 # Setup logging for the whole app
 setup_logging()
@@ -11,26 +20,49 @@ setup_logging()
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
-    ensure_directories_exist()
     create_table()
     logger.info("Starting the web scraper worker")
 
+    webhook_url = os.environ.get("DISCORD_WEBHOOK")
+    if not webhook_url:
+        logger.error("DISCORD_WEBHOOK is missing. Set it before starting the scraper.")
+        sys.exit(1)
+
     # Log the total job count before starting
     logger.info("Total jobs in the database: %s", count_jobs())
 
-    # Start the worker thread to run the scraper periodically
-    worker_thread = threading.Thread(target=start_scraping_worker(), daemon=True)
+    # Prometheus-style /metrics for the long-running scheduler
+    if metrics_enabled() and METRICS_PORT:
+        try:
+            serve_metrics(METRICS_PORT)
+        except OSError as e:
+            logger.error("Could not serve metrics on port %s: %s", METRICS_PORT, e)
+
+    # Read-only JSON query API over the same database
+    if API_PORT:
+        try:
+            serve_api(API_PORT)
+        except OSError as e:
+            logger.error("Could not serve the query API on port %s: %s", API_PORT, e)
+
+    # Run every configured search on its own interval until asked to stop
+    stop_worker = threading.Event()
+    scheduler = Scheduler(SEARCHES, functools.partial(run_search, webhook_url=webhook_url), stop_event=stop_worker)
+    worker_thread = threading.Thread(target=scheduler.run, name="scheduler")
     worker_thread.start()
 
+    # Treat a service manager's SIGTERM like Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_worker.set())
+
     # Keep the main thread alive
     try:
-        while worker_thread.is_alive:
-            time.sleep(1)
+        while worker_thread.is_alive():
+            worker_thread.join(timeout=1)
     except KeyboardInterrupt:
         logger.info("Shutdown signal received. Stopping the worker...")
         stop_worker.set()
-        worker_thread.join() # Wait for worker thread to finish
+        worker_thread.join() # Wait for in-flight searches to finish
         logger.info("Worker stopped gracefully.")
-        # Set the stop flag or handle the thread shutdown properly
-        # Set the stop flag to True if using it in your worker
-        stop_worker = True
\ No newline at end of file
+    finally:
+        close_enricher() # Finish detail pages already queued
+        close_connections()
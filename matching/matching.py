@@ -0,0 +1,162 @@
+import json
+import logging
+import re
+from collections import OrderedDict, namedtuple
+
+from config.config import SUBSCRIPTIONS_FILE
+from database.normalize import parse_salary
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Job fields a subscription's keywords are matched against
+KEYWORD_FIELDS = ('jobTitle', 'jobCompany', 'jobCategory', 'jobSubCategory')
+# Location tokens share the index with keyword tokens under this prefix
+LOCATION_PREFIX = 'loc:'
+
+# A saved filter: every keyword and location word must appear in the job, and the job's
+# pay must be able to reach min_salary. Digests go to the subscriber's webhook.
+Subscription = namedtuple('Subscription', ['id', 'subscriber', 'keywords', 'location', 'min_salary', 'webhook'],
+                          defaults=(None, None, None, None))
+
+CANDIDATES = metrics.counter('matching_candidates_total', 'Subscriptions checked against a job after the index lookup')
+MATCHES = metrics.counter('matching_matches_total', 'Job and subscription pairs that matched')
+
+def tokenize(text):
+    return frozenset(TOKEN_PATTERN.findall((text or '').lower()))
+
+def load_subscriptions(path=SUBSCRIPTIONS_FILE):
+    """Read saved subscriptions from a JSON list of objects; a missing file means none."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            entries = json.load(file)
+    except FileNotFoundError:
+        return []
+    subscriptions = []
+    for entry in entries:
+        try:
+            subscriptions.append(Subscription(**entry))
+        except TypeError as e:
+            logger.warning("Skipping malformed subscription %s: %s", entry.get('id'), e)
+    return subscriptions
+
+class _Compiled:
+    __slots__ = ('subscription', 'order', 'keywords', 'location', 'min_salary', 'anchor')
+
+    def __init__(self, subscription, order):
+        self.subscription = subscription
+        self.order = order
+        self.keywords = tokenize(subscription.keywords)
+        self.location = frozenset(LOCATION_PREFIX + token for token in tokenize(subscription.location))
+        self.min_salary = subscription.min_salary
+        self.anchor = None
+
+    def accepts(self, tokens, job):
+        if not (self.keywords <= tokens and self.location <= tokens):
+            return False
+        if self.min_salary is None:
+            return True
+        salary_min, salary_max, _, _ = parse_salary(job.get('jobSalary'))
+        top = salary_max if salary_max is not None else salary_min
+        return top is not None and top >= self.min_salary
+
+class Matcher:
+    """Match batches of jobs against many subscriptions through an inverted index.
+
+    Each subscription is filed under one anchor token, whichever of its
+    keywords (or location words) has the fewest subscriptions filed under it
+    so far, and every other condition is checked only for the subscriptions
+    a job's own tokens pull from the index. The work per job is
+    its token lookups plus the candidates they return, so it grows with the
+    matches rather than with jobs x subscriptions. Subscriptions with neither
+    keywords nor a location are checked against every job. Salary floors
+    compare against the top of the job's pay in its own currency and period,
+    like search_jobs(min_salary=), and jobs without a salary never reach one.
+    """
+
+    def __init__(self, subscriptions=()):
+        self._subscriptions = {}
+        self._index = {}
+        self._match_all = {}
+        self._added = 0
+        for subscription in subscriptions:
+            self.add(subscription)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def add(self, subscription):
+        """Index a subscription, replacing any with the same id."""
+        self.remove(subscription.id)
+        compiled = _Compiled(subscription, self._added)
+        self._added += 1
+        self._subscriptions[subscription.id] = compiled
+        tokens = compiled.keywords or compiled.location
+        if not tokens:
+            self._match_all[subscription.id] = compiled
+            return
+        # Shortest posting list first, then the longer (usually rarer) word; sorted so ties are stable
+        compiled.anchor = min(sorted(tokens), key=lambda token: (len(self._index.get(token, ())), -len(token)))
+        self._index.setdefault(compiled.anchor, {})[subscription.id] = compiled
+
+    def remove(self, subscription_id):
+        compiled = self._subscriptions.pop(subscription_id, None)
+        if compiled is None:
+            return
+        if compiled.anchor is None:
+            del self._match_all[subscription_id]
+            return
+        postings = self._index[compiled.anchor]
+        del postings[subscription_id]
+        if not postings:
+            del self._index[compiled.anchor]
+
+    @staticmethod
+    def job_tokens(job):
+        tokens = set()
+        for field in KEYWORD_FIELDS:
+            tokens |= tokenize(job.get(field))
+        tokens.update(LOCATION_PREFIX + token for token in tokenize(job.get('jobLocation')))
+        return tokens
+
+    def match_job(self, job):
+        """Return the subscriptions a job matches, in the order they were added."""
+        tokens = self.job_tokens(job)
+        candidates = list(self._match_all.values())
+        for token in tokens:
+            postings = self._index.get(token)
+            if postings:
+                candidates.extend(postings.values())
+        CANDIDATES.inc(len(candidates))
+        accepted = [compiled for compiled in candidates if compiled.accepts(tokens, job)]
+        return [compiled.subscription for compiled in sorted(accepted, key=lambda compiled: compiled.order)]
+
+    def match(self, jobs):
+        """Match a batch of jobs in one pass: {subscription id: [jobs]}, in job order."""
+        matches = OrderedDict()
+        for job in jobs:
+            for subscription in self.match_job(job):
+                matches.setdefault(subscription.id, []).append(job)
+        MATCHES.inc(sum(len(matched) for matched in matches.values()))
+        return matches
+
+    def digests(self, jobs):
+        """Group a batch's matches per subscriber: {subscriber: {'webhook', 'subscriptions', 'jobs'}}.
+
+        A job matching several of one subscriber's subscriptions is listed once.
+        """
+        digests = OrderedDict()
+        for subscription_id, matched in self.match(jobs).items():
+            subscription = self._subscriptions[subscription_id].subscription
+            digest = digests.setdefault(subscription.subscriber, {
+                'webhook': subscription.webhook, 'subscriptions': [], 'jobs': OrderedDict(),
+            })
+            digest['webhook'] = digest['webhook'] or subscription.webhook
+            digest['subscriptions'].append(subscription_id)
+            for job in matched:
+                digest['jobs'].setdefault(job['uniqueId'], job)
+        for digest in digests.values():
+            digest['jobs'] = list(digest['jobs'].values())
+        return digests
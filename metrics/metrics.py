@@ -0,0 +1,235 @@
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config.config import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Seconds; fits both a parse (milliseconds) and a slow, retried fetch
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _format_labels(key, extra=()):
+    pairs = key + extra
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, registry):
+        self.name = name
+        self.help = help
+        self.registry = registry
+        self._values = {}
+
+    def samples(self):
+        """Yield (name, labels, value) for every series, as they appear in the exposition."""
+        with self.registry._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, key, value
+
+class Counter(Metric):
+    """A total that only goes up, e.g. responses received."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self.registry._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that can go up and down, e.g. a queue's depth."""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self.registry._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their count and sum."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, registry, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self.registry._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the seconds its block takes."""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.registry._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float('inf'),), counts):
+                cumulative += hits
+                yield f"{self.name}_bucket", key, cumulative, (('le', _format_value(float(bound))),)
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, count
+
+class Registry:
+    """Process-wide set of named metrics.
+
+    Metrics are declared once at import time by the module that records them
+    (declaring a name again returns the existing metric). While disabled,
+    inc/set/observe return straight away and time() hands out a shared no-op
+    timer, so instrumented code costs a method call and nothing else.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _declare(self, cls, name, help, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, self, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already declared as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help):
+        return self._declare(Counter, name, help)
+
+    def gauge(self, name, help):
+        return self._declare(Gauge, name, help)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._declare(Histogram, name, help, buckets=buckets)
+
+    def reset(self):
+        """Drop every recorded value, keeping the declared metrics."""
+        with self._lock:
+            for metric in self._metrics.values():
+                metric._values.clear()
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample in metric.samples():
+                sample_name, key, value = sample[:3]
+                lines.append(f"{sample_name}{_format_labels(key, sample[3] if len(sample) > 3 else ())} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self, since=None):
+        """{(sample name, labels): value} for every counter, gauge and histogram _sum/_count.
+
+        Pass an earlier snapshot() as since to get what happened in between
+        (gauges are reported as they are now). Read it with total().
+        """
+        values = {}
+        for metric in list(self._metrics.values()):
+            for sample in metric.samples():
+                sample_name, key, value = sample[:3]
+                if sample_name.endswith('_bucket'):
+                    continue
+                if since and metric.kind != 'gauge':
+                    value -= since.get((sample_name, key), 0)
+                values[(sample_name, key)] = value
+        return values
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+def enabled():
+    return REGISTRY.enabled
+
+def total(snapshot, name, **labels):
+    """Sum a snapshot's series called name whose labels include the given ones."""
+    wanted = set(_key({label: str(value) for label, value in labels.items()}))
+    return sum(value for (sample_name, key), value in snapshot.items()
+               if sample_name == name and wanted <= {(label, str(v)) for label, v in key})
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def serve_metrics(port, host='127.0.0.1', registry=REGISTRY):
+    """Serve registry.render() at http://host:port/metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1])
+    return server
@@ -0,0 +1,265 @@
+import json
+import logging
+import os
+import threading
+import time
+from hashlib import sha256
+
+import requests
+
+from config.config import DISCORD_MAX_RETRIES, DISCORD_QUEUE_FILE, REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Discord message limits (https://discord.com/developers/docs/resources/message#embed-object-embed-limits)
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_FIELDS_PER_EMBED = 25
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_FIELD_NAME = 256
+MAX_FIELD_VALUE = 1024
+
+EMBED_COLOR = 3066993
+FOOTER_TEXT = "JobStreet Automator"
+REPORT_TITLE = "🚀 Job Scraper Report"
+
+# Notifiers are created per report and share one queue file, so they share the lock guarding it
+_queue_lock = threading.Lock()
+
+def _truncate(text, limit):
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def job_field(job):
+    """Render one job as an embed field. Fields a parser doesn't produce are left out."""
+    salary = job.get('jobSalary') if job.get('jobSalary') != "Not Specified" else None
+    details = " • ".join(part for part in (job.get('jobLocation'), salary) if part)
+    lines = [f"🏢 **{job.get('jobCompany') or 'Unknown company'}**"]
+    if details:
+        lines.append(f"📍 {details}")
+    if job.get('jobURL'):
+        lines.append(f"[👉 View Job]({job['jobURL']})")
+    value = "\n".join(lines)
+    return {
+        "name": _truncate(f"🔹 {job.get('jobTitle') or 'Untitled job'}", MAX_FIELD_NAME),
+        "value": _truncate(value, MAX_FIELD_VALUE),
+        "inline": False
+    }
+
+def _field_chars(field):
+    return len(field["name"]) + len(field["value"])
+
+def pack_messages(jobs, title=REPORT_TITLE):
+    """Pack jobs into as few webhook payloads as Discord's embed limits allow."""
+    # Reserve room for the title/footer text Discord also counts
+    header_chars = len(f"{title} (Page 9999/9999)") + len(FOOTER_TEXT)
+    messages = []
+    embeds, fields, chars = [], [], header_chars
+
+    def close_embed():
+        nonlocal fields
+        if fields:
+            embeds.append({"color": EMBED_COLOR, "fields": fields})
+            fields = []
+
+    def close_message():
+        nonlocal embeds, chars
+        close_embed()
+        if embeds:
+            messages.append(embeds)
+        embeds, chars = [], header_chars
+
+    for job in jobs:
+        field = job_field(job)
+        size = _field_chars(field)
+        if chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+            close_message()
+        if len(fields) == MAX_FIELDS_PER_EMBED:
+            close_embed()
+            if len(embeds) == MAX_EMBEDS_PER_MESSAGE:
+                close_message()
+        fields.append(field)
+        chars += size
+    close_message()
+
+    payloads = []
+    for page, embeds in enumerate(messages, start=1):
+        embeds[0]["title"] = f"{title} (Page {page}/{len(messages)})"
+        embeds[-1]["footer"] = {"text": FOOTER_TEXT}
+        payloads.append({"embeds": embeds})
+    return payloads
+
+class RateLimiter:
+    """Schedule webhook requests from Discord's X-RateLimit-* headers.
+
+    Requests go out immediately while X-RateLimit-Remaining allows, then wait
+    for X-RateLimit-Reset-After instead of running into a 429. A 429 still
+    blocks the next request for its retry_after.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._remaining = None
+        self._reset_at = 0.0
+        self._blocked_until = 0.0
+        self._in_flight = 0
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    self._cond.wait(self._blocked_until - now)
+                    continue
+                if self._remaining is not None and self._remaining <= 0 and now >= self._reset_at:
+                    self._remaining = None  # Bucket has reset; probe its new size
+                if self._remaining is None:
+                    if self._in_flight == 0:
+                        break
+                    self._cond.wait()
+                    continue
+                if self._remaining > 0:
+                    self._remaining -= 1
+                    break
+                self._cond.wait(self._reset_at - now)
+            self._in_flight += 1
+
+    def release(self, response=None, retry_after=None):
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if response is not None:
+                remaining = response.headers.get('X-RateLimit-Remaining')
+                reset_after = response.headers.get('X-RateLimit-Reset-After')
+                if remaining is not None:
+                    self._remaining = max(0, int(remaining) - self._in_flight)
+                if reset_after is not None:
+                    self._reset_at = now + float(reset_after)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            self._cond.notify_all()
+
+class DiscordNotifier:
+    """Deliver job reports to a Discord webhook at the fastest rate it allows.
+
+    Messages are packed as densely as the embed limits permit and posted in
+    page order, each as soon as the webhook's rate-limit bucket allows. If a
+    message still fails after DISCORD_MAX_RETRIES, it and every later page are
+    appended to a local queue file, in order, and retried before the next
+    report.
+    """
+
+    def __init__(self, webhook_url, session=None, queue_file=DISCORD_QUEUE_FILE,
+                 max_retries=DISCORD_MAX_RETRIES, timeout=REQUEST_TIMEOUT):
+        self.webhook_url = webhook_url
+        self.session = session or requests.Session()
+        self.queue_file = queue_file
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = RateLimiter()
+        # Queue entries are tied to the webhook without writing the secret URL to disk
+        self._webhook_key = sha256(webhook_url.encode('utf-8')).hexdigest()[:16]
+
+    def send(self, jobs, file_path=None, title=REPORT_TITLE):
+        """Send every job, attaching file_path to the last message. Returns the number of failed messages."""
+        self.flush_queue()
+        if not jobs:
+            return 0
+
+        payloads = pack_messages(jobs, title)
+        logger.info("Sending %s jobs to Discord in %s messages", len(jobs), len(payloads))
+
+        # The attachment goes with the final page
+        messages = [(payload, None) for payload in payloads[:-1]] + [(payloads[-1], file_path)]
+        return self._deliver(messages)
+
+    def flush_queue(self):
+        """Retry messages left over from earlier runs. Returns the number still undelivered."""
+        with _queue_lock:
+            entries = self._read_queue()
+            if not entries:
+                return 0
+            keep = [entry for entry in entries if entry.get('webhook') != self._webhook_key]
+            mine = [entry for entry in entries if entry.get('webhook') == self._webhook_key]
+            self._write_queue(keep)
+
+        if mine:
+            logger.info("Retrying %s queued Discord messages", len(mine))
+        return self._deliver([(entry['payload'], None) for entry in mine])
+
+    def _deliver(self, messages):
+        # Strictly one page after another so "Page 2/5" never lands before "Page 1/5"
+        for index, message in enumerate(messages):
+            if not self._post(*message):
+                failed = messages[index:]
+                self._enqueue(failed)
+                return len(failed)
+        return 0
+
+    def _post(self, payload, file_path=None):
+        for attempt in range(1, self.max_retries + 1):
+            self.limiter.acquire()
+            response = None
+            retry_after = None
+            try:
+                if file_path and os.path.isfile(file_path):
+                    with open(file_path, "rb") as f:
+                        multipart_data = {
+                            "file": (os.path.basename(file_path), f),
+                            "payload_json": (None, json.dumps(payload))
+                        }
+                        response = self.session.post(self.webhook_url, files=multipart_data, timeout=self.timeout)
+                else:
+                    response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+
+                if response.status_code == 429:
+                    retry_after = self._retry_after(response)
+                    logger.warning("Discord rate limited us, retrying in %.2fs", retry_after)
+                elif response.status_code < 300:
+                    return True
+                else:
+                    logger.error("Discord returned %s (attempt %s/%s)", response.status_code, attempt, self.max_retries)
+                    retry_after = self._backoff(attempt)
+            except requests.RequestException as e:
+                logger.error("Discord request failed (attempt %s/%s): %s", attempt, self.max_retries, e)
+                retry_after = self._backoff(attempt)
+            finally:
+                self.limiter.release(response, retry_after)
+        return False
+
+    def _backoff(self, attempt):
+        # No point holding the other senders back after the final attempt
+        return min(0.5 * 2 ** (attempt - 1), 30) if attempt < self.max_retries else None
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.json().get('retry_after', 1))
+        except ValueError:
+            return float(response.headers.get('Retry-After', 1))
+
+    def _enqueue(self, messages):
+        logger.error("Queued %s undelivered Discord messages in %s", len(messages), self.queue_file)
+        # The CSV is rewritten every cycle, so a queued message must not re-attach it later
+        entries = [{'webhook': self._webhook_key, 'payload': payload} for payload, _ in messages]
+        with _queue_lock:
+            os.makedirs(os.path.dirname(self.queue_file) or '.', exist_ok=True)
+            with open(self.queue_file, 'a', encoding='utf-8') as file:
+                for entry in entries:
+                    file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _read_queue(self):
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as file:
+                return [json.loads(line) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _write_queue(self, entries):
+        if not entries:
+            if os.path.exists(self.queue_file):
+                os.remove(self.queue_file)
+            return
+        tmp_path = self.queue_file + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.queue_file)
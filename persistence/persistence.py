@@ -1,17 +1,198 @@
 import csv
+import gzip
+import json
 import os
 import logging
-from config.config import CSV_FILE
+import threading
+import time
+import zlib
+
+from config.config import ARCHIVE_DIR, CSV_FILE
+from metrics import metrics
+from records.records import JobRecord, values_getter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional, only needed for Parquet exports
+    pyarrow = None
 
 logger = logging.getLogger(__name__)
 
-def save_to_csv(job_data):
-    """Save job listings to CSV file."""
-    file_exists = os.path.isfile(CSV_FILE)
+WRITE_SECONDS = metrics.histogram('persistence_write_seconds', 'Time to write one batch of jobs, by sink (csv, archive)')
+ROWS_WRITTEN = metrics.counter('persistence_rows_written_total', 'Job rows written, by sink (csv, archive)')
+
+# Stable column order for every file we write. Fields a parser doesn't produce are left empty.
+JOB_FIELDS = (
+    'uniqueId', 'jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'jobCategory',
+    'jobSubCategory', 'jobListingDate', 'jobURL', 'scrapedAt',
+)
+
+_field_values = values_getter(JOB_FIELDS)
+_SCRAPED_AT = JOB_FIELDS.index('scrapedAt')
+
+def scrape_time():
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+def to_values(job, scraped_at=None):
+    """A job's JOB_FIELDS values as a list, empty strings for missing ones, ready for csv.writer."""
+    values = _field_values(job) if isinstance(job, JobRecord) else [job.get(field) for field in JOB_FIELDS]
+    values = [value or "" for value in values]
+    if not values[_SCRAPED_AT]:
+        values[_SCRAPED_AT] = scraped_at or scrape_time()
+    return values
+
+def to_row(job, scraped_at=None):
+    """Project a job onto JOB_FIELDS."""
+    return dict(zip(JOB_FIELDS, to_values(job, scraped_at)))
+
+def _write_rows(file, fieldnames, job_data, header):
+    scraped_at = scrape_time()
+    if list(fieldnames) == list(JOB_FIELDS):
+        # The usual layout: rows go straight from the records to the writer, with no dict per row
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(JOB_FIELDS)
+        writer.writerows(to_values(job, scraped_at) for job in job_data)
+        return
+    writer = csv.DictWriter(file, fieldnames=fieldnames, restval='', extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows(to_row(job, scraped_at) for job in job_data)
+
+def _csv_header(filename):
+    try:
+        with open(filename, newline='', encoding='utf-8') as file:
+            return next(csv.reader(file), None)
+    except FileNotFoundError:
+        return None
+
+def save_to_csv(job_data, filename=CSV_FILE):
+    """Append job listings to a CSV file, keeping the columns the file already has."""
+    if not job_data:
+        return 0
+    # An existing file keeps its header, so old and new rows always line up
+    fieldnames = _csv_header(filename) or list(JOB_FIELDS)
+    write_header = not os.path.isfile(filename) or os.path.getsize(filename) == 0
+
+    with open(filename, mode='a', newline='', encoding='utf-8') as file:
+        _write_rows(file, fieldnames, job_data, header=write_header)  # Header only if the file is empty
+    logger.info("Saved %s job listings to CSV.", len(job_data))
+    return len(job_data)
+
+def write_csv(job_data, filename):
+    """Write job listings to a fresh CSV file with the standard columns."""
+    with open(filename, mode='w', newline='', encoding='utf-8') as file:
+        _write_rows(file, JOB_FIELDS, job_data, header=True)
+    return filename
+
+class JobArchive:
+    """Append-only, compressed history of every stored job.
+
+    Jobs go into one gzip'd JSON Lines file per month. Each append writes a
+    separate gzip member and records its byte range, row count and time span
+    in a small index next to it, so readers can seek straight to the batches
+    they need and nothing is ever rewritten. Any gzip tool still reads a
+    whole segment as one stream.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, month):
+        base = os.path.join(self.directory, f"jobs-{month}")
+        return base + '.jsonl.gz', base + '.idx'
+
+    def append(self, jobs):
+        """Append a batch of jobs as one gzip member. Returns the index entry."""
+        if not jobs:
+            return None
+        scraped_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        rows = [to_row(job, scraped_at) for job in jobs]
+        data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode('utf-8')
+        member = gzip.compress(data, mtime=0)
+        data_path, index_path = self._paths(scraped_at[:7])
+
+        with self._lock:
+            with open(data_path, 'ab') as file:
+                offset = file.tell()
+                file.write(member)
+            # The index line is written last: a batch torn by a crash is simply never listed
+            entry = {
+                'offset': offset,
+                'length': len(member),
+                'count': len(rows),
+                'first_scraped': rows[0]['scrapedAt'],
+                'last_scraped': rows[-1]['scrapedAt'],
+            }
+            with open(index_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(entry) + "\n")
+        return entry
+
+    def months(self):
+        """Return the months that have segments, oldest first."""
+        return sorted(name[5:12] for name in os.listdir(self.directory)
+                      if name.startswith('jobs-') and name.endswith('.idx'))
+
+    def index(self, month):
+        """Return the index entries of one monthly segment."""
+        _, index_path = self._paths(month)
+        try:
+            with open(index_path, encoding='utf-8') as file:
+                return [json.loads(line) for line in file if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read(self, since=None, until=None):
+        """Yield archived rows scraped between since and until (ISO timestamps, inclusive).
+
+        Only the months and batches whose index range overlaps are decompressed.
+        """
+        for month in self.months():
+            if (since and month < since[:7]) or (until and month > until[:7]):
+                continue
+            data_path, _ = self._paths(month)
+            with open(data_path, 'rb') as file:
+                for entry in self.index(month):
+                    if (since and entry['last_scraped'] < since) or (until and entry['first_scraped'] > until):
+                        continue
+                    file.seek(entry['offset'])
+                    data = zlib.decompress(file.read(entry['length']), wbits=31)
+                    for line in data.decode('utf-8').splitlines():
+                        row = json.loads(line)
+                        if (since and row['scrapedAt'] < since) or (until and row['scrapedAt'] > until):
+                            continue
+                        yield row
+
+    def export_parquet(self, path, since=None, until=None):
+        """Write archived rows to a Parquet file (needs pyarrow). Returns the row count."""
+        if pyarrow is None:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        columns = {field: [] for field in JOB_FIELDS}
+        for row in self.read(since, until):
+            for field in JOB_FIELDS:
+                columns[field].append(row.get(field, ""))
+        table = pyarrow.table(columns)
+        pyarrow.parquet.write_table(table, path, compression='zstd')
+        return table.num_rows
+
+class JobWriter:
+    """Stream stored jobs to the history CSV and the compressed archive as batches arrive."""
+
+    def __init__(self, csv_file=CSV_FILE, archive=None):
+        self.csv_file = csv_file
+        self.archive = archive or JobArchive()
+        self._lock = threading.Lock()
 
-    with open(CSV_FILE, mode='a', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=job_data[0].keys())
-        if not file_exists:
-            writer.writeheader()  # Write header only if file is empty
-        writer.writerows(job_data)
-        logger.info(f"Saved {len(job_data)} job listings to CSV.")
+    def write(self, jobs):
+        if not jobs:
+            return
+        with self._lock:
+            with WRITE_SECONDS.time(sink='csv'):
+                save_to_csv(jobs, self.csv_file)
+            ROWS_WRITTEN.inc(len(jobs), sink='csv')
+            with WRITE_SECONDS.time(sink='archive'):
+                self.archive.append(jobs)
+            ROWS_WRITTEN.inc(len(jobs), sink='archive')
@@ -0,0 +1,128 @@
+import sys
+from collections.abc import Mapping, MutableMapping
+from operator import attrgetter
+
+# Every job field a parser, the database or a sink knows about gets a slot; anything else goes to _extra
+FIELDS = (
+    'uniqueId', 'jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'jobCategory', 'jobSubCategory',
+    'jobListingDate', 'jobURL', 'canonicalId', 'scrapedAt',
+)
+# Fields whose values repeat across thousands of listings; one shared string per distinct value
+INTERNED_FIELDS = frozenset(('jobCompany', 'jobLocation', 'jobSalary', 'jobCategory', 'jobSubCategory', 'jobListingDate'))
+
+_SLOTS = frozenset(FIELDS)
+_intern = sys.intern
+
+class JobRecord:
+    """One job, stored in slots instead of a per-job dict.
+
+    Behaves like the dicts jobs used to be (job['jobTitle'], job.get(),
+    'canonicalId' in job, dict(job), json via dict, == against a dict), so
+    every consumer keeps working, but takes well under half the memory. A
+    field set to None counts as absent, as job.get() always treated it.
+    Repeated values (INTERNED_FIELDS) share one string across records, and a
+    values_getter() reads a tuple of fields in one C call, which is what the
+    database parameters and CSV rows are built from. Keys outside FIELDS are
+    kept in a small dict.
+    """
+
+    __slots__ = FIELDS + ('_extra',)
+
+    def __init__(self, *args, **kwargs):
+        for field in FIELDS:
+            setattr(self, field, None)
+        self._extra = None
+        if args or kwargs:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def __getitem__(self, key):
+        if key in _SLOTS:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _SLOTS:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = _intern(value)
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _SLOTS:
+            if getattr(self, key) is None:
+                raise KeyError(key)
+            setattr(self, key, None)
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __iter__(self):
+        for field in FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in _SLOTS:
+            return getattr(self, key) is not None
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        if key in _SLOTS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default if self._extra is None else self._extra.get(key, default)
+
+    keys = MutableMapping.keys
+    items = MutableMapping.items
+    values = MutableMapping.values
+    pop = MutableMapping.pop
+    popitem = MutableMapping.popitem
+    clear = MutableMapping.clear
+    update = MutableMapping.update
+    setdefault = MutableMapping.setdefault
+
+    def copy(self):
+        return JobRecord(self)
+
+    def __eq__(self, other):
+        if not isinstance(other, (JobRecord, Mapping)):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Pickles (the asyncio pipeline's parser processes) as a plain dict of its fields
+        return JobRecord, (dict(self.items()),)
+
+    def __repr__(self):
+        return f"JobRecord({dict(self.items())!r})"
+
+# A plain class rather than a MutableMapping subclass keeps isinstance(job, JobRecord) cheap on the hot path
+MutableMapping.register(JobRecord)
+
+def values_getter(fields):
+    """Return a function reading fields from a JobRecord as a tuple, None for missing ones.
+    Build it once per fields tuple, e.g. as a module constant."""
+    if len(fields) > 1 and _SLOTS.issuperset(fields):
+        return attrgetter(*fields)
+    return lambda record: tuple([record.get(field) for field in fields])
+
+def to_record(job):
+    """Return job as a JobRecord, converting a plain mapping (e.g. one read back from the page cache)."""
+    return job if isinstance(job, JobRecord) else JobRecord(job)
@@ -0,0 +1,168 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from config.config import DETAIL_PAGE_DIR, HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+def content_hash(text):
+    """Hash a response body so an unchanged page can skip parsing."""
+    return sha256(text.encode('utf-8')).hexdigest()
+
+def parser_key(parse):
+    """Identify a parse function, so results from a different parser are never reused."""
+    return f"{getattr(parse, '__module__', '')}.{getattr(parse, '__qualname__', repr(parse))}"
+
+class PageCache:
+    """On-disk cache of page validators and parse results, bounded by total size.
+
+    Only the ETag/Last-Modified validators, the body hash and the parsed jobs
+    are kept, never the page itself. Least recently used entries are evicted
+    once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.json'))
+
+    def _path(self, url):
+        return os.path.join(self.directory, sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url, parse):
+        """Return the cached entry for a URL and parser, or None."""
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as file:
+                entry = json.load(file, object_pairs_hook=OrderedDict)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url or entry.get('parser') != parser_key(parse):
+            return None
+        return entry
+
+    @staticmethod
+    def request_headers(entry):
+        """Conditional request headers for a cached entry."""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def match(self, url, entry, response):
+        """Return the cached entry if the response says the page is unchanged, else None.
+
+        A 304 is unchanged by definition; a 200 is unchanged when its body hash
+        matches the one recorded at the last parse.
+        """
+        if entry is None:
+            return None
+        if response.status_code == 304:
+            self._touch(url)
+            return entry
+        if response.status_code == 200 and entry.get('body_hash') == content_hash(response.text):
+            self._touch(url)
+            return entry
+        return None
+
+    def put(self, url, parse, response, jobs, next_url):
+        """Store the validators and parse result for a freshly parsed page."""
+        entry = {
+            'url': url,
+            'parser': parser_key(parse),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'body_hash': content_hash(response.text),
+            'next_url': next_url,
+            'stored_at': time.time(),
+            'jobs': jobs,
+        }
+        # Job records are mappings, stored as plain JSON objects
+        data = json.dumps(entry, ensure_ascii=False, default=dict).encode('utf-8')
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            try:
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                with open(tmp_path, 'wb') as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning("Could not write HTTP cache entry for %s: %s", url, e)
+                return
+            self._size += len(data) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _touch(self, url):
+        try:
+            os.utime(self._path(url))
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        # Trim to 90% so we don't evict again on the very next write
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except OSError:
+                continue
+        logger.debug("Evicted HTTP cache entries, %s bytes remain", self._size)
+
+class PageStore:
+    """Content-addressed store of gzip'd page bodies.
+
+    A body is written once under its content_hash, however many URLs or
+    fetches produce it, and never rewritten.
+    """
+
+    def __init__(self, directory=DETAIL_PAGE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, body_hash):
+        return os.path.join(self.directory, body_hash[:2], f"{body_hash}.html.gz")
+
+    def put(self, text):
+        """Store a page body and return its hash."""
+        body_hash = content_hash(text)
+        path = self._path(body_hash)
+        if os.path.exists(path):
+            return body_hash
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+                file.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not store page %s: %s", body_hash, e)
+        return body_hash
+
+    def get(self, body_hash):
+        """Return a stored page body, or None."""
+        try:
+            with gzip.open(self._path(body_hash), 'rt', encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            return None
@@ -0,0 +1,496 @@
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.config import (BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN, BREAKER_THRESHOLD, CRAWL_HOST_CONCURRENCY,
+                           CRAWL_MAX_PAGES, CRAWL_MAX_WORKERS, HOST_BURST, HOST_RATE, HOST_RATE_DECREASE,
+                           HOST_RATE_INCREASE, HOST_RATE_MAX, HOST_RATE_MIN, REQUEST_TIMEOUT)
+from metrics import metrics
+from records.records import to_record
+from scraper.cache import PageCache
+from scraper.scraper import parse_jobs
+
+logger = logging.getLogger(__name__)
+
+# JobStreet marks the "Next" pagination link with rel="nofollow next"
+NEXT_LINK_PATTERN = re.compile(r'<a\b[^>]*\brel="[^"]*\bnext\b[^"]*"[^>]*>', re.IGNORECASE)
+HREF_PATTERN = re.compile(r'\bhref="([^"]+)"', re.IGNORECASE)
+
+# Responses that mean the site is pushing back, on top of the caller's is_blocked(html) check
+BLOCK_STATUSES = (403, 429)
+
+FETCH_SECONDS = metrics.histogram('scraper_fetch_seconds', 'Time from sending a results page request to its response, by host')
+RESPONSES = metrics.counter('scraper_responses_total', 'Results page responses by host and status code')
+RESPONSE_BYTES = metrics.counter('scraper_response_bytes_total', 'Results page body bytes received, by host')
+FETCH_ERRORS = metrics.counter('scraper_fetch_errors_total', 'Results page requests that got no response, by host')
+BLOCKED = metrics.counter('scraper_blocked_total', 'Responses that were a 403, 429 or challenge page, by host')
+THROTTLED = metrics.counter('scraper_throttled_total', '429 Too Many Requests responses, by host')
+CACHE_HITS = metrics.counter('scraper_cache_hits_total', 'Pages unchanged since the last fetch, answered from the page cache')
+SKIPPED = metrics.counter('scraper_pages_skipped_total', 'Pages not requested, by host and reason (robots, paused)')
+PARSE_SECONDS = metrics.histogram('scraper_parse_seconds', 'Time to parse a results page, by host')
+CARDS_PARSED = metrics.counter('scraper_cards_parsed_total', 'Jobs read from results pages, by host')
+PARSE_ERRORS = metrics.counter('scraper_parse_errors_total', 'Results pages the parser failed on, by host')
+HOST_RATE_GAUGE = metrics.gauge('scraper_host_rate', 'Adaptive requests/second allowed per host')
+HOST_PAUSED = metrics.gauge('scraper_host_paused', '1 while a host\'s circuit breaker is open')
+PAGES_IN_FLIGHT = metrics.gauge('crawler_pages_in_flight', 'Pages submitted to the crawler\'s fetch threads and not yet done')
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+def find_next_page(html, url):
+    """Return the absolute URL of the next results page, or None on the last page."""
+    match = NEXT_LINK_PATTERN.search(html)
+    if not match:
+        return None
+    href = HREF_PATTERN.search(match.group(0))
+    if not href:
+        return None
+    return urljoin(url, href.group(1).replace('&amp;', '&'))
+
+def create_session(pool_size=CRAWL_MAX_WORKERS):
+    """Create a requests session whose keep-alive pool can serve every fetch thread."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def is_block_response(response, is_blocked=None):
+    """True when a response is a 403/429 or is_blocked(html) recognizes a challenge page."""
+    return response.status_code in BLOCK_STATUSES or bool(is_blocked and is_blocked(response.text))
+
+def retry_after(response):
+    """Seconds a 429 response asks us to wait, or None."""
+    if response.status_code != 429:
+        return None
+    value = response.headers.get('Retry-After')
+    try:
+        return max(float(value), 0.0) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+def record_response(url, response, seconds, cached=None, blocked=False):
+    """Count one answered results page request in the scraper metrics."""
+    if not metrics.enabled():
+        return
+    host = urlparse(url).netloc
+    FETCH_SECONDS.observe(seconds, host=host)
+    RESPONSES.inc(host=host, status=response.status_code)
+    RESPONSE_BYTES.inc(len(response.content or b''), host=host)
+    if cached:
+        CACHE_HITS.inc(host=host)
+    if blocked:
+        BLOCKED.inc(host=host)
+    if response.status_code == 429:
+        THROTTLED.inc(host=host)
+
+class HostPaused(Exception):
+    """Raised instead of requesting a host whose circuit breaker is open."""
+
+    def __init__(self, host, remaining):
+        super().__init__(f"{host} is paused for another {remaining:.0f}s after repeated blocks")
+        self.host = host
+        self.remaining = remaining
+
+class FetchFailed(Exception):
+    """A results page fetch that failed in a way worth retrying later (network error, block, 5xx, paused host)."""
+
+class _HostState:
+    __slots__ = ('rate', 'tokens', 'updated', 'hold_until', 'blocks', 'breaker', 'open_until', 'cooldown', 'probing')
+
+    def __init__(self, rate, burst, cooldown):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.hold_until = 0.0
+        self.blocks = 0
+        self.breaker = CLOSED
+        self.open_until = 0.0
+        self.cooldown = cooldown
+        self.probing = False
+
+class HostPacer:
+    """Per-host request limits: a cap on in-flight requests, a minimum spacing,
+    and an adaptive token bucket with a circuit breaker.
+
+    The bucket starts at rate requests/second and adapts AIMD-style from
+    record(): each good response adds rate_increase, each block (403, 429,
+    challenge page) multiplies the rate by rate_decrease and honors a 429's
+    Retry-After. breaker_threshold blocks in a row open the host's breaker:
+    acquire() raises HostPaused for the cooldown, then lets one probe through.
+    A good probe closes it, a blocked one reopens it with twice the cooldown.
+    on_alert(host, state) is called whenever a breaker opens or closes.
+
+    Share one instance between every Crawler and Pipeline in the process, so
+    concurrent searches against the same site respect the limits together.
+    """
+
+    def __init__(self, host_concurrency=CRAWL_HOST_CONCURRENCY, rate=HOST_RATE, burst=HOST_BURST,
+                 min_rate=HOST_RATE_MIN, max_rate=HOST_RATE_MAX, rate_increase=HOST_RATE_INCREASE,
+                 rate_decrease=HOST_RATE_DECREASE, breaker_threshold=BREAKER_THRESHOLD,
+                 breaker_cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN, on_alert=None):
+        self.host_concurrency = host_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_increase = rate_increase
+        self.rate_decrease = rate_decrease
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.max_cooldown = max_cooldown
+        self.on_alert = on_alert
+        self._slots = {}
+        self._next = {}
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        """Return the semaphore capping in-flight requests to the URL's host."""
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._slots.get(host)
+            if slot is None:
+                slot = self._slots[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return slot
+
+    def wait(self, url, interval):
+        """Block until the URL's host may be requested again, reserving the following slot."""
+        if not interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, 0.0))
+            self._next[host] = start + interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _host(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.rate, self.burst, self.breaker_cooldown)
+        return state
+
+    def acquire(self, url):
+        """Block until the host's bucket has a token; raise HostPaused while its breaker is open."""
+        host = urlparse(url).netloc
+        while True:
+            with self._lock:
+                state = self._host(host)
+                now = time.monotonic()
+                if state.breaker != CLOSED:
+                    if now < state.open_until or state.probing:
+                        raise HostPaused(host, max(state.open_until - now, 0.0))
+                    # Cooldown is over: this request is the probe
+                    state.breaker = HALF_OPEN
+                    state.probing = True
+                    return
+
+                state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+                if now >= state.hold_until and state.tokens >= 1:
+                    state.tokens -= 1
+                    return
+                delay = max(state.hold_until - now, (1 - state.tokens) / state.rate)
+            time.sleep(delay)
+
+    def record(self, url, blocked, retry_after=None):
+        """Adapt the host's rate and breaker to the outcome of a request made after acquire()."""
+        host = urlparse(url).netloc
+        alert = None
+        with self._lock:
+            state = self._host(host)
+            now = time.monotonic()
+            probe, state.probing = state.probing, False
+            if blocked:
+                state.rate = max(self.min_rate, state.rate * self.rate_decrease)
+                state.tokens = 0.0
+                state.blocks += 1
+                if retry_after:
+                    state.hold_until = max(state.hold_until, now + retry_after)
+                if probe or (state.breaker == CLOSED and state.blocks >= self.breaker_threshold):
+                    if probe:
+                        state.cooldown = min(state.cooldown * 2, self.max_cooldown)
+                    state.breaker = OPEN
+                    state.open_until = now + max(state.cooldown, retry_after or 0)
+                    alert = OPEN
+            else:
+                state.blocks = 0
+                state.rate = min(self.max_rate, state.rate + self.rate_increase)
+                if probe:
+                    state.breaker = CLOSED
+                    state.cooldown = self.breaker_cooldown
+                    alert = CLOSED
+            snapshot = self._snapshot(state, now)
+
+        HOST_RATE_GAUGE.set(snapshot['rate'], host=host)
+        HOST_PAUSED.set(int(snapshot['breaker'] == OPEN), host=host)
+        if alert == OPEN:
+            logger.error("%s blocked %s requests in a row, pausing it for %.0fs", host, snapshot['blocks'], snapshot['paused_for'])
+        elif alert == CLOSED:
+            logger.info("%s is answering again, resuming it at %.2f requests/s", host, snapshot['rate'])
+        if alert and self.on_alert:
+            self.on_alert(host, snapshot)
+
+    def cancel(self, url):
+        """Forget a request that failed without an answer (network error); a probe is retried later."""
+        host = urlparse(url).netloc
+        with self._lock:
+            state = self._host(host)
+            if state.probing:
+                state.probing = False
+                state.breaker = OPEN
+
+    def _snapshot(self, state, now):
+        return {
+            'rate': state.rate,
+            'tokens': state.tokens,
+            'blocks': state.blocks,
+            'breaker': state.breaker,
+            'paused_for': max(state.open_until - now, 0.0) if state.breaker != CLOSED else 0.0,
+            'held_for': max(state.hold_until - now, 0.0),
+        }
+
+    def state(self, url=None):
+        """Current rate and breaker state, for one URL's host or {host: state} for every host seen."""
+        with self._lock:
+            now = time.monotonic()
+            if url is not None:
+                return self._snapshot(self._host(urlparse(url).netloc), now)
+            return {host: self._snapshot(state, now) for host, state in self._hosts.items()}
+
+class Crawler:
+    """Fetch seed URLs and their result pages concurrently, streaming parsed jobs back.
+
+    With a RobotsPolicy, disallowed pages are skipped and each host is paced
+    by its Crawl-delay/Request-rate. Every request goes through the HostPacer's
+    adaptive rate limit, and pages on a host whose breaker is open are
+    skipped. Pass a shared HostPacer to apply the per-host limits across
+    crawlers; otherwise this one gets its own.
+
+    Seeds may span several sites (scraper.sites.Site): pages on a site's host
+    use its parser, pagination rule and headers, and any other page falls
+    back to parse and find_next_page.
+
+    incomplete (a threading.Event) is set when the crawl misses pages: one
+    skipped or failed, or a next page past max_pages. Such a crawl can't tell
+    which jobs are gone from the site.
+    """
+
+    def __init__(self, parse=parse_jobs, headers=None, session=None, is_blocked=None,
+                 should_follow=None, cache=None, robots=None, pacer=None, sites=None, max_pages=CRAWL_MAX_PAGES,
+                 max_workers=CRAWL_MAX_WORKERS, host_concurrency=CRAWL_HOST_CONCURRENCY, timeout=REQUEST_TIMEOUT,
+                 incomplete=None):
+        self.parse = parse
+        self.sites = {site.host: site for site in sites or ()}
+        self.headers = headers or {}
+        self.session = session or create_session(max_workers)
+        self.is_blocked = is_blocked
+        self.should_follow = should_follow
+        self.cache = cache
+        self.robots = robots
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.pacer = pacer or HostPacer(host_concurrency)
+        self.timeout = timeout
+        self.incomplete = incomplete
+
+    def _missed_pages(self):
+        if self.incomplete is not None:
+            self.incomplete.set()
+
+    def _for_url(self, url):
+        """Return (parse, next_page, headers) for a URL, from its site when one is registered."""
+        site = self.sites.get(urlparse(url).netloc)
+        if site is None:
+            return self.parse, find_next_page, self.headers
+        return site.parse, site.next_page, dict(self.headers, **site.headers())
+
+    def fetch_page(self, url, raise_retryable=False):
+        """Fetch and parse one results page, returning (jobs, next_page_url, error).
+
+        With a cache, the request is conditional and an unchanged page reuses
+        the last parse result. should_follow(jobs) can veto the next page,
+        e.g. when the page holds nothing new. A page that was skipped or failed
+        gives no jobs and an error saying why (None for a page that was read),
+        unless raise_retryable is set and a later attempt could succeed, in
+        which case FetchFailed is raised.
+        """
+        def failed(reason, retryable=True):
+            if raise_retryable and retryable:
+                raise FetchFailed(reason)
+            return [], None, reason
+
+        parse, next_page, headers = self._for_url(url)
+        host = urlparse(url).netloc
+        if self.robots:
+            user_agent = headers.get('User-Agent', '*')
+            if not self.robots.allowed(url, user_agent):
+                logger.warning("robots.txt disallows %s, skipping it.", url)
+                SKIPPED.inc(host=host, reason='robots')
+                return [], None, 'disallowed by robots.txt'
+            self.pacer.wait(url, self.robots.crawl_delay(url, user_agent))
+
+        entry = self.cache.get(url, parse) if self.cache else None
+        headers = dict(headers, **PageCache.request_headers(entry))
+        try:
+            self.pacer.acquire(url)
+        except HostPaused as e:
+            logger.warning("Skipping %s: %s", url, e)
+            SKIPPED.inc(host=host, reason='paused')
+            return failed(str(e))
+        try:
+            with self.pacer.slot(url):
+                start = time.perf_counter()
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.pacer.cancel(url)
+            FETCH_ERRORS.inc(host=host)
+            logger.error("Error fetching %s: %s", url, e)
+            return failed(str(e))
+
+        cached = self.cache.match(url, entry, response) if self.cache else None
+        blocked = not cached and is_block_response(response, self.is_blocked)
+        record_response(url, response, time.perf_counter() - start, cached, blocked)
+        self.pacer.record(url, blocked, retry_after(response))
+        if cached:
+            logger.debug("%s is unchanged, reusing the cached parse", url)
+            jobs, next_url = [to_record(job) for job in cached['jobs']], cached['next_url']
+        else:
+            if blocked:
+                logger.warning("%s was blocked (status %s)", url, response.status_code)
+                return failed(f"blocked (status {response.status_code})")
+            if response.status_code != 200:
+                logger.error("Failed to fetch %s. Status Code: %s", url, response.status_code)
+                return failed(f"status {response.status_code}", response.status_code >= 500)
+
+            try:
+                with PARSE_SECONDS.time(host=host):
+                    jobs = parse(response.text)
+            except Exception as e:
+                PARSE_ERRORS.inc(host=host)
+                logger.error("Error parsing %s: %s", url, e)
+                return [], None, f"parse error: {e}"
+            CARDS_PARSED.inc(len(jobs), host=host)
+            next_url = next_page(response.text, url)
+            if self.cache:
+                self.cache.put(url, parse, response, jobs, next_url)
+
+        if next_url and self.should_follow and not self.should_follow(jobs):
+            logger.info("Every job on %s is already known, not following its next page.", url)
+            return jobs, None, None
+        return jobs, next_url, None
+
+    def crawl(self, seed_urls):
+        """Yield jobs from every seed URL and its following pages as each page completes."""
+        visited = set()
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crawler') as pool:
+            def submit(url, page):
+                visited.add(url)
+                pending[pool.submit(self.fetch_page, url)] = (url, page)
+
+            for url in seed_urls:
+                if url not in visited:
+                    submit(url, 1)
+
+            try:
+                while pending:
+                    PAGES_IN_FLIGHT.set(len(pending))
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, page = pending.pop(future)
+                        try:
+                            jobs, next_url, error = future.result()
+                        except Exception as e:
+                            # One bad page (parser, cache or known-id lookup) must not end the other seeds' crawls
+                            logger.error("Error crawling %s: %s", url, e)
+                            self._missed_pages()
+                            continue
+                        if error:
+                            self._missed_pages()
+                        logger.debug("Crawled %s (page %s): %s jobs", url, page, len(jobs))
+
+                        if next_url and next_url not in visited:
+                            if page < self.max_pages:
+                                submit(next_url, page + 1)
+                            else:
+                                logger.info("Stopping at %s: the crawl reached %s pages.", url, self.max_pages)
+                                self._missed_pages()
+                        yield from jobs
+            finally:
+                # The consumer may stop early; don't start pages nobody will read
+                for future in pending:
+                    future.cancel()
+                PAGES_IN_FLIGHT.set(0)
+
+    def crawl_frontier(self, frontier, search, owner):
+        """Crawl the pages of search queued on a durable Frontier, yielding each page's jobs.
+
+        Pages are claimed in batches as fetch threads free up, and next pages
+        go back on the frontier. A page is marked done only once the consumer
+        asks for the next one, so whatever it does with the jobs (store them)
+        happens first; a page a crash interrupted is crawled again. Failed
+        fetches are retried through the frontier; a page that can't succeed
+        (e.g. disallowed, or a 404) or a next page past max_pages marks the run
+        cut short. Stops when nothing is left to claim; pages other workers
+        hold stay theirs.
+        """
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='crawler') as pool:
+                try:
+                    while True:
+                        free = self.max_workers - len(pending)
+                        if free:
+                            for url, page in frontier.claim(search, owner, free):
+                                pending[pool.submit(self.fetch_page, url, True)] = (url, page)
+                        if not pending:
+                            delay = frontier.next_retry(search)
+                            if delay is None:
+                                return
+                            time.sleep(delay)
+                            continue
+
+                        PAGES_IN_FLIGHT.set(len(pending))
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            url, page = pending.pop(future)
+                            try:
+                                jobs, next_url, error = future.result()
+                            except Exception as e:
+                                if not isinstance(e, FetchFailed):
+                                    logger.error("Error crawling %s: %s", url, e)
+                                frontier.retry(search, url, str(e))
+                                continue
+                            logger.debug("Crawled %s (page %s): %s jobs", url, page, len(jobs))
+
+                            if next_url and page < self.max_pages:
+                                frontier.add(search, next_url, page + 1)
+                            elif error or next_url:
+                                logger.info("Search %s missed pages at %s: %s", search, url,
+                                            error or f"the crawl reached {self.max_pages} pages")
+                                frontier.mark_cut_short(search)
+                            yield jobs
+                            frontier.complete(search, url, len(jobs))
+                finally:
+                    for future in pending:
+                        future.cancel()
+        finally:
+            # Pages still leased to us were never finished; let the next claim have them now
+            frontier.release(search, owner)
+            PAGES_IN_FLIGHT.set(0)
+
+def crawl(seed_urls, **kwargs):
+    """Convenience wrapper to crawl seed URLs with a one-off Crawler."""
+    return Crawler(**kwargs).crawl(seed_urls)
@@ -0,0 +1,55 @@
+import re
+
+from bs4 import BeautifulSoup
+
+from database.normalize import parse_listing_date
+from scraper.scraper import _app_state_classification, find_app_state
+
+# "Electrical/Electronic Engineering (Engineering)": the subclassification, then its classification
+CLASSIFICATION_PATTERN = re.compile(r'^(.*?)\s*\(([^()]+)\)\s*$')
+
+def _text(html):
+    return BeautifulSoup(html, 'html.parser').get_text('\n', strip=True) or None
+
+def _detail_from_app_state(html, now):
+    state = find_app_state(html)
+    try:
+        job = state['jobdetails']['result']['job']
+    except (KeyError, TypeError):
+        return None
+    category, sub_category = _app_state_classification(job)
+    tracking = (job.get('tracking') or {}).get('classificationInfo') or {}
+    listed = job.get('listedAt') or {}
+    return {
+        'jobDescription': _text(job['content']) if job.get('content') else None,
+        'jobCategory': category or tracking.get('classification'),
+        'jobSubCategory': sub_category or tracking.get('subClassification'),
+        'listed_at': parse_listing_date(listed.get('dateTimeUtc') or listed.get('label'), now),
+    }
+
+def _detail_from_html(html, now):
+    soup = BeautifulSoup(html, 'html.parser')
+    find = lambda automation: soup.find(attrs={'data-automation': automation})
+    description = find('jobAdDetails')
+    classification = find('job-detail-classifications')
+    posted = find('job-detail-date')
+
+    category = sub_category = None
+    if classification:
+        text = classification.get_text(' ', strip=True)
+        match = CLASSIFICATION_PATTERN.match(text)
+        sub_category, category = match.groups() if match else (None, text or None)
+    return {
+        'jobDescription': (description.get_text('\n', strip=True) or None) if description else None,
+        'jobCategory': category,
+        'jobSubCategory': sub_category,
+        'listed_at': parse_listing_date(posted.get_text(' ', strip=True), now) if posted else None,
+    }
+
+def parse_job_detail(html, now=None):
+    """Read a job detail page: {'jobDescription', 'jobCategory', 'jobSubCategory', 'listed_at'}.
+
+    Uses the page's embedded app state when present, otherwise its
+    data-automation elements. Values the page doesn't show are None.
+    """
+    return _detail_from_app_state(html, now) or _detail_from_html(html, now)
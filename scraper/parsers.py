@@ -0,0 +1,291 @@
+import logging
+from collections import namedtuple
+from functools import lru_cache
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from config.config import PARSER_ENGINE
+from records.records import JobRecord
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:  # Optional fast engine
+    SelectolaxParser = None
+
+try:
+    import lxml.html
+except ImportError:  # Optional fast engine
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+CARD_AUTOMATION = "normalJob"
+
+# Tags html.parser never expects a closing tag for (same list BeautifulSoup uses)
+VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'menuitem',
+    'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound', 'command', 'frame',
+    'image', 'isindex', 'nextid', 'spacer',
+))
+# BeautifulSoup leaves script/style strings out of get_text()
+NON_TEXT_TAGS = frozenset(('script', 'style'))
+
+# One data-automation element inside a card. `text` matches get_text(strip=True).
+Element = namedtuple('Element', ['tag', 'text', 'href'])
+
+# A job field read from a card: the text of its first (or, with `every`, all) <tag data-automation=...>,
+# passed through `clean` when set
+Field = namedtuple('Field', ['name', 'tag', 'automation', 'every', 'default', 'clean'],
+                   defaults=(False, "N/A", None))
+
+def replace_nbsp(text):
+    return text.replace(u'\xa0', ' ')
+
+JOBSTREET_CARD_FIELDS = (
+    Field('jobTitle', 'a', 'jobTitle'),
+    Field('jobCompany', 'a', 'jobCompany'),
+    Field('jobLocation', 'a', 'jobLocation', every=True),
+    Field('jobSalary', 'span', 'jobSalary', default="Not Specified", clean=replace_nbsp),
+)
+
+# Engine-specific card selectors, compiled once per card type by compile_selectors()
+Selectors = namedtuple('Selectors', ['css', 'xpath', 'xpath_fields'])
+
+class Card:
+    """The data-automation elements of one job card, in document order."""
+
+    __slots__ = ('elements',)
+
+    def __init__(self):
+        self.elements = {}
+
+    def add(self, automation, element):
+        self.elements.setdefault(automation, []).append(element)
+
+    def find(self, tag, automation):
+        """Return the first element with this tag and data-automation value, or None."""
+        for element in self.elements.get(automation, ()):
+            if element.tag == tag:
+                return element
+        return None
+
+    def find_all(self, tag, automation):
+        """Return every element with this tag and data-automation value."""
+        return [element for element in self.elements.get(automation, ()) if element.tag == tag]
+
+    def __eq__(self, other):
+        return isinstance(other, Card) and self.elements == other.elements
+
+    def __repr__(self):
+        return f"Card({self.elements!r})"
+
+@lru_cache(maxsize=None)
+def compile_selectors(card_automation=CARD_AUTOMATION):
+    """Build the selectors for one card type; later calls return the same compiled objects."""
+    css = f"[data-automation='{card_automation}']"
+    if lxml is None:
+        return Selectors(css, None, None)
+    return Selectors(css, lxml.etree.XPath(f"//*[@data-automation='{card_automation}']"),
+                     lxml.etree.XPath(".//*[@data-automation]"))
+
+def parse_cards_bs4(html, card_automation=CARD_AUTOMATION):
+    """Reference engine: full BeautifulSoup html.parser tree."""
+    cards = []
+    for job in BeautifulSoup(html, "html.parser").select(compile_selectors(card_automation).css):
+        card = Card()
+        for node in job.find_all(attrs={'data-automation': True}):
+            card.add(node['data-automation'], Element(node.name, node.get_text(strip=True), node.get('href')))
+        cards.append(card)
+    return cards
+
+def parse_cards_selectolax(html, card_automation=CARD_AUTOMATION):
+    """Fast engine backed by selectolax (lexbor)."""
+    cards = []
+    for job in SelectolaxParser(html).css(compile_selectors(card_automation).css):
+        card = Card()
+        for node in job.css("[data-automation]"):
+            if node.mem_id == job.mem_id:
+                continue  # lexbor's css() includes the card node itself
+            text = "".join(
+                child.text(deep=False, strip=True) for child in node.traverse(include_text=True)
+                if child.tag == '-text' and child.parent.tag not in NON_TEXT_TAGS
+            )
+            card.add(node.attributes['data-automation'], Element(node.tag, text, node.attributes.get('href')))
+        cards.append(card)
+    return cards
+
+def _lxml_text(node):
+    parts = []
+    for child in node.iter():
+        if not isinstance(child.tag, str):
+            # Comments and processing instructions only contribute their tail
+            if child is not node and child.tail:
+                parts.append(child.tail.strip())
+            continue
+        if child.text and child.tag not in NON_TEXT_TAGS:
+            parts.append(child.text.strip())
+        if child is not node and child.tail:
+            parts.append(child.tail.strip())
+    return "".join(parts)
+
+def parse_cards_lxml(html, card_automation=CARD_AUTOMATION):
+    """Fast engine backed by libxml2."""
+    selectors = compile_selectors(card_automation)
+    cards = []
+    for job in selectors.xpath(lxml.html.fromstring(html)):
+        card = Card()
+        for node in selectors.xpath_fields(job):
+            card.add(node.get('data-automation'), Element(node.tag, _lxml_text(node), node.get('href')))
+        cards.append(card)
+    return cards
+
+class _CardStreamParser(HTMLParser):
+    """Streaming html.parser handler that only tracks elements inside job cards.
+
+    Outside a card every tag is a single attribute check; no tree is built.
+    Inside a card it keeps a small open-element stack so text can be routed
+    to every data-automation element that is still open.
+    """
+
+    def __init__(self, card_automation=CARD_AUTOMATION):
+        super().__init__(convert_charrefs=True)
+        self.card_automation = card_automation
+        self.cards = []
+        self._card = None
+        self._stack = []
+        self._open = []
+        self._skip_text = 0
+
+    def handle_starttag(self, tag, attrs):
+        automation = None
+        href = None
+        for name, value in attrs:
+            if name == 'data-automation':
+                automation = value
+            elif name == 'href':
+                href = value
+
+        if self._card is None:
+            if automation == self.card_automation and tag not in VOID_TAGS:
+                self._card = Card()
+                self._stack.append((tag, None))
+            return
+
+        if automation is not None:
+            parts = []
+            self._card.add(automation, (tag, parts, href))
+        else:
+            parts = None
+        if tag in VOID_TAGS:
+            return
+        if tag in NON_TEXT_TAGS:
+            self._skip_text += 1
+        self._stack.append((tag, parts))
+        if parts is not None:
+            self._open.append(parts)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._card is None:
+            return
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                break
+        else:
+            return  # Stray end tag, html.parser ignores it too
+
+        while len(self._stack) > index:
+            open_tag, parts = self._stack.pop()
+            if parts is not None:
+                self._open.pop()
+            if open_tag in NON_TEXT_TAGS:
+                self._skip_text -= 1
+
+        if not self._stack:
+            self._finish_card()
+
+    def handle_data(self, data):
+        if self._open and not self._skip_text:
+            text = data.strip()
+            if text:
+                for parts in self._open:
+                    parts.append(text)
+
+    def close(self):
+        super().close()
+        if self._card is not None:
+            self._finish_card()
+
+    def _finish_card(self):
+        card = self._card
+        for automation, elements in card.elements.items():
+            card.elements[automation] = [Element(tag, "".join(parts), href) for tag, parts, href in elements]
+        self.cards.append(card)
+        self._card = None
+        self._stack = []
+        self._open = []
+        self._skip_text = 0
+
+def parse_cards_stream(html, card_automation=CARD_AUTOMATION):
+    """Pure-stdlib engine that streams through the page without building a tree."""
+    parser = _CardStreamParser(card_automation)
+    parser.feed(html)
+    parser.close()
+    return parser.cards
+
+ENGINES = {
+    'selectolax': parse_cards_selectolax,
+    'lxml': parse_cards_lxml,
+    'stream': parse_cards_stream,
+    'bs4': parse_cards_bs4,
+}
+
+def available_engines():
+    """Return the names of the engines usable in this environment, fastest first."""
+    names = []
+    if SelectolaxParser is not None:
+        names.append('selectolax')
+    if lxml is not None:
+        names.append('lxml')
+    names += ['stream', 'bs4']
+    return names
+
+def get_engine(name=None):
+    """Resolve an engine name ("auto" picks the fastest installed) to its parse function."""
+    name = name or PARSER_ENGINE
+    if name == 'auto':
+        name = available_engines()[0]
+    if name not in available_engines():
+        raise ValueError(f"Unknown or unavailable parser engine: {name}")
+    return ENGINES[name]
+
+def parse_cards(html, engine=None, card_automation=CARD_AUTOMATION):
+    """Return the job cards found in a results page."""
+    return get_engine(engine)(html, card_automation)
+
+def read_card(card, base_url, fields=JOBSTREET_CARD_FIELDS, link_field='jobTitle'):
+    """Turn a Card into a job record using the site's field extractors.
+
+    jobURL is the link_field element's href, resolved against base_url.
+    """
+    job_info = JobRecord()
+    for field in fields:
+        if field.every:
+            elements = card.find_all(field.tag, field.automation)
+            text = ", ".join(element.text for element in elements) if elements else None
+        else:
+            element = card.find(field.tag, field.automation)
+            text = element.text if element else None
+        if text is None:
+            text = field.default
+        job_info[field.name] = field.clean(text) if field.clean else text
+
+    link = next((card.find(field.tag, field.automation) for field in fields if field.name == link_field), None)
+    job_info['jobURL'] = urljoin(base_url, link.href) if link and link.href else "N/A"
+    return job_info
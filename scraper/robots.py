@@ -1,15 +1,108 @@
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 from urllib.robotparser import RobotFileParser
 import logging
+import threading
+import time
+
+import requests
+
+from config.config import REQUEST_TIMEOUT, ROBOTS_ERROR_TTL, ROBOTS_TTL
 
 logger = logging.getLogger(__name__)
 
+class RobotsPolicy:
+    """Per-host robots.txt rules, fetched at most once per TTL and shared by every thread.
+
+    A missing robots.txt (404 and other 4xx) allows everything, a 401/403
+    disallows everything, and a network error or 5xx allows everything but is
+    only trusted for ROBOTS_ERROR_TTL so the real file is picked up soon.
+    """
+
+    def __init__(self, session=None, ttl=ROBOTS_TTL, error_ttl=ROBOTS_ERROR_TTL, timeout=REQUEST_TIMEOUT):
+        self.session = session or requests.Session()
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self._hosts = {}
+        self._host_locks = {}
+        self._lock = threading.Lock()
+
+    def _host_lock(self, origin):
+        with self._lock:
+            lock = self._host_locks.get(origin)
+            if lock is None:
+                lock = self._host_locks[origin] = threading.Lock()
+            return lock
+
+    def rules(self, url):
+        """Return the RobotFileParser for the URL's host, fetching it if stale."""
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        cached = self._hosts.get(origin)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        # One fetch per host, even when many threads ask at once
+        with self._host_lock(origin):
+            cached = self._hosts.get(origin)
+            if cached and cached[1] > time.monotonic():
+                return cached[0]
+            parser, ttl = self._fetch(urljoin(origin, '/robots.txt'))
+            self._hosts[origin] = (parser, time.monotonic() + ttl)
+            return parser
+
+    def _fetch(self, robots_url):
+        parser = RobotFileParser(robots_url)
+        ttl = self.ttl
+        try:
+            response = self.session.get(robots_url, timeout=self.timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            logger.warning("Could not fetch %s: %s", robots_url, e)
+            status = None
+
+        if status == 200:
+            parser.parse(response.text.splitlines())
+        elif status in (401, 403):
+            parser.disallow_all = True
+        elif status is not None and status < 500:
+            parser.allow_all = True
+        else:
+            parser.allow_all = True
+            ttl = min(self.ttl, self.error_ttl)
+        parser.modified()
+        logger.debug("Loaded %s (status %s), caching for %ss", robots_url, status, ttl)
+        return parser, ttl
+
+    def allowed(self, url, user_agent='*'):
+        """True if robots.txt lets user_agent fetch the URL."""
+        allowed = self.rules(url).can_fetch(user_agent, url)
+        logger.debug("Checking robots.txt for URL: %s - Allowed: %s", url, allowed)
+        return allowed
+
+    def crawl_delay(self, url, user_agent='*'):
+        """Seconds to leave between requests to the URL's host, from Crawl-delay or Request-rate."""
+        parser = self.rules(url)
+        delays = [0.0]
+        crawl_delay = parser.crawl_delay(user_agent)
+        if crawl_delay:
+            delays.append(float(crawl_delay))
+        request_rate = parser.request_rate(user_agent)
+        if request_rate and request_rate.requests:
+            delays.append(request_rate.seconds / request_rate.requests)
+        return max(delays)
+
+_shared_policy = None
+_shared_lock = threading.Lock()
+
+def shared_policy():
+    """Return the process-wide RobotsPolicy."""
+    global _shared_policy
+    with _shared_lock:
+        if _shared_policy is None:
+            _shared_policy = RobotsPolicy()
+        return _shared_policy
+
 def is_allowed_by_robots(url, user_agent, base_url):
     """Check if the URL is allowed based on robots.txt rules."""
-    robot_parser = RobotFileParser()
-    robots_url = urljoin(base_url, '/robots.txt')
-    robot_parser.set_url(robots_url)
-    robot_parser.read()
-    allowed = robot_parser.can_fetch(user_agent, url)
-    logger.debug("Checking robots.txt for URL: %s - Allowed: %s", url, allowed)
-    return allowed
+    return shared_policy().allowed(urljoin(base_url, url), user_agent)
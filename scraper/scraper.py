@@ -1,26 +1,133 @@
 import requests
 import csv
-from bs4 import BeautifulSoup
 import json
 import logging
 import os
-from collections import OrderedDict
+import re
 from hashlib import sha256
 from urllib.parse import urljoin
 
+from config.config import APP_STATE_EXTRACTION, DEBUG_DUMP_HTML, USER_AGENT
+from records.records import JobRecord
+from scraper.cache import PageCache
+from scraper.parsers import parse_cards, read_card
+
 # --- CONFIGURATION ---
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-BASE_URL = "https://my.jobstreet.com"
+BASE_URL = "https://my.jobstreet.com" # The jobstreet-my site (scraper/sites.py registers the others)
+
+# JobStreet ships the full search result set as JSON in a server-state script tag
+APP_STATE_MARKER = "window.SEEK_REDUX_DATA"
+# The blob is a JavaScript literal, so it can contain a bare `undefined`
+UNDEFINED_PATTERN = re.compile(r'(?<=[:\[,])undefined(?=[,\]}])')
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
 
 def generate_hashed_id(job_info):
-    raw_id = f"{job_info.get('jobTitle', '')}|{job_info.get('jobCompany', '')}"
+    # Location too, so one company's identical openings in two cities stay apart; every site shares this id
+    raw_id = f"{job_info.get('jobTitle', '')}|{job_info.get('jobCompany', '')}|{job_info.get('jobLocation', '')}"
     return sha256(raw_id.encode('utf-8')).hexdigest()
 
-def fetch_data(url):
+def find_app_state(html):
+    """Decode the embedded app-state JSON, or return None if the page has none."""
+    start = html.find(APP_STATE_MARKER)
+    if start == -1:
+        return None
+    start = html.find("=", start + len(APP_STATE_MARKER)) + 1
+    while html[start:start + 1].isspace():
+        start += 1
+
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(html, start)[0]
+    except ValueError:
+        pass
+
+    end = html.find("</script>", start)
+    blob = UNDEFINED_PATTERN.sub("null", html[start:end] if end != -1 else html[start:])
+    try:
+        return decoder.raw_decode(blob)[0]
+    except ValueError as e:
+        logger.warning("Could not decode embedded app state: %s", e)
+        return None
+
+def _app_state_location(job):
+    labels = [location.get('label') for location in job.get('locations') or () if location.get('label')]
+    if labels:
+        return ", ".join(labels)
+    return ", ".join(part for part in (job.get('suburb'), job.get('location')) if part)
+
+def _app_state_classification(job):
+    classifications = job.get('classifications') or ()
+    if classifications:
+        first = classifications[0]
+        return (first.get('classification') or {}).get('description'), (first.get('subclassification') or {}).get('description')
+    return (job.get('classification') or {}).get('description'), (job.get('subClassification') or {}).get('description')
+
+def parse_app_state_jobs(html, make_id=generate_hashed_id, base_url=BASE_URL):
+    """Build job records straight from the embedded app-state JSON, without a DOM.
+
+    Returns None when the page carries no usable state so the caller can fall
+    back to scraping the job cards.
+    """
+    state = find_app_state(html)
+    try:
+        results = state['results']['results']['jobs']
+    except (KeyError, TypeError):
+        return None
+
+    job_data = []
+    for job in results:
+        try:
+            job_info = JobRecord()
+            category, sub_category = _app_state_classification(job)
+
+            job_info['jobTitle'] = (job.get('title') or "N/A").strip()
+            job_info['jobCompany'] = ((job.get('advertiser') or {}).get('description') or job.get('companyName') or "N/A").strip()
+            job_info['jobLocation'] = _app_state_location(job) or "N/A"
+            salary_text = (job.get('salaryLabel') or job.get('salary') or "Not Specified").strip()
+            job_info['jobSalary'] = salary_text.replace(u'\xa0', ' ')
+            job_info['jobCategory'] = category or "N/A"
+            job_info['jobSubCategory'] = sub_category or "N/A"
+            job_info['jobListingDate'] = job.get('listingDate') or "N/A"
+            job_info['jobURL'] = urljoin(base_url, f"/job/{job['id']}")
+
+            job_info['uniqueId'] = make_id(job_info)
+            job_data.append(job_info)
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.debug("Skipping malformed app-state job: %s", e)
+            continue
+
+    return job_data
+
+def parse_jobs(html):
+    if APP_STATE_EXTRACTION:
+        job_data = parse_app_state_jobs(html)
+        if job_data:
+            print(f"👀 Found {len(job_data)} jobs in the embedded app state.")
+            return job_data
+
+    # Try finding job cards
+    job_listings = parse_cards(html)
+    print(f"👀 Found {len(job_listings)} raw job elements.")
+
+    if not job_listings:
+        print("❌ No jobs found. This usually means Cloudflare blocked you.")
+        return []
+
+    job_data = []
+    for job in job_listings:
+        try:
+            job_info = read_card(job, BASE_URL)
+            job_info['uniqueId'] = generate_hashed_id(job_info)
+            job_data.append(job_info)
+
+        except Exception as e:
+            print(f"Error parsing a card: {e}")
+            continue
+
+    return job_data
+
+def fetch_data(url, cache=None):
     # --- 🔴 PASTE COOKIE HERE 🔴 ---
     headers = {
         'User-Agent': USER_AGENT,
@@ -32,52 +139,31 @@ def fetch_data(url):
 
     print(f"🔎 Fetching URL: {url}...")
 
+    # With a PageCache the request is conditional and unchanged pages are not re-parsed
+    entry = cache.get(url, parse_jobs) if cache else None
+    headers.update(PageCache.request_headers(entry))
+
     try:
         response = requests.get(url=url, headers=headers, timeout=10)
         print(f"📡 Status Code: {response.status_code}")
 
+        cached = cache.match(url, entry, response) if cache else None
+        if cached:
+            print("♻️ Page unchanged since the last fetch, reusing cached jobs.")
+            return cached['jobs']
+
         # DEBUG STEP: Save the raw HTML to see what we actually got
-        with open("debug_page.html", "w", encoding="utf-8") as f:
-            f.write(response.text)
-        print("📝 Saved 'debug_page.html'. Open this file in Chrome to see if you were blocked!")
+        if DEBUG_DUMP_HTML:
+            with open("debug_page.html", "w", encoding="utf-8") as f:
+                f.write(response.text)
+            print("📝 Saved 'debug_page.html'. Open this file in Chrome to see if you were blocked!")
 
         if response.status_code != 200:
             return []
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Try finding job cards
-        job_listings = soup.select("[data-automation='normalJob']")
-        print(f"👀 Found {len(job_listings)} raw job elements.")
-
-        if not job_listings:
-            print("❌ No jobs found. This usually means Cloudflare blocked you.")
-            return []
-
-        job_data = []
-        for job in job_listings:
-            job_info = OrderedDict()
-            try:
-                # Basic Parsing
-                title_tag = job.find('a', {'data-automation': 'jobTitle'})
-                company_tag = job.find('a', {'data-automation': 'jobCompany'})
-                
-                job_info['jobTitle'] = title_tag.get_text(strip=True) if title_tag else "N/A"
-                job_info['jobCompany'] = company_tag.get_text(strip=True) if company_tag else "N/A"
-                
-                # Get Link
-                if title_tag and title_tag.get('href'):
-                    job_info['jobURL'] = urljoin(BASE_URL, title_tag.get('href'))
-                else:
-                    job_info['jobURL'] = "N/A"
-
-                job_info['uniqueId'] = generate_hashed_id(job_info)
-                job_data.append(job_info)
-
-            except Exception as e:
-                print(f"Error parsing a card: {e}")
-                continue
-
+        job_data = parse_jobs(response.text)
+        if cache:
+            cache.put(url, parse_jobs, response, job_data, None)
         return job_data
 
     except Exception as e:
@@ -102,6 +188,9 @@ def save_to_csv(job_data):
         print(f"❌ Failed to write CSV: {e}")
 
 if __name__ == "__main__":
+    # Setup logging
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # 1. Test File Creation Permission
     try:
         with open("test_permission.csv", "w") as f:
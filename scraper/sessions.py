@@ -0,0 +1,165 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from hashlib import sha256
+
+import requests
+
+from config.config import (CRAWL_MAX_WORKERS, SESSION_COOKIE_FILE, SESSION_RETIRE_TTL, SESSION_USER_AGENTS)
+from scraper.crawler import create_session
+
+logger = logging.getLogger(__name__)
+
+class NoHealthySession(requests.RequestException):
+    """Every session in the pool has been retired."""
+
+def parse_cookie_header(cookie):
+    """Split a browser "a=1; b=2" Cookie header into {name: value}."""
+    cookies = {}
+    for part in (cookie or '').split(';'):
+        name, sep, value = part.strip().partition('=')
+        if sep and name:
+            cookies[name] = value
+    return cookies
+
+def cookies_from_env():
+    """Seed cookies: one per line in JOBSTREET_COOKIES, or the single JOBSTREET_COOKIE."""
+    cookies = [line.strip() for line in os.environ.get("JOBSTREET_COOKIES", "").splitlines() if line.strip()]
+    if not cookies and os.environ.get("JOBSTREET_COOKIE"):
+        cookies = [os.environ["JOBSTREET_COOKIE"].strip()]
+    return cookies
+
+class PooledSession:
+    """One identity: a requests.Session with its own cookie jar and user agent."""
+
+    def __init__(self, key, user_agent, pool_size):
+        self.key = key
+        self.user_agent = user_agent
+        self.session = create_session(pool_size)
+        self.retired_at = None
+        self.requests = 0
+
+    def cookies(self):
+        return [
+            {'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path, 'expires': c.expires, 'secure': c.secure}
+            for c in self.session.cookies
+        ]
+
+    def load_cookies(self, cookies):
+        self.session.cookies.clear()
+        for c in cookies:
+            self.session.cookies.set(c['name'], c['value'], domain=c.get('domain', ''), path=c.get('path', '/'),
+                                     expires=c.get('expires'), secure=c.get('secure', False))
+
+class SessionPool:
+    """Spread requests over several sessions and retire the ones that hit a captcha.
+
+    Each seed cookie (a browser Cookie header) becomes its own session, with
+    its own cookie jar and the next user agent from user_agents; cookies
+    are only ever sent with the user agent they were issued to. get() rotates
+    round-robin over the healthy sessions, so the pool is a drop-in for the
+    requests.Session the Crawler and Pipeline use. A response that
+    is_blocked(html) recognizes retires its session for retire_ttl seconds;
+    once every session is retired, get() raises NoHealthySession.
+
+    Cookies refreshed by the site (Set-Cookie) and retirements are saved to
+    cookie_file, keyed by a hash of the seed cookie, and restored on the next
+    start as long as the seed cookie is unchanged.
+    """
+
+    def __init__(self, cookies=None, user_agents=SESSION_USER_AGENTS, is_blocked=None,
+                 cookie_file=SESSION_COOKIE_FILE, retire_ttl=SESSION_RETIRE_TTL, pool_size=CRAWL_MAX_WORKERS):
+        cookies = list(cookies if cookies is not None else cookies_from_env())
+        if not cookies:
+            logger.error("No session cookies configured (JOBSTREET_COOKIE/JOBSTREET_COOKIES), expect to be blocked.")
+            cookies = ['']
+        self.is_blocked = is_blocked
+        self.cookie_file = cookie_file
+        self.retire_ttl = retire_ttl
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self.members = []
+        for index, cookie in enumerate(cookies):
+            member = PooledSession(sha256(cookie.encode('utf-8')).hexdigest()[:16],
+                                   user_agents[index % len(user_agents)], pool_size)
+            for name, value in parse_cookie_header(cookie).items():
+                member.session.cookies.set(name, value)
+            self.members.append(member)
+        self._load()
+
+    def _load(self):
+        if not self.cookie_file:
+            return
+        try:
+            with open(self.cookie_file, 'r', encoding='utf-8') as file:
+                saved = json.load(file)
+        except (OSError, ValueError):
+            return
+        for member in self.members:
+            state = saved.get(member.key)
+            if state:
+                member.load_cookies(state.get('cookies', []))
+                member.retired_at = state.get('retired_at')
+
+    def save(self):
+        """Write every session's cookies and retirement to cookie_file."""
+        if not self.cookie_file:
+            return
+        with self._lock:
+            state = {member.key: {'cookies': member.cookies(), 'retired_at': member.retired_at} for member in self.members}
+        directory = os.path.dirname(self.cookie_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cookie_file}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(state, file)
+            os.replace(tmp_path, self.cookie_file)
+        except OSError as e:
+            logger.warning("Could not save session cookies: %s", e)
+
+    def healthy(self):
+        """Sessions not currently retired (a retirement lapses after retire_ttl)."""
+        now = time.time()
+        return [m for m in self.members if m.retired_at is None or now - m.retired_at >= self.retire_ttl]
+
+    def _next(self):
+        with self._lock:
+            healthy = self.healthy()
+            if not healthy:
+                raise NoHealthySession("Every session has been retired after hitting a captcha")
+            member = healthy[next(self._turn) % len(healthy)]
+            member.retired_at = None
+            member.requests += 1
+            return member
+
+    def retire(self, member):
+        with self._lock:
+            member.retired_at = time.time()
+            remaining = len(self.healthy())
+        logger.error("Session %s hit a captcha and was retired (%s healthy left).", member.key, remaining)
+        self.save()
+
+    def get(self, url, headers=None, timeout=None, **kwargs):
+        """GET url on the next healthy session, with that session's user agent."""
+        member = self._next()
+        headers = dict(headers or {})
+        headers.pop('Cookie', None)  # The session's own jar provides cookies
+        headers['User-Agent'] = member.user_agent
+        before = member.cookies()
+        response = member.session.get(url, headers=headers, timeout=timeout, **kwargs)
+
+        if self.is_blocked and self.is_blocked(response.text):
+            self.retire(member)
+        elif member.cookies() != before:
+            self.save()
+        return response
+
+    def stats(self):
+        """Per-session request counts and health, for logging."""
+        healthy = {m.key for m in self.healthy()}
+        return [{'key': m.key, 'user_agent': m.user_agent, 'requests': m.requests, 'healthy': m.key in healthy}
+                for m in self.members]
@@ -0,0 +1,122 @@
+import logging
+import re
+from urllib.parse import quote, urlparse
+
+from config.config import APP_STATE_EXTRACTION, SITES
+from scraper.crawler import find_next_page
+from scraper.parsers import CARD_AUTOMATION, JOBSTREET_CARD_FIELDS, compile_selectors, parse_cards, read_card
+from scraper.scraper import BASE_URL, generate_hashed_id, parse_app_state_jobs
+
+logger = logging.getLogger(__name__)
+
+SLUG_PATTERN = re.compile(r'[^\w]+')
+
+def slugify(text):
+    """Turn "Electrical Engineering, Intern" into the URL slug "Electrical-Engineering-Intern"."""
+    return quote(SLUG_PATTERN.sub('-', text.strip()).strip('-'))
+
+class Site:
+    """A job board: how to build its search URLs, follow its result pages and read them.
+
+    search_path and location_path are formatted with the slugified keywords
+    and location. card_fields are the field extractors read from each job
+    card (see scraper.parsers.read_card); the card selectors are compiled once,
+    when the site is created. Sites hold only plain values, so site.parse can
+    be sent to the asyncio pipeline's parser processes.
+    """
+
+    def __init__(self, name, base_url, search_path='/{keywords}-jobs', location_path='/in-{location}',
+                 page_param='page', card_automation=CARD_AUTOMATION, card_fields=JOBSTREET_CARD_FIELDS,
+                 app_state=True, user_agent=None):
+        self.name = name
+        self.base_url = base_url
+        self.host = urlparse(base_url).netloc
+        self.search_path = search_path
+        self.location_path = location_path
+        self.page_param = page_param
+        self.card_automation = card_automation
+        self.card_fields = card_fields
+        self.app_state = app_state
+        self.user_agent = user_agent
+        compile_selectors(card_automation)
+
+    def search_url(self, keywords, location=None, page=1):
+        """Build the URL of a keyword search, optionally narrowed to a location."""
+        url = self.base_url + self.search_path.format(keywords=slugify(keywords).lower())
+        if location:
+            url += self.location_path.format(location=slugify(location))
+        if page > 1:
+            url += f"?{self.page_param}={page}"
+        return url
+
+    def next_page(self, html, url):
+        """Pagination rule: the URL of the page after this one, or None on the last page."""
+        return find_next_page(html, url)
+
+    def headers(self):
+        """Headers this site needs on top of the crawler's defaults."""
+        return {'User-Agent': self.user_agent} if self.user_agent else {}
+
+    def parse(self, html):
+        """Return the jobs on a results page, from its embedded app state or its job cards."""
+        if APP_STATE_EXTRACTION and self.app_state:
+            job_data = parse_app_state_jobs(html, make_id=generate_hashed_id, base_url=self.base_url)
+            if job_data:
+                logger.info("Found %s jobs on %s (embedded app state).", len(job_data), self.name)
+                return job_data
+
+        cards = parse_cards(html, card_automation=self.card_automation)
+        if not cards:
+            logger.warning("No job cards found on a %s page. (Check the card selectors)", self.name)
+            return []
+
+        job_data = []
+        for card in cards:
+            try:
+                job_info = read_card(card, self.base_url, self.card_fields)
+                job_info['uniqueId'] = generate_hashed_id(job_info)
+                job_data.append(job_info)
+            except Exception as e:
+                logger.debug("Skipping malformed %s job card: %s", self.name, e)
+        logger.info("Found %s jobs on %s.", len(job_data), self.name)
+        return job_data
+
+    def __repr__(self):
+        return f"Site({self.name!r}, {self.base_url!r})"
+
+_registry = {}
+
+def register_site(site):
+    """Add a site to the registry, replacing any site with the same name."""
+    _registry[site.name] = site
+    return site
+
+def get_site(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise ValueError(f"Unknown site: {name}") from None
+
+def registered_sites():
+    return list(_registry.values())
+
+def site_for_url(url):
+    """Return the registered site serving a URL's host, or None."""
+    host = urlparse(url).netloc
+    for site in _registry.values():
+        if site.host == host:
+            return site
+    return None
+
+def search_urls(search):
+    """Seed URLs for a configured search: its explicit "urls", then its keyword search on every site it covers."""
+    urls = list(search.get('urls', ()))
+    if search.get('keywords'):
+        urls += [get_site(name).search_url(search['keywords'], search.get('location'))
+                 for name in search.get('sites', SITES)]
+    return urls
+
+# JobStreet runs the same SEEK front end in every country
+register_site(Site('jobstreet-my', BASE_URL))
+register_site(Site('jobstreet-sg', 'https://sg.jobstreet.com'))
+register_site(Site('jobstreet-id', 'https://id.jobstreet.com'))
@@ -0,0 +1,353 @@
+# tests/benchmark.py
+# Offline benchmarks that replay recorded result pages through a local
+# stand-in for the job site (and Discord), so runs are repeatable and never
+# touch the network. Run from the repo root:
+#   python tests/benchmark.py [parse fetch insert records worker] [--repeats N] [--corpus DIR]
+#                             [--output FILE] [--baseline FILE]
+# Results are written as JSON (default data/bench/<timestamp>.json); pass an
+# earlier file as --baseline to flag regressions.
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from config.config import CRAWL_MAX_PAGES
+from database import database
+from persistence import persistence
+from records.records import JobRecord
+from scraper import scraper
+from scraper.crawler import HREF_PATTERN, NEXT_LINK_PATTERN, HostPacer
+from scraper.parsers import available_engines, parse_cards
+from worker import worker
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = [os.path.join(TESTS_DIR, 'mock_jobstreet.html'), os.path.join(TESTS_DIR, 'mock_jobstreet_state.html')]
+# Higher is better for these metrics; every other metric is a cost
+THROUGHPUT_METRICS = ('pages_per_sec', 'rows_per_sec', 'jobs_per_sec')
+REGRESSION_THRESHOLD = 0.10
+
+def load_corpus(directory=None):
+    """Recorded pages to replay: every .html file in directory, or the two test fixtures."""
+    paths = DEFAULT_CORPUS if directory is None else sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.html'))
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            pages.append((os.path.basename(path), file.read()))
+    return pages
+
+class ReplayServer(ThreadingHTTPServer):
+    """Serve corpus pages for any path, plus a Discord-like webhook that accepts every POST.
+
+    Each search path keeps its own pagination: the page's "Next" link is
+    rewritten to the same path with the following page number.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, corpus):
+        super().__init__(('127.0.0.1', 0), ReplayHandler)
+        self.corpus = corpus
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def page(self, path, query):
+        match = re.search(r'(?:^|&)page=(\d+)', query)
+        page = int(match.group(1)) if match else 1
+        html = self.corpus[sum(path.encode('utf-8')) % len(self.corpus)][1]
+
+        def rewrite(link):
+            return HREF_PATTERN.sub(f'href="{path}?page={page + 1}"', link.group(0), count=1)
+        return NEXT_LINK_PATTERN.sub(rewrite, html, count=1).encode('utf-8')
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        body = self.server.page(url.path, url.query)
+        with self.server.lock:
+            self.server.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(204)
+        self.end_headers()
+
+@contextlib.contextmanager
+def replay_server(corpus):
+    server = ReplayServer(corpus)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def peak_memory(func):
+    """Peak Python heap allocation (MB) while func runs."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def retained_memory(func):
+    """Python heap (MB) still held by what func returns."""
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[0] / 1e6 if result is not None else 0.0
+    finally:
+        tracemalloc.stop()
+
+def best_time(func, repeats):
+    return min(timeit.repeat(func, number=1, repeat=repeats))
+
+def legacy_parse(html):
+    """The pre-parser-layer approach: full html.parser tree plus five scans per card."""
+    cards = []
+    for job in BeautifulSoup(html, "html.parser").select("[data-automation='normalJob']"):
+        cards.append((
+            job.find('a', {'data-automation': 'jobTitle'}),
+            job.find('a', {'data-automation': 'jobCompany'}),
+            job.find_all('a', {'data-automation': 'jobLocation'}),
+            job.find('span', {'data-automation': 'jobSalary'}),
+            job.find('span', {'data-automation': 'jobListingDate'}),
+        ))
+    return cards
+
+def bench_parse(corpus, repeats):
+    """Card parsing per engine (and the legacy BeautifulSoup traversal), plus the full parse_jobs."""
+    pages = [html for _, html in corpus]
+    cards = sum(len(parse_cards(html, 'bs4')) for html in pages) or 1
+    engines = {'legacy': lambda: [legacy_parse(html) for html in pages]}
+    for engine in available_engines():
+        engines[engine] = lambda engine=engine: [parse_cards(html, engine) for html in pages]
+    engines['parse_jobs'] = lambda: [worker.parse_jobs(html) for html in pages]
+
+    results = {}
+    for name, func in engines.items():
+        elapsed = best_time(func, repeats)
+        results[name] = {
+            'ms_per_page': elapsed / len(pages) * 1000,
+            'us_per_card': elapsed / cards * 1e6,
+            'pages_per_sec': len(pages) / elapsed,
+            'peak_mb': peak_memory(func),
+        }
+    return results
+
+def bench_fetch(corpus, repeats, pages=20):
+    """scraper.fetch_data against the replay server: request, status check and parse per page."""
+    with replay_server(corpus) as server:
+        urls = [server.url(f'/fetch-{i}-jobs') for i in range(pages)]
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for url in urls:
+                    scraper.fetch_data(url)
+        elapsed = best_time(run, repeats)
+        return {'fetch_data': {'pages_per_sec': pages / elapsed, 'ms_per_page': elapsed / pages * 1000,
+                               'peak_mb': peak_memory(run)}}
+
+def synthetic_jobs(corpus, count):
+    """count distinct job records built from the corpus's parsed jobs."""
+    templates = [job for _, html in corpus for job in worker.parse_jobs(html)]
+    return [dict(templates[i % len(templates)], uniqueId=f'bench-{i}') for i in range(count)]
+
+def bench_insert(corpus, repeats, single_rows=500, batch_rows=5000):
+    """insert_job one row per transaction vs insert_jobs in one transaction, into a fresh database."""
+    results = {}
+    for name, rows, insert in (('insert_job', single_rows, lambda jobs: [database.insert_job(job) for job in jobs]),
+                               ('insert_jobs', batch_rows, database.insert_jobs)):
+        jobs = synthetic_jobs(corpus, rows)
+        timings = []
+        for _ in range(repeats):
+            with tempfile.TemporaryDirectory() as tmp_dir, \
+                    patch('database.database.DATABASE_FILE', os.path.join(tmp_dir, 'jobs.db')):
+                database.close_connections()
+                database.create_table()
+                started = time.perf_counter()
+                insert(jobs)
+                timings.append(time.perf_counter() - started)
+                database.close_connections()
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                patch('database.database.DATABASE_FILE', os.path.join(tmp_dir, 'jobs.db')):
+            database.create_table()
+            peak = peak_memory(lambda: insert(jobs))
+            database.close_connections()
+        results[name] = {'rows': rows, 'rows_per_sec': rows / min(timings), 'peak_mb': peak}
+    return results
+
+def fresh(value):
+    """An equal but separate string, like the ones each parsed card produces."""
+    return value[:1] + value[1:] if isinstance(value, str) and len(value) > 1 else value
+
+def bench_records(corpus, repeats, count=20000):
+    """Holding count parsed jobs as plain dicts (the old record type) vs JobRecords, and turning
+    them into insert parameters and a CSV file."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        templates = [dict(job) for _, html in corpus for job in worker.parse_jobs(html)]
+
+    def build(make):
+        return [make((key, fresh(value)) for key, value in dict(templates[i % len(templates)], uniqueId=f'bench-{i}').items())
+                for i in range(count)]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'jobs.csv')
+        for name, make in (('dict', dict), ('JobRecord', JobRecord)):
+            jobs = build(make)
+            retained = retained_memory(lambda: build(make))
+            results[name] = {
+                'retained_mb': retained,
+                'bytes_per_job': retained * 1e6 / count,
+                'us_per_job_build': best_time(lambda: build(make), repeats) / count * 1e6,
+                'us_per_job_params': best_time(lambda: [database._job_params(job) for job in jobs], repeats) / count * 1e6,
+                'us_per_job_csv': best_time(lambda: persistence.write_csv(jobs, csv_path), repeats) / count * 1e6,
+            }
+    return results
+
+def bench_worker(corpus, repeats, seeds=4):
+    """worker.run_scraping_cycle end to end: crawl, parse, store, CSV/archive and the Discord post.
+
+    The cold run starts from an empty database; the warm run repeats it with
+    every job known. Pagination is followed to CRAWL_MAX_PAGES either way, and
+    the adaptive rate limit is opened up so it measures our code, not the pacing.
+    Detail-page enrichment runs in the background after a cycle and is left out.
+    """
+    results = {}
+    with replay_server(corpus) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)  # data/ and logs/ paths in config are relative
+        try:
+            with patch('worker.worker.STOP_WHEN_SEEN', False), \
+                    patch('worker.worker.get_pacer', return_value=HostPacer(rate=1e6, burst=1e6)), \
+                    patch('worker.worker.get_enricher', return_value=None), \
+                    patch('worker.worker.get_session', return_value=worker.SessionPool(['bench=1'], cookie_file=None)), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                worker.ensure_directories_exist()
+                database.close_connections()
+                database.create_table()
+                urls = [server.url(f'/worker-{i}-jobs') for i in range(seeds)]
+                webhook = server.url('/api/webhooks/1/token')
+                for run in ('cold', 'warm'):
+                    requests_before = server.requests
+                    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    started = time.perf_counter()
+                    new_jobs = worker.run_scraping_cycle(urls, webhook)
+                    elapsed = time.perf_counter() - started
+                    pages = server.requests - requests_before
+                    results[f'worker_{run}'] = {
+                        'pages': pages,
+                        'new_jobs': len(new_jobs),
+                        'pages_per_sec': pages / elapsed,
+                        'seconds': elapsed,
+                        'rss_growth_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024,
+                    }
+        finally:
+            database.close_connections()
+            os.chdir(cwd)
+    return results
+
+BENCHMARKS = {'parse': bench_parse, 'fetch': bench_fetch, 'insert': bench_insert, 'records': bench_records,
+              'worker': bench_worker}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=TESTS_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    """Return (benchmark, case, metric, old, new) for every metric that got more than 10% worse."""
+    regressions = []
+    for bench, cases in results.items():
+        for case, metrics in cases.items():
+            for metric, new in metrics.items():
+                old = baseline.get('results', {}).get(bench, {}).get(case, {}).get(metric)
+                if not old or metric in ('rows', 'pages', 'new_jobs'):
+                    continue
+                change = (new - old) / old
+                worse = change < -REGRESSION_THRESHOLD if metric in THROUGHPUT_METRICS else change > REGRESSION_THRESHOLD
+                if worse:
+                    regressions.append((bench, case, metric, old, new))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded pages through the scraper and time each stage.")
+    parser.add_argument('benchmarks', nargs='*', help=f"Any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--corpus', help="Directory of recorded .html result pages (default: the test fixtures)")
+    parser.add_argument('--output', help="JSON results file (default: data/bench/<timestamp>.json)")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    logging.disable(logging.WARNING)
+    corpus = load_corpus(args.corpus)
+    names = args.benchmarks or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](corpus, args.repeats)
+        for case, metrics in results[name].items():
+            print(f"{name:<8}{case:<14}" + "  ".join(f"{metric}={value:.2f}" for metric, value in metrics.items()))
+
+    report = {
+        'created': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'corpus': [name for name, _ in corpus],
+        'max_pages': CRAWL_MAX_PAGES,
+        'results': results,
+    }
+    output = args.output or os.path.join('data', 'bench', datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            regressions = compare(results, json.load(file))
+        for bench, case, metric, old, new in regressions:
+            print(f"REGRESSION {bench}/{case} {metric}: {old:.2f} -> {new:.2f}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# tests/test_api.py
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+from api.api import QueryApi, etag_matches, serve_api
+from database import database
+from database.database import close_connections, connect_readonly, create_table, insert_jobs
+
+def make_jobs(start, count, **fields):
+    return [dict({'uniqueId': f'id-{i}', 'jobTitle': f'Python Engineer {i}', 'jobCompany': 'Acme',
+                  'jobLocation': 'Kuala Lumpur', 'jobCategory': 'Engineering', 'jobSalary': 'RM 5,000',
+                  'jobURL': f'https://jobs.test/job/{i}'}, **fields) for i in range(start, start + count)]
+
+class ApiTestCase(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+        insert_jobs(make_jobs(0, 5))
+        self.api = QueryApi(cache_size=8, connections=2)
+
+    def tearDown(self):
+        self.api.close()
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def get(self, path, **params):
+        status, body, etag = self.api.get(path, {name: str(value) for name, value in params.items()})
+        return status, json.loads(body)
+
+class TestQueryApi(ApiTestCase):
+
+    def test_recent_jobs_page_by_cursor(self):
+        status, first = self.get('/jobs', limit=3)
+        self.assertEqual(status, 200)
+        self.assertEqual([job['uniqueId'] for job in first['results']], ['id-4', 'id-3', 'id-2'])
+        _, second = self.get('/jobs', limit=3, before=first['next_cursor'])
+        self.assertEqual([job['uniqueId'] for job in second['results']], ['id-1', 'id-0'])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_search_counts_and_changes(self):
+        insert_jobs(make_jobs(5, 2, jobTitle='Accountant', jobCategory='Finance'))
+        _, found = self.get('/jobs/search', q='accountant', per_page=10)
+        self.assertEqual(found['total'], 2)
+        _, filtered = self.get('/jobs/search', category='Engineering', min_salary=1000)
+        self.assertEqual(filtered['total'], 5)
+
+        _, counts = self.get('/jobs/counts')
+        self.assertEqual((counts['total'], counts['open'], counts['expired']), (7, 7, 0))
+        self.assertEqual(counts['categories'][0], ['Engineering', 5])
+
+        _, changes = self.get('/changes', limit=4)
+        self.assertEqual(len(changes['results']), 4)
+        _, rest = self.get('/changes', after=changes['next_cursor'])
+        self.assertEqual(len(rest['results']), 3)
+        self.assertEqual(rest['next_cursor'], counts['last_change'])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.get('/jobs', limit='many')[0], 400)
+        self.assertEqual(self.get('/jobs/search', salary=5)[0], 400)
+        self.assertEqual(self.get('/jobs/search', min_salary='lots')[0], 400)
+        self.assertEqual(self.get('/nothing')[0], 404)
+
+    def test_cache_is_dropped_when_the_worker_commits(self):
+        with patch('api.api.recent_jobs', wraps=database.recent_jobs) as query:
+            first = self.api.get('/jobs', {'limit': '2'})
+            self.assertEqual(self.api.get('/jobs', {'limit': '2'}), first)
+            self.assertEqual(query.call_count, 1)
+
+            insert_jobs(make_jobs(5, 1))
+            status, body, etag = self.api.get('/jobs', {'limit': '2'})
+            self.assertEqual(query.call_count, 2)
+        self.assertNotEqual(etag, first[2])
+        self.assertEqual(json.loads(body)['results'][0]['uniqueId'], 'id-5')
+
+    def test_database_errors_are_a_json_503(self):
+        with patch('api.api.job_counts', side_effect=sqlite3.OperationalError('database is locked')):
+            status, body = self.get('/jobs/counts')
+        self.assertEqual(status, 503)
+        self.assertIn('database is locked', body['error'])
+
+    def test_failed_connections_give_their_pool_slot_back(self):
+        with patch('api.api.connect_readonly', side_effect=sqlite3.OperationalError('unable to open database file')):
+            self.assertEqual(self.get('/jobs/counts')[0], 503)
+            for _ in range(self.api.max_connections + 1):
+                with self.assertRaises(sqlite3.OperationalError), self.api._connection():
+                    pass
+        self.assertEqual(self.api._opened, 0)
+        self.assertEqual(self.get('/jobs/counts')[0], 200)
+
+    def test_if_none_match_lists(self):
+        etag = '"0123456789abcdef"'
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", W/{etag}', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches('"other", "0123456789abcdef0"', etag))
+        self.assertFalse(etag_matches(f'"x{etag[1:]}', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+    def test_read_connections_cannot_write(self):
+        conn = connect_readonly()
+        try:
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM jobs")
+        finally:
+            conn.close()
+
+class TestApiServer(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = serve_api(0, api=self.api)
+        self.base = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+
+    def test_serves_json_and_revalidates_with_etags(self):
+        with urllib.request.urlopen(self.base + '/jobs/counts') as response:
+            self.assertEqual(response.headers['Content-Type'], 'application/json; charset=utf-8')
+            etag = response.headers['ETag']
+            self.assertEqual(json.loads(response.read())['total'], 5)
+
+        request = urllib.request.Request(self.base + '/jobs/counts', headers={'If-None-Match': etag})
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(request)
+        self.assertEqual(raised.exception.code, 304)
+        request = urllib.request.Request(self.base + '/jobs/counts', headers={'If-None-Match': '"stale", ' + etag})
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(request)
+        self.assertEqual(raised.exception.code, 304)
+        request = urllib.request.Request(self.base + '/jobs/counts', headers={'If-None-Match': etag[:-2] + '"'})
+        with urllib.request.urlopen(request) as response:
+            self.assertEqual(response.status, 200)
+
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(self.base + '/jobs?before=x')
+        self.assertEqual(raised.exception.code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# tests/test_cache.py
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from scraper.cache import PageCache
+from scraper.crawler import Crawler
+from test_crawler import results_page
+from worker.worker import parse_jobs
+
+class ETagSession:
+    """Serve pages with an ETag and answer 304 when the client already has it."""
+
+    def __init__(self, pages, honour_etag=True):
+        self.pages = pages
+        self.honour_etag = honour_etag
+        self.sent_headers = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent_headers.append(dict(headers or {}))
+        body = self.pages[url]
+        etag = f'"{hash(body)}"'
+        response = MagicMock()
+        response.headers = {'ETag': etag}
+        if self.honour_etag and (headers or {}).get('If-None-Match') == etag:
+            response.status_code = 304
+            response.text = ''
+        else:
+            response.status_code = 200
+            response.text = body
+        return response
+
+class TestPageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.tmp_dir.name)
+        self.url = 'https://jobs.test/a-jobs'
+        self.pages = {self.url: results_page('a-jobs', 1, 1)}
+        self.parse_calls = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def counting_parse(self, html):
+        self.parse_calls += 1
+        return parse_jobs(html)
+
+    def crawl(self, session):
+        return list(Crawler(parse=self.counting_parse, session=session, cache=self.cache).crawl([self.url]))
+
+    def test_not_modified_reuses_cached_jobs(self):
+        session = ETagSession(self.pages)
+        first = self.crawl(session)
+        second = self.crawl(session)
+
+        self.assertEqual(self.parse_calls, 1)
+        self.assertEqual(second, first)
+        self.assertIn('If-None-Match', session.sent_headers[1])
+
+    def test_unchanged_body_skips_parsing(self):
+        session = ETagSession(self.pages, honour_etag=False)
+        first = self.crawl(session)
+        second = self.crawl(session)
+        self.assertEqual(self.parse_calls, 1)
+        self.assertEqual(second, first)
+
+        self.pages[self.url] = results_page('b-jobs', 1, 1)
+        third = self.crawl(session)
+        self.assertEqual(self.parse_calls, 2)
+        self.assertNotEqual(third, first)
+
+    def test_eviction_keeps_cache_bounded(self):
+        cache = PageCache(os.path.join(self.tmp_dir.name, 'small'), max_bytes=4000)
+        response = MagicMock(headers={}, text='body')
+        jobs = [{'uniqueId': 'x' * 64, 'jobTitle': 'T' * 200}]
+        for i in range(20):
+            cache.put(f'https://jobs.test/{i}', parse_jobs, response, jobs, None)
+            time.sleep(0.001)
+
+        total = sum(entry.stat().st_size for entry in os.scandir(cache.directory))
+        self.assertLessEqual(total, 4000)
+        self.assertIsNone(cache.get('https://jobs.test/0', parse_jobs))
+        self.assertIsNotNone(cache.get('https://jobs.test/19', parse_jobs))
+
+    def test_entries_are_per_parser(self):
+        response = MagicMock(headers={'ETag': '"1"'}, text='body')
+        self.cache.put(self.url, parse_jobs, response, [], None)
+        self.assertIsNotNone(self.cache.get(self.url, parse_jobs))
+        self.assertIsNone(self.cache.get(self.url, self.counting_parse))
+        self.assertEqual(PageCache.request_headers(self.cache.get(self.url, parse_jobs)), {'If-None-Match': '"1"'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+# tests/test_crawler.py
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from scraper.crawler import Crawler, HostPacer, HostPaused, find_next_page
+from worker.worker import parse_jobs
+
+class FakeSession:
+    """Serve canned pages and record how many requests overlap per host."""
+
+    def __init__(self, pages, delay=0.01):
+        self.pages = pages
+        self.delay = delay
+        self.requested = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.requested.append(url)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        response = MagicMock()
+        response.status_code = 200 if url in self.pages else 404
+        response.text = self.pages.get(url, '')
+        return response
+
+def results_page(base, page, last_page):
+    cards = "".join(
+        f'<article data-automation="normalJob"><a data-automation="jobTitle" href="/job/{page}{i}">'
+        f'Job {base} {page}-{i}</a><a data-automation="jobCompany">Co</a></article>'
+        for i in range(3)
+    )
+    next_link = f'<a data-automation="page-next" href="/{base}?page={page + 1}" rel="nofollow next">Next</a>' if page < last_page else ''
+    return f'<html><body>{cards}{next_link}</body></html>'
+
+class TestCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = {}
+        for base in ('a-jobs', 'b-jobs'):
+            self.pages[f'https://jobs.test/{base}'] = results_page(base, 1, 3)
+            for page in (2, 3):
+                self.pages[f'https://jobs.test/{base}?page={page}'] = results_page(base, page, 3)
+
+    def test_find_next_page(self):
+        with open('tests/mock_jobstreet.html', 'r', encoding='utf-8') as file:
+            html = file.read()
+        next_url = find_next_page(html, 'https://my.jobstreet.com/engineering-intern-jobs/in-Kuala-Lumpur')
+        self.assertEqual(next_url, 'https://my.jobstreet.com/engineering-intern-jobs/in-Kuala-Lumpur?page=2')
+        self.assertIsNone(find_next_page('<a href="/x">x</a>', 'https://jobs.test/'))
+
+    def test_crawl_follows_pagination_for_every_seed(self):
+        session = FakeSession(self.pages)
+        crawler = Crawler(parse=parse_jobs, session=session, max_pages=5, host_concurrency=2)
+        jobs = list(crawler.crawl(['https://jobs.test/a-jobs', 'https://jobs.test/b-jobs', 'https://jobs.test/a-jobs']))
+
+        self.assertEqual(len(jobs), 18)  # 2 seeds x 3 pages x 3 cards
+        self.assertEqual(sorted(session.requested), sorted(self.pages))
+        self.assertLessEqual(session.max_in_flight, 2)
+
+    def test_crawl_stops_at_max_pages(self):
+        session = FakeSession(self.pages)
+        crawler = Crawler(parse=parse_jobs, session=session, max_pages=2)
+        jobs = list(crawler.crawl(['https://jobs.test/a-jobs']))
+
+        self.assertEqual(len(jobs), 6)
+        self.assertNotIn('https://jobs.test/a-jobs?page=3', session.requested)
+
+    def test_should_follow_stops_pagination(self):
+        session = FakeSession(self.pages)
+        seen_pages = []
+
+        def should_follow(jobs):
+            seen_pages.append(jobs)
+            return len(seen_pages) < 2  # Pretend the second page is all known jobs
+
+        crawler = Crawler(parse=parse_jobs, session=session, should_follow=should_follow)
+        jobs = list(crawler.crawl(['https://jobs.test/a-jobs']))
+        self.assertEqual(len(jobs), 6)
+        self.assertNotIn('https://jobs.test/a-jobs?page=3', session.requested)
+
+    def test_blocked_and_missing_pages_yield_nothing(self):
+        self.pages['https://jobs.test/blocked'] = '<div id="challenge-platform"></div>'
+        crawler = Crawler(parse=parse_jobs, session=FakeSession(self.pages),
+                          is_blocked=lambda html: 'challenge-platform' in html)
+        jobs = list(crawler.crawl(['https://jobs.test/blocked', 'https://jobs.test/missing']))
+        self.assertEqual(jobs, [])
+
+    def test_crawls_that_miss_pages_are_flagged_incomplete(self):
+        self.pages['https://jobs.test/blocked'] = '<div id="challenge-platform"></div>'
+        cases = [(['https://jobs.test/a-jobs'], 5, False), (['https://jobs.test/a-jobs'], 2, True),
+                 (['https://jobs.test/a-jobs', 'https://jobs.test/missing'], 5, True),
+                 (['https://jobs.test/a-jobs', 'https://jobs.test/blocked'], 5, True)]
+        for seeds, max_pages, missed in cases:
+            with self.subTest(seeds=seeds, max_pages=max_pages):
+                incomplete = threading.Event()
+                crawler = Crawler(parse=parse_jobs, session=FakeSession(self.pages, delay=0), max_pages=max_pages,
+                                  is_blocked=lambda html: 'challenge-platform' in html, incomplete=incomplete)
+                list(crawler.crawl(seeds))
+                self.assertEqual(incomplete.is_set(), missed)
+
+    def test_failing_page_does_not_stop_other_seeds(self):
+        def should_follow(jobs):
+            if any('a-jobs' in job['jobTitle'] for job in jobs):
+                raise RuntimeError("known-id lookup failed")
+            return True
+
+        crawler = Crawler(parse=parse_jobs, session=FakeSession(self.pages), should_follow=should_follow)
+        jobs = list(crawler.crawl(['https://jobs.test/a-jobs', 'https://jobs.test/b-jobs']))
+        self.assertEqual(len(jobs), 9)  # Every b-jobs page, nothing from the failed a-jobs page
+        self.assertTrue(all('b-jobs' in job['jobTitle'] for job in jobs))
+
+class TestAdaptivePacer(unittest.TestCase):
+
+    def test_rate_backs_off_and_recovers(self):
+        pacer = HostPacer(rate=4.0, rate_increase=0.5, rate_decrease=0.5, min_rate=1.0, breaker_threshold=10)
+        pacer.record('https://a.test/x', blocked=True)
+        self.assertEqual(pacer.state('https://a.test/y')['rate'], 2.0)
+        pacer.record('https://a.test/x', blocked=True)
+        pacer.record('https://a.test/x', blocked=True)
+        self.assertEqual(pacer.state('https://a.test/x')['rate'], 1.0)  # Never below min_rate
+        pacer.record('https://a.test/x', blocked=False)
+        self.assertEqual(pacer.state('https://a.test/x')['rate'], 1.5)
+        self.assertEqual(pacer.state()['a.test']['breaker'], 'closed')
+
+    def test_token_bucket_spaces_requests(self):
+        pacer = HostPacer(rate=20.0, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            pacer.acquire('https://a.test/x')
+        pacer.acquire('https://b.test/x')  # Other hosts have their own bucket
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        self.assertLess(time.monotonic() - started, 0.3)
+
+    def test_retry_after_holds_the_host(self):
+        pacer = HostPacer(rate=100.0)
+        pacer.record('https://a.test/x', blocked=True, retry_after=0.1)
+        started = time.monotonic()
+        pacer.acquire('https://a.test/x')
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_breaker_opens_probes_and_closes(self):
+        alerts = []
+        pacer = HostPacer(breaker_threshold=2, breaker_cooldown=0.05,
+                          on_alert=lambda host, state: alerts.append((host, state['breaker'])))
+        url = 'https://a.test/x'
+        pacer.record(url, blocked=True)
+        self.assertEqual(pacer.state(url)['breaker'], 'closed')
+        pacer.record(url, blocked=True)
+        self.assertEqual(pacer.state(url)['breaker'], 'open')
+        self.assertEqual(alerts, [('a.test', 'open')])
+        with self.assertRaises(HostPaused):
+            pacer.acquire(url)
+
+        time.sleep(0.06)
+        pacer.acquire(url)  # The probe
+        self.assertEqual(pacer.state(url)['breaker'], 'half-open')
+        with self.assertRaises(HostPaused):
+            pacer.acquire(url)  # Only one probe at a time
+
+        # A blocked probe reopens the breaker for twice as long
+        pacer.record(url, blocked=True)
+        self.assertGreater(pacer.state(url)['paused_for'], 0.06)
+        time.sleep(0.11)
+        pacer.acquire(url)
+        pacer.record(url, blocked=False)
+        self.assertEqual(pacer.state(url)['breaker'], 'closed')
+        self.assertEqual(alerts, [('a.test', 'open'), ('a.test', 'open'), ('a.test', 'closed')])
+
+    def test_crawler_stops_requesting_a_blocking_host(self):
+        pages = {f'https://jobs.test/{i}-jobs': '<div id="challenge-platform"></div>' for i in range(5)}
+        pages['https://other.test/a-jobs'] = results_page('a-jobs', 1, 1)
+        session = FakeSession(pages, delay=0)
+        pacer = HostPacer(breaker_threshold=2)
+        crawler = Crawler(parse=parse_jobs, session=session, pacer=pacer, max_workers=1,
+                          is_blocked=lambda html: 'challenge-platform' in html)
+        jobs = list(crawler.crawl(list(pages)))
+
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(len([url for url in session.requested if 'jobs.test' in url]), 2)
+        self.assertEqual(pacer.state()['jobs.test']['breaker'], 'open')
+        self.assertEqual(pacer.state()['other.test']['breaker'], 'closed')
+
+if __name__ == '__main__':
+    unittest.main()
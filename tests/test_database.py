@@ -1,8 +1,19 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 from database.database import insert_job  # Adjust the import according to your structure
+from database.database import close_connections, connect_db, create_table, insert_jobs, job_exists, count_jobs
+from database.database import SEARCH_MAX_PER_PAGE, SCHEMA_VERSION, expire_unseen, list_changes, search_jobs
+from database.database import update_enrichment
 
 class TestDatabase(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()  # Make sure no pooled connection survives between tests
+
+    def tearDown(self):
+        close_connections()
     
     @patch('sqlite3.connect')  # This mocks sqlite3.connect
     def test_insert_job(self, mock_connect):
@@ -70,5 +81,272 @@ class TestDatabase(unittest.TestCase):
         actual_params = mock_cursor.execute.call_args_list[0][0][1]
         self.assertEqual(actual_params, expected_params)  # Compare parameters
 
+class TestDatabaseBatch(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def make_job(self, unique_id):
+        return {'uniqueId': unique_id, 'jobTitle': f'Title {unique_id}', 'jobCompany': 'Company XYZ'}
+
+    def test_connection_is_reused_and_in_wal_mode(self):
+        conn = connect_db()
+        self.assertIs(connect_db(), conn)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_insert_jobs_returns_only_new_ids(self):
+        self.assertEqual(insert_jobs([self.make_job('a'), self.make_job('b')]), ['a', 'b'])
+
+        # Known ids and duplicates inside the same batch are skipped
+        new_ids = insert_jobs([self.make_job('b'), self.make_job('c'), self.make_job('c')])
+        self.assertEqual(new_ids, ['c'])
+        self.assertEqual(count_jobs(), 3)
+        self.assertTrue(job_exists('c'))
+        self.assertFalse(job_exists('d'))
+
+    def test_insert_jobs_empty_batch(self):
+        self.assertEqual(insert_jobs([]), [])
+        self.assertEqual(count_jobs(), 0)
+
+class TestSearch(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+        insert_jobs([
+            {'uniqueId': 'title-match', 'jobTitle': 'Electrical Engineer', 'jobCompany': 'ACME',
+             'jobLocation': 'Kuala Lumpur', 'jobCategory': 'Engineering'},
+            {'uniqueId': 'company-match', 'jobTitle': 'Sales Executive', 'jobCompany': 'Electrical Supplies Sdn Bhd',
+             'jobLocation': 'Penang', 'jobCategory': 'Sales'},
+            {'uniqueId': 'intern', 'jobTitle': 'Electrical Intern', 'jobCompany': 'Widgets',
+             'jobLocation': 'Kuala Lumpur', 'jobCategory': 'Engineering'},
+            {'uniqueId': 'other', 'jobTitle': 'Accountant', 'jobCompany': 'Numbers Co',
+             'jobLocation': 'Penang', 'jobCategory': 'Accounting'},
+        ])
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def ids(self, result):
+        return [job['uniqueId'] for job in result['results']]
+
+    def test_title_matches_rank_first(self):
+        result = search_jobs('electrical')
+        self.assertEqual(result['total'], 3)
+        self.assertEqual(self.ids(result)[-1], 'company-match')
+        self.assertEqual(self.ids(search_jobs('electr intern')), ['intern'])  # Prefix match, every word required
+
+    def test_filters_and_pagination(self):
+        self.assertEqual(self.ids(search_jobs('electrical', location='Penang')), ['company-match'])
+        first = search_jobs(page=1, per_page=3)
+        second = search_jobs(page=2, per_page=3)
+        self.assertEqual(first['total'], 4)
+        self.assertEqual(len(first['results']), 3)
+        self.assertEqual(self.ids(second), ['title-match'])  # Newest first without a query
+
+    def test_per_page_is_clamped(self):
+        self.assertEqual(search_jobs(per_page=-1)['per_page'], 1)
+        self.assertEqual(len(search_jobs(per_page=0)['results']), 1)
+        self.assertEqual(search_jobs(per_page=10 ** 6)['per_page'], SEARCH_MAX_PER_PAGE)
+
+    def test_facet_counts(self):
+        facets = search_jobs('electrical')['facets']
+        self.assertEqual(facets['jobLocation'], [('Kuala Lumpur', 2), ('Penang', 1)])
+        self.assertEqual(facets['jobCategory'], [('Engineering', 2), ('Sales', 1)])
+        self.assertEqual(search_jobs(facets=('jobCategory',), facet_limit=1)['facets'], {'jobCategory': [('Engineering', 2)]})
+        with self.assertRaises(ValueError):
+            search_jobs(facets=('jobTitle; DROP TABLE jobs',))
+        with self.assertRaises(ValueError):
+            search_jobs(salary='RM 1')
+
+    def test_triggers_keep_index_in_sync(self):
+        insert_jobs([{'uniqueId': 'new', 'jobTitle': 'Mechatronics Intern', 'jobCompany': 'Robots'}])
+        self.assertEqual(self.ids(search_jobs('mechatronics')), ['new'])
+
+        conn = connect_db()
+        with conn:
+            conn.execute("UPDATE jobs SET jobTitle = 'Robotics Intern' WHERE uniqueId = 'new'")
+        self.assertEqual(search_jobs('mechatronics')['total'], 0)
+        self.assertEqual(self.ids(search_jobs('robotics')), ['new'])
+
+        with conn:
+            conn.execute("DELETE FROM jobs WHERE uniqueId = 'new'")
+        self.assertEqual(search_jobs('robotics')['total'], 0)
+
+    def test_existing_rows_indexed_when_index_is_created(self):
+        conn = connect_db()
+        with conn:
+            conn.execute('DROP TABLE jobs_fts')
+            for trigger in ('jobs_fts_insert', 'jobs_fts_delete', 'jobs_fts_update'):
+                conn.execute(f'DROP TRIGGER {trigger}')
+        insert_jobs([{'uniqueId': 'old', 'jobTitle': 'Mechatronics Intern', 'jobCompany': 'Robots'}])
+
+        create_table()
+        self.assertEqual(self.ids(search_jobs('mechatronics')), ['old'])
+        self.assertEqual(search_jobs('electrical')['total'], 3)
+
+    def test_like_fallback_without_fts(self):
+        conn = connect_db()
+        with conn:
+            conn.execute('DROP TABLE jobs_fts')
+        result = search_jobs('Electrical')
+        self.assertEqual(result['total'], 3)
+        self.assertEqual(set(self.ids(result)), {'title-match', 'company-match', 'intern'})
+
+    def test_secondary_indexes_exist(self):
+        names = {row[0] for row in connect_db().execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'idx_jobs_location', 'idx_jobs_company', 'idx_jobs_listing_date'} <= names)
+
+class TestNormalizedColumns(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def row(self, unique_id):
+        return connect_db().execute(
+            'SELECT salary_min, salary_max, salary_period, currency, listed_at FROM jobs WHERE uniqueId = ?',
+            (unique_id,),
+        ).fetchone()
+
+    def test_insert_jobs_stores_normalized_values(self):
+        create_table()
+        insert_jobs([
+            {'uniqueId': 'paid', 'jobSalary': 'RM 3,000 – RM 4,500 per month', 'jobListingDate': '2024-03-14T02:11:09Z'},
+            {'uniqueId': 'unpaid', 'jobSalary': 'Not Specified', 'jobListingDate': 'N/A'},
+        ])
+        self.assertEqual(self.row('paid'), (3000.0, 4500.0, 'month', 'MYR', '2024-03-14T02:11:09Z'))
+        self.assertEqual(self.row('unpaid'), (None, None, None, None, None))
+
+    def test_range_filters(self):
+        create_table()
+        insert_jobs([
+            {'uniqueId': 'low', 'jobSalary': 'RM 1,500 – RM 2,000 per month', 'jobListingDate': '2024-01-01T00:00:00Z'},
+            {'uniqueId': 'high', 'jobSalary': 'RM 5,000 – RM 7,000 per month', 'jobListingDate': '2024-03-01T00:00:00Z'},
+            {'uniqueId': 'unknown', 'jobSalary': 'Not Specified'},
+        ])
+        ids = lambda result: {job['uniqueId'] for job in result['results']}
+        self.assertEqual(ids(search_jobs(min_salary=4000)), {'high'})
+        self.assertEqual(ids(search_jobs(max_salary=3000)), {'low'})
+        self.assertEqual(ids(search_jobs(listed_since='2024-02-01')), {'high'})
+
+    def test_migration_backfills_existing_rows(self):
+        conn = connect_db()
+        with conn:
+            conn.execute('''
+                CREATE TABLE jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, uniqueId TEXT NOT NULL UNIQUE, jobTitle TEXT,
+                    jobCompany TEXT, jobLocation TEXT, jobSalary TEXT, jobCategory TEXT,
+                    jobSubCategory TEXT, jobListingDate TEXT, jobURL TEXT
+                )
+            ''')
+            conn.executemany('INSERT INTO jobs (uniqueId, jobSalary, jobListingDate) VALUES (?, ?, ?)', [
+                ('old', 'RM 800 – RM 1,000 per month', '2023-12-01T08:00:00Z'),
+                ('recent', 'S$4,000 - S$5,500', '3d ago'),
+            ])
+
+        create_table()
+        self.assertEqual(conn.execute('PRAGMA user_version').fetchone()[0], SCHEMA_VERSION)
+        self.assertEqual(self.row('old'), (800.0, 1000.0, 'month', 'MYR', '2023-12-01T08:00:00Z'))
+        self.assertEqual(self.row('recent')[:4], (4000.0, 5500.0, None, 'SGD'))
+        self.assertIsNotNone(self.row('recent')[4])  # Resolved against the migration time
+
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue({'idx_jobs_salary_min', 'idx_jobs_salary_max', 'idx_jobs_listed_at'} <= names)
+
+class TestChangeTracking(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def job(self, unique_id, salary='RM 3,000 – RM 4,000 per month'):
+        return {'uniqueId': unique_id, 'jobTitle': 'Engineer', 'jobCompany': 'ACME', 'jobSalary': salary}
+
+    def row(self, unique_id):
+        return connect_db().execute(
+            'SELECT jobSalary, salary_max, first_seen, last_seen, missed_cycles, expired_at FROM jobs WHERE uniqueId = ?',
+            (unique_id,),
+        ).fetchone()
+
+    def test_changed_fields_are_logged_and_updated(self):
+        insert_jobs([self.job('a'), self.job('b')], 'kl', now='2024-01-01T00:00:00Z')
+        new_ids = insert_jobs([self.job('a', 'RM 3,000 – RM 5,000 per month'), self.job('b')], 'kl',
+                              now='2024-01-02T00:00:00Z')
+
+        self.assertEqual(new_ids, [])
+        self.assertEqual(self.row('a')[:4], ('RM 3,000 – RM 5,000 per month', 5000.0,
+                                            '2024-01-01T00:00:00Z', '2024-01-02T00:00:00Z'))
+        self.assertEqual(self.row('b')[3], '2024-01-02T00:00:00Z')
+        changes = [(c['uniqueId'], c['kind'], c['field'], c['new_value']) for c in list_changes()]
+        self.assertEqual(changes, [('a', 'new', None, None), ('b', 'new', None, None),
+                                   ('a', 'updated', 'jobSalary', 'RM 3,000 – RM 5,000 per month')])
+        self.assertEqual(list_changes(after_id=2)[0]['old_value'], 'RM 3,000 – RM 4,000 per month')
+
+    def test_fields_missing_from_a_recrawl_keep_their_stored_values(self):
+        insert_jobs([dict(self.job('a'), jobListingDate='2024-01-01T00:00:00Z')], 'kl', now='2024-01-01T00:00:00Z')
+        update_enrichment({'a': {'listed_at': '2023-12-30T08:00:00Z'}}, now='2024-01-01T01:00:00Z')
+        # The title changed, but this crawl had no salary and a fresh card date
+        recrawled = dict(self.job('a', salary=None), jobTitle='Senior Engineer', jobListingDate='2024-01-02T00:00:00Z')
+        insert_jobs([recrawled], 'kl', now='2024-01-02T00:00:00Z')
+
+        row = connect_db().execute(
+            'SELECT jobTitle, jobSalary, salary_min, salary_max, currency, jobListingDate, listed_at '
+            'FROM jobs WHERE uniqueId = ?', ('a',)).fetchone()
+        self.assertEqual(row, ('Senior Engineer', 'RM 3,000 – RM 4,000 per month', 3000.0, 4000.0, 'MYR',
+                               '2024-01-02T00:00:00Z', '2023-12-30T08:00:00Z'))
+        self.assertEqual(search_jobs(min_salary=3500)['total'], 1)
+
+        # A salary the crawl did provide replaces the parsed values, even when it has none
+        insert_jobs([dict(recrawled, jobSalary='Not Specified')], 'kl', now='2024-01-03T00:00:00Z')
+        self.assertEqual(connect_db().execute(
+            "SELECT salary_min, salary_max FROM jobs WHERE uniqueId = 'a'").fetchone(), (None, None))
+
+    def test_jobs_missed_for_n_runs_expire_and_reopen_when_seen(self):
+        insert_jobs([self.job('gone'), self.job('stays')], 'kl', now='2024-01-01T00:00:00Z')
+        insert_jobs([self.job('other')], 'penang', now='2024-01-01T00:00:00Z')
+        for day in (2, 3, 4):
+            now = f'2024-01-0{day}T00:00:00Z'
+            insert_jobs([self.job('stays')], 'kl', now=now)
+            expired = expire_unseen('kl', since=now, after_cycles=3, now=now)
+            self.assertEqual(expired, ['gone'] if day == 4 else [])
+
+        self.assertEqual(self.row('gone')[4:], (3, '2024-01-04T00:00:00Z'))
+        self.assertEqual(self.row('stays')[4:], (0, None))
+        self.assertIsNone(self.row('other')[5])  # Only the search that last saw a job can expire it
+
+        insert_jobs([self.job('gone')], 'kl', now='2024-01-05T00:00:00Z')
+        self.assertEqual(self.row('gone')[4:], (0, None))
+        self.assertEqual([c['kind'] for c in list_changes(unique_id='gone')], ['new', 'expired', 'reopened'])
+
 if __name__ == '__main__':
     unittest.main()
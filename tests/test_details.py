@@ -0,0 +1,126 @@
+# tests/test_details.py
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from database.database import close_connections, connect_db, create_table, insert_jobs, list_changes
+from scraper.cache import PageCache, PageStore
+from scraper.crawler import HostPacer
+from scraper.details import parse_job_detail
+from test_cache import ETagSession
+from worker.enrichment import Enricher
+
+def detail_page(description, classification='Electrical/Electronic Engineering (Engineering)', posted='Posted 3d ago'):
+    return (f'<html><body><h1 data-automation="job-detail-title">Engineer</h1>'
+            f'<span data-automation="job-detail-classifications"><a>{classification}</a></span>'
+            f'<span data-automation="job-detail-date">{posted}</span>'
+            f'<div data-automation="jobAdDetails"><p>{description}</p><ul><li>Degree</li></ul></div></body></html>')
+
+class TestParseJobDetail(unittest.TestCase):
+
+    def test_reads_the_detail_elements(self):
+        detail = parse_job_detail(detail_page('Design circuits.'))
+        self.assertEqual(detail['jobDescription'], 'Design circuits.\nDegree')
+        self.assertEqual(detail['jobCategory'], 'Engineering')
+        self.assertEqual(detail['jobSubCategory'], 'Electrical/Electronic Engineering')
+        self.assertIsNotNone(detail['listed_at'])
+
+    def test_prefers_the_embedded_app_state(self):
+        state = {'jobdetails': {'result': {'job': {
+            'content': '<p>Build <b>robots</b>.</p>',
+            'listedAt': {'dateTimeUtc': '2024-03-14T02:11:09.000Z', 'label': '3d ago'},
+            'classifications': [{'classification': {'description': 'Engineering'},
+                                 'subclassification': {'description': 'Mechanical Engineering'}}],
+        }}}}
+        html = f'<script>window.SEEK_REDUX_DATA = {json.dumps(state)};</script>{detail_page("Ignored")}'
+        self.assertEqual(parse_job_detail(html), {
+            'jobDescription': 'Build\nrobots\n.',
+            'jobCategory': 'Engineering',
+            'jobSubCategory': 'Mechanical Engineering',
+            'listed_at': '2024-03-14T02:11:09Z',
+        })
+
+    def test_page_without_details(self):
+        self.assertEqual(set(parse_job_detail('<html></html>').values()), {None})
+
+class TestEnricher(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+        self.pages = {f'https://jobs.test/job/{i}': detail_page(f'Job {i} duties.') for i in range(4)}
+        insert_jobs([{'uniqueId': f'id-{i}', 'jobTitle': f'Job {i}', 'jobURL': f'https://jobs.test/job/{i}'}
+                     for i in range(4)])
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def enricher(self, session, **kwargs):
+        return Enricher(session=session, pacer=HostPacer(rate=1000, burst=1000),
+                        cache=PageCache(os.path.join(self.tmp_dir.name, 'cache')),
+                        store=PageStore(os.path.join(self.tmp_dir.name, 'pages')), max_workers=2, **kwargs)
+
+    def row(self, unique_id):
+        return connect_db().execute(
+            'SELECT jobDescription, jobCategory, jobSubCategory, enriched_at FROM jobs WHERE uniqueId = ?', (unique_id,),
+        ).fetchone()
+
+    def test_background_batch_fills_columns_and_stores_pages(self):
+        session = ETagSession(self.pages)
+        enricher = self.enricher(session)
+        try:
+            self.assertEqual(enricher.submit(['id-0', 'id-1']).result(timeout=10), 2)
+        finally:
+            enricher.close()
+
+        self.assertEqual(self.row('id-0')[:3], ('Job 0 duties.\nDegree', 'Engineering', 'Electrical/Electronic Engineering'))
+        self.assertIsNotNone(self.row('id-0')[3])
+        self.assertIsNone(self.row('id-2')[3])
+        self.assertEqual(len(session.sent_headers), 2)
+        stored = [name for _, _, names in os.walk(os.path.join(self.tmp_dir.name, 'pages')) for name in names]
+        self.assertEqual(len(stored), 2)
+        self.assertTrue(all(name.endswith('.html.gz') for name in stored))
+
+    def test_cached_page_is_not_fetched_again(self):
+        session = ETagSession(self.pages)
+        enricher = self.enricher(session)
+        enricher.enrich(['id-0'])
+        # A repost pointing at the same page
+        insert_jobs([{'uniqueId': 'repost', 'jobTitle': 'Job 0', 'jobURL': 'https://jobs.test/job/0'}])
+        self.assertEqual(enricher.enrich(['repost']), 1)
+        self.assertEqual(len(session.sent_headers), 1)
+
+        # Past the TTL the request is conditional and a 304 reuses the parse
+        stale = self.enricher(session, cache_ttl=0)
+        insert_jobs([{'uniqueId': 'repost-2', 'jobTitle': 'Job 0', 'jobURL': 'https://jobs.test/job/0'}])
+        stale.enrich(['repost-2'])
+        self.assertIn('If-None-Match', session.sent_headers[-1])
+        self.assertEqual(self.row('repost-2')[0], 'Job 0 duties.\nDegree')
+        enricher.close()
+        stale.close()
+
+    def test_later_crawls_keep_the_details(self):
+        enricher = self.enricher(ETagSession(self.pages))
+        enricher.enrich(['id-0'])
+        enricher.close()
+        # The search card carries no category; a salary change must not wipe the enriched one
+        insert_jobs([{'uniqueId': 'id-0', 'jobTitle': 'Job 0', 'jobURL': 'https://jobs.test/job/0', 'jobSalary': 'RM 5,000'}])
+        self.assertEqual(self.row('id-0')[1:3], ('Engineering', 'Electrical/Electronic Engineering'))
+        self.assertEqual([c['field'] for c in list_changes(unique_id='id-0') if c['kind'] == 'updated'], ['jobSalary'])
+
+    def test_host_budget_caps_fetches_per_batch(self):
+        session = ETagSession(self.pages)
+        enricher = self.enricher(session, host_budget=3)
+        self.assertEqual(enricher.enrich([f'id-{i}' for i in range(4)]), 3)
+        self.assertEqual(len(session.sent_headers), 3)
+        enricher.close()
+
+if __name__ == '__main__':
+    unittest.main()
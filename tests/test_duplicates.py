@@ -0,0 +1,82 @@
+# tests/test_duplicates.py
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from database.database import close_connections, connect_db, create_table, insert_jobs
+from database.duplicates import NearDuplicates, features, group_key
+
+def job(unique_id, title, company='ACME Sdn Bhd', location='Kuala Lumpur'):
+    return {'uniqueId': unique_id, 'jobTitle': title, 'jobCompany': company, 'jobLocation': location}
+
+class TestNormalization(unittest.TestCase):
+
+    def test_word_order_punctuation_and_company_suffix(self):
+        self.assertEqual(features(job('a', 'Intern – Electrical')), features(job('b', 'Electrical Intern')))
+        self.assertEqual(group_key(job('a', 'x', 'ACME Sdn. Bhd.', 'Kuala Lumpur, Selangor')),
+                         group_key(job('b', 'x', 'acme', 'Selangor, Kuala Lumpur')))
+
+class TestNearDuplicates(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+        self.index = NearDuplicates().load()
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_reposts_link_to_the_first_copy(self):
+        original = job('orig', 'Electrical Engineering Intern')
+        self.assertEqual(self.index.link([original]), {})
+
+        reposts = [
+            job('reordered', 'Intern - Electrical Engineering'),
+            job('edited', 'Electrical Engineer Intern', location='kuala lumpur'),
+        ]
+        self.assertEqual(self.index.link(reposts), {'reordered': 'orig', 'edited': 'orig'})
+        self.assertEqual(self.index.canonical_id('edited'), 'orig')
+        self.assertEqual(self.index.canonical_id('orig'), 'orig')
+
+    def test_different_jobs_are_not_linked(self):
+        self.index.link([job('orig', 'Electrical Intern')])
+        others = [
+            job('role', 'Mechanical Intern'),
+            job('company', 'Electrical Intern', company='Widgets'),
+            job('place', 'Electrical Intern', location='Penang'),
+            job('senior', 'Senior Software Engineer'),
+        ]
+        self.assertEqual(self.index.link(others), {})
+
+    def test_repost_within_one_batch_and_chains(self):
+        links = self.index.link([job('first', 'Data Analyst Intern'), job('second', 'Intern, Data Analyst')])
+        self.assertEqual(links, {'second': 'first'})
+        # A repost of a repost still points at the original
+        self.assertEqual(self.index.link([job('third', 'Data Analyst - Intern')]), {'third': 'first'})
+        self.assertEqual(self.index.find(job('probe', 'Intern Data Analyst')), 'first')
+
+    def test_relinking_is_a_no_op(self):
+        self.index.link([job('orig', 'Electrical Intern')])
+        self.assertEqual(self.index.link([job('orig', 'Electrical Intern')]), {})
+        count = connect_db().execute('SELECT COUNT(*) FROM job_lsh_buckets').fetchone()[0]
+        self.assertEqual(count, self.index.bands)
+
+    def test_backfill_indexes_existing_rows(self):
+        insert_jobs([job('old', 'Civil Engineer'), job('old-repost', 'Engineer (Civil)')])
+        index = NearDuplicates().load()
+        self.assertEqual(index.canonical_id('old-repost'), 'old')
+        self.assertEqual(index.backfill(), 0)
+
+    def test_candidate_lookup_uses_the_bucket_index(self):
+        plan = connect_db().execute(
+            'EXPLAIN QUERY PLAN SELECT uniqueId FROM job_lsh_buckets WHERE bucket IN (?, ?)', (1, 2)).fetchall()
+        self.assertIn('idx_job_lsh_buckets', ' '.join(str(row) for row in plan))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# tests/test_frontier.py
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from database.database import close_connections, create_table, list_changes
+from database.frontier import Frontier
+from database.known_ids import KnownIds
+from scraper.crawler import Crawler, HostPacer
+from test_crawler import FakeSession, results_page
+from worker import worker
+from worker.worker import parse_jobs
+
+class FlakySession(FakeSession):
+    """FakeSession that answers each URL in failures with a 503 that many times first."""
+
+    def __init__(self, pages, failures):
+        super().__init__(pages, delay=0)
+        self.failures = dict(failures)
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            failing = self.failures.get(url, 0)
+            self.failures[url] = failing - 1
+        if failing > 0:
+            self.requested.append(url)
+            return MagicMock(status_code=503, text='', headers={}, content=b'')
+        return super().get(url, headers, timeout)
+
+class FrontierTestCase(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+        self.frontier = Frontier(lease_seconds=60, max_attempts=2, retry_delay=0).load()
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+class TestFrontier(FrontierTestCase):
+
+    def test_claims_are_leased_to_one_owner(self):
+        self.frontier.start('s', [f'https://jobs.test/{i}' for i in range(4)])
+        self.frontier.add('s', 'https://jobs.test/0?page=2', 2, priority=1)
+        first = self.frontier.claim('s', 'a', 2, now=100)
+        second = self.frontier.claim('s', 'b', 10, now=100)
+        # Higher priority first, then the shallowest pages
+        self.assertEqual(first, [('https://jobs.test/0?page=2', 2), ('https://jobs.test/0', 1)])
+        self.assertEqual([url for url, _ in second], [f'https://jobs.test/{i}' for i in (1, 2, 3)])
+        self.assertEqual(self.frontier.claim('s', 'c', 10, now=100), [])
+
+    def test_concurrent_claims_never_overlap(self):
+        self.frontier.start('s', [f'https://jobs.test/{i}' for i in range(200)])
+        claimed = {name: [] for name in 'abcd'}
+
+        def work(owner):
+            while True:
+                batch = self.frontier.claim('s', owner, 3)
+                if not batch:
+                    return
+                claimed[owner].extend(url for url, _ in batch)
+
+        threads = [threading.Thread(target=work, args=(owner,)) for owner in claimed]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        everything = [url for urls in claimed.values() for url in urls]
+        self.assertEqual(len(everything), 200)
+        self.assertEqual(len(set(everything)), 200)
+
+    def test_expired_lease_is_handed_out_again_until_max_attempts(self):
+        self.frontier.start('s', ['https://jobs.test/1'])
+        self.assertTrue(self.frontier.claim('s', 'dead', 1, now=0))
+        self.assertEqual(self.frontier.claim('s', 'b', 1, now=30), [])
+        self.assertEqual(self.frontier.claim('s', 'b', 1, now=61), [('https://jobs.test/1', 1)])
+        # Both attempts died with their workers: the page is dropped and the run can close
+        self.assertEqual(self.frontier.claim('s', 'c', 1, now=200), [])
+        self.assertEqual(self.frontier.outstanding('s'), 0)
+        self.assertEqual(self.frontier.finish('s')['failed'], 1)
+
+    def test_retry_backs_off_then_gives_up(self):
+        frontier = Frontier(max_attempts=3, retry_delay=10).load()
+        frontier.start('s', ['https://jobs.test/1'])
+        frontier.claim('s', 'a', 1, now=0)
+        frontier.retry('s', 'https://jobs.test/1', 'status 503', now=0)
+        self.assertEqual(frontier.next_retry('s', now=4), 6)
+        self.assertEqual(frontier.claim('s', 'a', 1, now=5), [])
+        frontier.claim('s', 'a', 1, now=10)
+        frontier.retry('s', 'https://jobs.test/1', 'status 503', now=10)
+        self.assertEqual(frontier.next_retry('s', now=10), 20)
+        frontier.claim('s', 'a', 1, now=30)
+        frontier.retry('s', 'https://jobs.test/1', 'status 503', now=30)
+        self.assertIsNone(frontier.next_retry('s'))
+        self.assertEqual(frontier.finish('s')['failed'], 1)
+
+    def test_start_resumes_an_unfinished_run(self):
+        run = self.frontier.start('s', ['https://jobs.test/1', 'https://jobs.test/2'])
+        self.assertFalse(run['resumed'])
+        self.frontier.claim('s', 'a', 1)
+        self.frontier.complete('s', 'https://jobs.test/1', jobs_found=3)
+        self.assertIsNone(self.frontier.finish('s'))
+
+        resumed = self.frontier.start('s', ['https://jobs.test/other'])
+        self.assertTrue(resumed['resumed'])
+        self.assertEqual((resumed['started_at'], resumed['jobs_found']), (run['started_at'], 3))
+        self.assertEqual(self.frontier.claim('s', 'b', 10), [('https://jobs.test/2', 1)])
+        self.frontier.complete('s', 'https://jobs.test/2')
+        self.assertEqual(self.frontier.finish('s')['jobs_found'], 3)
+        self.assertFalse(self.frontier.start('s', ['https://jobs.test/1'])['resumed'])
+
+class TestCrawlFrontier(FrontierTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pages = {f'https://jobs.test/a-jobs?page={page}': results_page('a-jobs', page, 3) for page in (2, 3)}
+        self.pages['https://jobs.test/a-jobs'] = results_page('a-jobs', 1, 3)
+
+    def crawler(self, session):
+        return Crawler(parse=parse_jobs, session=session, pacer=HostPacer(rate=1000, burst=1000), max_workers=2)
+
+    def test_interrupted_crawl_resumes_without_refetching_done_pages(self):
+        self.frontier.start('s', ['https://jobs.test/a-jobs'])
+        session = FakeSession(self.pages, delay=0)
+        pages = self.crawler(session).crawl_frontier(self.frontier, 's', 'first')
+        self.assertEqual(len(next(pages)), 3)
+        # Stopped while the consumer had page 1: it was never marked done
+        pages.close()
+        self.assertEqual(self.frontier.outstanding('s'), 2)
+
+        self.assertTrue(self.frontier.start('s', ['https://jobs.test/a-jobs'])['resumed'])
+        crawled = list(self.crawler(session).crawl_frontier(self.frontier, 's', 'second'))
+        self.assertEqual(sum(len(jobs) for jobs in crawled), 9)
+        self.assertEqual(session.requested.count('https://jobs.test/a-jobs'), 2)
+        self.assertEqual(session.requested.count('https://jobs.test/a-jobs?page=2'), 1)
+        self.assertEqual(self.frontier.finish('s')['jobs_found'], 9)
+
+    def test_failed_pages_are_retried(self):
+        self.frontier.start('s', ['https://jobs.test/a-jobs'])
+        session = FlakySession(self.pages, {'https://jobs.test/a-jobs?page=2': 1, 'https://jobs.test/a-jobs?page=3': 5})
+        crawled = list(self.crawler(session).crawl_frontier(self.frontier, 's', 'a'))
+        # Page 2 succeeds on its second attempt; page 3 fails both and is dropped
+        self.assertEqual(len(crawled), 2)
+        self.assertEqual(session.requested.count('https://jobs.test/a-jobs?page=3'), 2)
+        self.assertEqual(self.frontier.finish('s')['failed'], 1)
+
+    def test_pages_that_cannot_be_fetched_cut_the_run_short(self):
+        self.frontier.start('s', ['https://jobs.test/a-jobs', 'https://jobs.test/missing'])
+        crawled = list(self.crawler(FakeSession(self.pages, delay=0)).crawl_frontier(self.frontier, 's', 'a'))
+        self.assertEqual(sum(len(jobs) for jobs in crawled), 9)
+        self.assertTrue(self.frontier.finish('s')['cut_short'])
+
+        self.frontier.start('s', ['https://jobs.test/a-jobs'])
+        crawler = self.crawler(FakeSession(self.pages, delay=0))
+        crawler.max_pages = 2
+        list(crawler.crawl_frontier(self.frontier, 's', 'b'))
+        self.assertTrue(self.frontier.finish('s')['cut_short'])
+
+    def test_worker_stores_each_page_and_expires_after_a_complete_run(self):
+        session = FakeSession(self.pages, delay=0)
+        with patch('worker.worker.get_frontier', return_value=self.frontier), \
+                patch('worker.worker.get_session', return_value=session), \
+                patch('worker.worker.get_pacer', return_value=HostPacer(rate=1000, burst=1000)), \
+                patch('worker.worker.get_known_ids', return_value=KnownIds('set').load()), \
+                patch('worker.worker.get_page_cache', return_value=None), \
+                patch('worker.worker.get_job_writer', return_value=MagicMock()), \
+                patch('worker.worker.get_near_duplicates', return_value=None), \
+                patch('worker.worker.announce_jobs') as announce, \
+                patch('worker.worker.expire_unseen') as expire:
+            new_jobs = worker.run_scraping_cycle(['https://jobs.test/a-jobs'], 'https://hook.test', 'search-a')
+
+        self.assertEqual(len(new_jobs), 9)
+        announce.assert_called_once()
+        expire.assert_called_once()
+        self.assertEqual(expire.call_args.args[0], 'search-a')
+        self.assertEqual(len([c for c in list_changes(limit=50) if c['kind'] == 'new']), 9)
+        self.assertEqual(self.frontier.outstanding('search-a'), 0)
+
+    def test_worker_does_not_expire_after_a_run_that_dropped_pages(self):
+        session = FlakySession(self.pages, {'https://jobs.test/a-jobs?page=3': 5})
+        with patch('worker.worker.get_frontier', return_value=self.frontier), \
+                patch('worker.worker.get_session', return_value=session), \
+                patch('worker.worker.get_pacer', return_value=HostPacer(rate=1000, burst=1000)), \
+                patch('worker.worker.get_known_ids', return_value=KnownIds('set').load()), \
+                patch('worker.worker.get_page_cache', return_value=None), \
+                patch('worker.worker.get_job_writer', return_value=MagicMock()), \
+                patch('worker.worker.get_near_duplicates', return_value=None), \
+                patch('worker.worker.announce_jobs'), \
+                patch('worker.worker.expire_unseen') as expire:
+            new_jobs = worker.run_scraping_cycle(['https://jobs.test/a-jobs'], 'https://hook.test', 'search-a')
+
+        self.assertEqual(len(new_jobs), 6)
+        expire.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
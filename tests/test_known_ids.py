@@ -0,0 +1,58 @@
+# tests/test_known_ids.py
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from database.database import close_connections, create_table, insert_jobs
+from database.known_ids import BloomFilter, KnownIds
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives_and_low_false_positive_rate(self):
+        bloom = BloomFilter(5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"known-{i}")
+
+        self.assertTrue(all(f"known-{i}" in bloom for i in range(5000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(5000))
+        self.assertLess(false_positives, 150)  # ~1% expected
+
+class TestKnownIds(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+        insert_jobs([{'uniqueId': f'id-{i}', 'jobTitle': 'T'} for i in range(100)])
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_modes_agree(self):
+        for mode in ('bloom', 'set'):
+            with self.subTest(mode=mode):
+                known = KnownIds(mode=mode).load()
+                new_id = f'new-{mode}'
+                self.assertEqual(known.unseen(['id-1', 'id-99', new_id]), {new_id})
+                known.add(insert_jobs([{'uniqueId': new_id, 'jobTitle': 'T'}]))
+                self.assertEqual(known.unseen([new_id, 'other']), {'other'})
+
+    def test_has_unseen(self):
+        known = KnownIds().load()
+        self.assertFalse(known.has_unseen([{'uniqueId': 'id-1'}, {'uniqueId': 'id-2'}]))
+        self.assertTrue(known.has_unseen([{'uniqueId': 'id-1'}, {'uniqueId': 'new'}]))
+        self.assertTrue(known.has_unseen([]))
+
+    def test_bloom_grows_past_capacity(self):
+        known = KnownIds().load()
+        known.add(f'extra-{i}' for i in range(known._ids.capacity + 1))
+        # Rebuilt from the table, which doesn't hold the extra ids
+        self.assertEqual(known.unseen(['id-5', 'extra-1']), {'extra-1'})
+
+if __name__ == '__main__':
+    unittest.main()
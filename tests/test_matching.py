@@ -0,0 +1,99 @@
+# tests/test_matching.py
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from matching.matching import Matcher, Subscription, load_subscriptions
+from metrics import metrics
+from worker import worker
+
+def job(unique_id, title, location='Kuala Lumpur', salary=None, company='Acme'):
+    return {'uniqueId': unique_id, 'jobTitle': title, 'jobCompany': company,
+            'jobLocation': location, 'jobSalary': salary}
+
+class TestMatcher(unittest.TestCase):
+
+    def test_every_keyword_must_appear(self):
+        matcher = Matcher([Subscription('ee', 'ali', keywords='Electrical Engineer')])
+        self.assertEqual([s.id for s in matcher.match_job(job('1', 'Senior Electrical Engineer'))], ['ee'])
+        self.assertEqual(matcher.match_job(job('2', 'Electrical Technician')), [])
+
+    def test_location_and_salary_floor(self):
+        matcher = Matcher([Subscription('kl', 'ali', keywords='engineer', location='kuala lumpur', min_salary=5000)])
+        self.assertTrue(matcher.match_job(job('1', 'Engineer', salary='RM 4,000 - RM 6,000 per month')))
+        self.assertFalse(matcher.match_job(job('2', 'Engineer', salary='RM 3,000 - RM 4,000 per month')))
+        self.assertFalse(matcher.match_job(job('3', 'Engineer', salary=None)))
+        self.assertFalse(matcher.match_job(job('4', 'Engineer', location='Penang', salary='RM 9,000')))
+        # A location word in the title is not a location
+        self.assertFalse(matcher.match_job(job('5', 'Engineer Kuala Lumpur', location='Penang', salary='RM 9,000')))
+
+    def test_subscription_without_words_sees_every_job(self):
+        matcher = Matcher([Subscription('rich', 'ali', min_salary=10000)])
+        self.assertTrue(matcher.match_job(job('1', 'Chef', salary='RM 12,000')))
+        self.assertFalse(matcher.match_job(job('2', 'Chef', salary='RM 2,000')))
+
+    def test_digest_lists_a_job_once_per_subscriber(self):
+        matcher = Matcher([
+            Subscription('a', 'ali', keywords='engineer', webhook='https://hooks.test/ali'),
+            Subscription('b', 'ali', keywords='electrical'),
+            Subscription('c', 'bea', keywords='chef', webhook='https://hooks.test/bea'),
+        ])
+        jobs = [job('1', 'Electrical Engineer'), job('2', 'Chef'), job('3', 'Civil Engineer')]
+        digests = matcher.digests(jobs)
+        self.assertEqual(list(digests), ['ali', 'bea'])
+        self.assertEqual([j['uniqueId'] for j in digests['ali']['jobs']], ['1', '3'])
+        self.assertEqual(digests['ali']['subscriptions'], ['a', 'b'])
+        self.assertEqual(digests['ali']['webhook'], 'https://hooks.test/ali')
+        self.assertEqual([j['uniqueId'] for j in digests['bea']['jobs']], ['2'])
+
+    def test_candidates_grow_with_matches_not_subscriptions(self):
+        matcher = Matcher([Subscription(f'sub-{i}', f'user-{i}', keywords=f'skill{i} engineer') for i in range(1000)])
+        before = metrics.REGISTRY.snapshot()
+        matched = matcher.match([job(str(i), f'skill{i} Engineer') for i in range(20)])
+        delta = metrics.REGISTRY.snapshot(since=before)
+        self.assertEqual(len(matched), 20)
+        if metrics.enabled():
+            # Each job pulls its own subscription, plus the one filed under the shared word
+            self.assertLessEqual(metrics.total(delta, 'matching_candidates_total'), 40)
+
+    def test_add_replaces_and_remove_unindexes(self):
+        matcher = Matcher([Subscription('a', 'ali', keywords='engineer')])
+        matcher.add(Subscription('a', 'ali', keywords='chef'))
+        self.assertEqual(len(matcher), 1)
+        self.assertFalse(matcher.match_job(job('1', 'Engineer')))
+        self.assertTrue(matcher.match_job(job('2', 'Chef')))
+        matcher.remove('a')
+        matcher.remove('missing')
+        self.assertEqual(len(matcher), 0)
+        self.assertFalse(matcher.match_job(job('3', 'Chef')))
+
+    def test_load_subscriptions_skips_malformed_entries(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'subscriptions.json')
+            self.assertEqual(load_subscriptions(path), [])
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump([{'id': 'a', 'subscriber': 'ali', 'keywords': 'engineer'},
+                           {'id': 'b', 'subscriber': 'bea', 'colour': 'blue'}], file)
+            self.assertEqual([s.id for s in load_subscriptions(path)], ['a'])
+
+class TestNotifySubscribers(unittest.TestCase):
+
+    def test_sends_one_titled_digest_per_subscriber(self):
+        matcher = Matcher([Subscription('a', 'ali', keywords='engineer', webhook='https://hooks.test/ali'),
+                           Subscription('b', 'bea', keywords='chef')])
+        jobs = [job('1', 'Engineer'), dict(job('2', 'Engineer'), canonicalId='1'), job('3', 'Chef')]
+        with patch('worker.worker.get_matcher', return_value=matcher), \
+                patch('worker.worker.DiscordNotifier') as notifier:
+            notifier.return_value.send.return_value = 0
+            worker.notify_subscribers(jobs)
+
+        # bea has no webhook and the repost is never announced
+        notifier.assert_called_once_with('https://hooks.test/ali')
+        sent, = notifier.return_value.send.call_args_list
+        self.assertEqual([j['uniqueId'] for j in sent.args[0]], ['1'])
+        self.assertEqual(sent.kwargs['title'], '🔔 1 new jobs for ali')
+
+if __name__ == '__main__':
+    unittest.main()
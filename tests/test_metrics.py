@@ -0,0 +1,107 @@
+# tests/test_metrics.py
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from metrics import metrics
+from metrics.metrics import Registry, serve_metrics
+from scraper.crawler import Crawler, HostPacer
+from test_crawler import FakeSession, results_page
+from worker.worker import parse_jobs
+
+class TestRegistry(unittest.TestCase):
+
+    def test_render_prometheus_text(self):
+        registry = Registry(enabled=True)
+        registry.counter('pages_total', 'Pages').inc(host='a.test', status=200)
+        registry.counter('pages_total', 'Pages').inc(2, host='a.test', status=200)
+        registry.gauge('depth', 'Queue depth').set(3, queue='pages')
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+
+        text = registry.render()
+        self.assertIn('# TYPE pages_total counter', text)
+        self.assertIn('pages_total{host="a.test",status="200"} 3', text)
+        self.assertIn('depth{queue="pages"} 3', text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_sum 5.55', text)
+        self.assertIn('latency_seconds_count 3', text)
+
+    def test_disabled_registry_records_nothing(self):
+        registry = Registry(enabled=False)
+        registry.counter('pages_total', 'Pages').inc()
+        with registry.histogram('latency_seconds', 'Latency').time():
+            pass
+        self.assertEqual(registry.snapshot(), {})
+
+    def test_redeclaring_a_name_returns_the_same_metric(self):
+        registry = Registry(enabled=True)
+        self.assertIs(registry.counter('pages_total', 'Pages'), registry.counter('pages_total', 'Pages'))
+        with self.assertRaises(ValueError):
+            registry.gauge('pages_total', 'Pages')
+
+    def test_snapshot_since_gives_what_happened_in_between(self):
+        registry = Registry(enabled=True)
+        jobs = registry.counter('jobs_total', 'Jobs')
+        jobs.inc(5, outcome='new')
+        before = registry.snapshot()
+        jobs.inc(2, outcome='new')
+        jobs.inc(7, outcome='duplicate')
+
+        delta = registry.snapshot(since=before)
+        self.assertEqual(metrics.total(delta, 'jobs_total', outcome='new'), 2)
+        self.assertEqual(metrics.total(delta, 'jobs_total'), 9)
+
+    def test_metrics_endpoint(self):
+        registry = Registry(enabled=True)
+        registry.counter('pages_total', 'Pages').inc()
+        server = serve_metrics(0, registry=registry)
+        try:
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            response = requests.get(base + '/metrics', timeout=5)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('pages_total 1', response.text)
+            self.assertEqual(requests.get(base + '/other', timeout=5).status_code, 404)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+class ThrottlingSession(FakeSession):
+    """FakeSession that answers one URL with a 429."""
+
+    def __init__(self, pages, throttled_url):
+        super().__init__(pages)
+        self.throttled_url = throttled_url
+
+    def get(self, url, headers=None, timeout=None):
+        if url != self.throttled_url:
+            return super().get(url, headers, timeout)
+        response = MagicMock(status_code=429, text='', headers={}, content=b'')
+        return response
+
+class TestCrawlerMetrics(unittest.TestCase):
+
+    def test_crawl_records_responses_cards_and_throttling(self):
+        pages = {'https://jobs.test/a-jobs': results_page('a-jobs', 1, 1),
+                 'https://jobs.test/b-jobs': results_page('b-jobs', 1, 1)}
+        before = metrics.REGISTRY.snapshot()
+        crawler = Crawler(parse=parse_jobs, session=ThrottlingSession(pages, 'https://jobs.test/b-jobs'),
+                          pacer=HostPacer(rate=1000, burst=1000))
+        list(crawler.crawl(['https://jobs.test/a-jobs', 'https://jobs.test/b-jobs']))
+
+        delta = metrics.REGISTRY.snapshot(since=before)
+        self.assertEqual(metrics.total(delta, 'scraper_responses_total', host='jobs.test'), 2)
+        self.assertEqual(metrics.total(delta, 'scraper_responses_total', status=429), 1)
+        self.assertEqual(metrics.total(delta, 'scraper_throttled_total'), 1)
+        self.assertEqual(metrics.total(delta, 'scraper_blocked_total'), 1)
+        self.assertEqual(metrics.total(delta, 'scraper_cards_parsed_total'), 3)
+        self.assertEqual(metrics.total(delta, 'scraper_fetch_seconds_count'), 2)
+        self.assertEqual(metrics.total(delta, 'scraper_parse_seconds_count'), 1)
+
+if __name__ == '__main__':
+    unittest.main()
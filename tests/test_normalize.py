@@ -0,0 +1,59 @@
+import unittest
+from datetime import datetime, timezone
+
+from database.normalize import normalize_jobs, parse_listing_date, parse_salary
+
+NOW = datetime(2024, 3, 15, 12, 0, tzinfo=timezone.utc)
+
+class TestParseSalary(unittest.TestCase):
+
+    def test_ranges_periods_and_currencies(self):
+        cases = {
+            'RM 3,000 – RM 4,500 per month': (3000, 4500, 'month', 'MYR'),
+            'RM\xa01,200\xa0per month': (1200, 1200, 'month', 'MYR'),
+            'S$4,000 - S$5,500 monthly': (4000, 5500, 'month', 'SGD'),
+            'Rp 5.000.000 – Rp 7.000.000 per month': (5000000, 7000000, 'month', 'IDR'),
+            'RM 60,000 – 80,000 per year': (60000, 80000, 'year', 'MYR'),
+            'RM 12.50 per hour': (12.5, 12.5, 'hour', 'MYR'),
+            'RM 3 - 4k': (3000, 4000, None, 'MYR'),
+            'Rp 5 jt - 7 jt': (5000000, 7000000, None, 'IDR'),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_salary(text), expected)
+
+    def test_unspecified_salary(self):
+        for text in ('Not Specified', '', None, 'Competitive'):
+            with self.subTest(text=text):
+                self.assertEqual(parse_salary(text), (None, None, None, None))
+
+class TestParseListingDate(unittest.TestCase):
+
+    def test_relative_and_absolute_dates(self):
+        cases = {
+            '3d ago': '2024-03-12T12:00:00Z',
+            '30+d ago': '2024-02-14T12:00:00Z',
+            '5h ago': '2024-03-15T07:00:00Z',
+            '10m ago': '2024-03-15T11:50:00Z',
+            'Listed 2 weeks ago': '2024-03-01T12:00:00Z',
+            'yesterday': '2024-03-14T12:00:00Z',
+            '2024-03-14T02:11:09Z': '2024-03-14T02:11:09Z',
+            '2024-03-14T10:11:09+08:00': '2024-03-14T02:11:09Z',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_listing_date(text, NOW), expected)
+
+    def test_unknown_dates(self):
+        for text in ('N/A', '', None):
+            self.assertIsNone(parse_listing_date(text, NOW))
+
+    def test_normalize_jobs(self):
+        jobs = [{'jobSalary': 'RM 3,000 – RM 4,500 per month', 'jobListingDate': '1d ago'}, {}]
+        self.assertEqual(normalize_jobs(jobs, NOW), [
+            (3000, 4500, 'month', 'MYR', '2024-03-14T12:00:00Z'),
+            (None, None, None, None, None),
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+# tests/test_notifier.py
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from notifier.notifier import (MAX_EMBED_CHARS_PER_MESSAGE, MAX_EMBEDS_PER_MESSAGE, MAX_FIELDS_PER_EMBED,
+                               DiscordNotifier, job_field, pack_messages)
+
+def make_jobs(count, title_length=20):
+    return [{
+        'jobTitle': f"Job {i} " + "x" * title_length,
+        'jobCompany': f"Company {i}",
+        'jobLocation': "Kuala Lumpur",
+        'jobSalary': "Not Specified" if i % 2 else "RM 3,000",
+        'jobURL': f"https://www.jobstreet.com.my/job/{i}",
+        'uniqueId': str(i),
+    } for i in range(count)]
+
+class FakeWebhook(ThreadingHTTPServer):
+    """Local stand-in for a Discord webhook with a small rate-limit bucket.
+
+    Requests over the bucket get a 429 with retry_after, like Discord does.
+    `fail_next` forces that many 500 responses first.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, bucket_size=3, reset_after=0.2, fail_next=0):
+        super().__init__(('127.0.0.1', 0), WebhookHandler)
+        self.bucket_size = bucket_size
+        self.reset_after = reset_after
+        self.fail_next = fail_next
+        self.lock = threading.Lock()
+        self.remaining = bucket_size
+        self.reset_at = 0.0
+        self.received = []
+        self.rate_limited = 0
+        self.max_in_flight = 0
+        self.in_flight = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/webhooks/1/token"
+
+class WebhookHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            now = time.monotonic()
+            if now >= server.reset_at:
+                server.remaining, server.reset_at = server.bucket_size, now + server.reset_after
+            if server.fail_next:
+                server.fail_next -= 1
+                status, payload = 500, {}
+            elif server.remaining == 0:
+                server.rate_limited += 1
+                status, payload = 429, {'retry_after': server.reset_at - now, 'global': False}
+            else:
+                server.remaining -= 1
+                status, payload = 204, None
+                server.received.append((self.headers['Content-Type'], body))
+            remaining, reset_after = server.remaining, max(server.reset_at - now, 0)
+
+        time.sleep(0.01)
+        data = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        self.send_header('X-RateLimit-Limit', str(server.bucket_size))
+        self.send_header('X-RateLimit-Remaining', str(remaining))
+        self.send_header('X-RateLimit-Reset-After', f"{reset_after:.3f}")
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with server.lock:
+            server.in_flight -= 1
+
+class TestPackMessages(unittest.TestCase):
+
+    def test_packs_within_discord_limits(self):
+        payloads = pack_messages(make_jobs(400, title_length=120))
+        self.assertEqual(sum(len(embed['fields']) for p in payloads for embed in p['embeds']), 400)
+        for page, payload in enumerate(payloads, start=1):
+            embeds = payload['embeds']
+            self.assertLessEqual(len(embeds), MAX_EMBEDS_PER_MESSAGE)
+            self.assertTrue(all(len(embed['fields']) <= MAX_FIELDS_PER_EMBED for embed in embeds))
+            chars = sum(len(f['name']) + len(f['value']) for embed in embeds for f in embed['fields'])
+            chars += len(embeds[0]['title']) + len(embeds[-1]['footer']['text'])
+            self.assertLessEqual(chars, MAX_EMBED_CHARS_PER_MESSAGE)
+            self.assertEqual(embeds[0]['title'], f"🚀 Job Scraper Report (Page {page}/{len(payloads)})")
+
+    def test_records_without_salary_or_location(self):
+        # scraper.scraper records carry no jobSalary/jobLocation
+        field = job_field({'jobTitle': 'Engineer', 'jobCompany': 'Widgets', 'jobURL': 'https://x/job/1'})
+        self.assertEqual(field['value'], "🏢 **Widgets**\n[👉 View Job](https://x/job/1)")
+        field = job_field({'jobTitle': 'Intern', 'jobCompany': 'ACME', 'jobLocation': 'KL',
+                           'jobSalary': 'RM 1,000', 'jobURL': 'https://x/job/2'})
+        self.assertEqual(field['value'], "🏢 **ACME**\n📍 KL • RM 1,000\n[👉 View Job](https://x/job/2)")
+
+    def test_fewer_messages_than_fixed_chunks(self):
+        # The old sender posted one 10-field embed per message
+        self.assertLess(len(pack_messages(make_jobs(100))), 10)
+
+class TestDiscordNotifier(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_file = os.path.join(self.tmp_dir.name, 'queue.jsonl')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def start(self, **kwargs):
+        server = FakeWebhook(**kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def notifier(self, server, **kwargs):
+        return DiscordNotifier(server.url, queue_file=self.queue_file, **kwargs)
+
+    def test_sends_everything_and_attaches_file_last(self):
+        server = self.start(bucket_size=3, reset_after=0.1)
+        csv_path = os.path.join(self.tmp_dir.name, 'jobs.csv')
+        with open(csv_path, 'w') as f:
+            f.write("jobTitle\nEngineer\n")
+
+        jobs = make_jobs(300, title_length=150)
+        failed = self.notifier(server).send(jobs, csv_path)
+
+        self.assertEqual(failed, 0)
+        self.assertEqual(len(server.received), len(pack_messages(jobs)))
+        self.assertEqual(server.max_in_flight, 1)
+        multipart = [body for content_type, body in server.received if content_type.startswith('multipart/')]
+        self.assertEqual(len(multipart), 1)
+        self.assertIn(b'Engineer', multipart[0])
+        self.assertIs(server.received[-1][1], multipart[0])
+
+        # Pages arrive in order
+        pages = [int(json.loads(body)['embeds'][0]['title'].split('Page ')[1].split('/')[0])
+                 for content_type, body in server.received[:-1]]
+        self.assertEqual(pages, list(range(1, len(server.received))))
+        self.assertFalse(os.path.exists(self.queue_file))
+
+    def test_respects_rate_limit_headers(self):
+        server = self.start(bucket_size=2, reset_after=0.1)
+        self.notifier(server).send(make_jobs(400, title_length=150))
+        # The bucket size learned from the headers keeps 429s to the occasional probe
+        self.assertLessEqual(server.rate_limited, 2)
+
+    def test_failed_messages_are_queued_and_retried(self):
+        server = self.start(fail_next=100)
+        failed = self.notifier(server, max_retries=2).send(make_jobs(5))
+        self.assertEqual(failed, 1)
+        self.assertEqual(server.received, [])
+        with open(self.queue_file) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 1)
+        self.assertNotIn(server.url, json.dumps(entries))
+
+        server.fail_next = 0
+        self.assertEqual(self.notifier(server).flush_queue(), 0)
+        self.assertEqual(len(server.received), 1)
+        self.assertFalse(os.path.exists(self.queue_file))
+
+    def test_failure_queues_the_remaining_pages_in_order(self):
+        server = self.start(fail_next=1)
+        jobs = make_jobs(300, title_length=150)
+        total = len(pack_messages(jobs))
+        self.assertEqual(self.notifier(server, max_retries=1).send(jobs), total)
+        with open(self.queue_file) as f:
+            titles = [json.loads(line)['payload']['embeds'][0]['title'] for line in f]
+        self.assertEqual(titles, [f"🚀 Job Scraper Report (Page {page}/{total})" for page in range(1, total + 1)])
+
+    def test_queue_entries_for_other_webhooks_are_kept(self):
+        server = self.start(fail_next=100)
+        self.notifier(server, max_retries=1).send(make_jobs(1))
+        server.fail_next = 0
+
+        other = DiscordNotifier(server.url + "-other", queue_file=self.queue_file)
+        self.assertEqual(other.flush_queue(), 0)
+        self.assertEqual(server.received, [])
+        self.assertTrue(os.path.exists(self.queue_file))
+
+    def test_concurrent_notifiers_deliver_each_queued_message_once(self):
+        server = self.start(bucket_size=100, fail_next=100)
+        jobs = make_jobs(300, title_length=150)
+        queued = self.notifier(server, max_retries=1).send(jobs)
+        server.fail_next = 0
+
+        # Each search run builds its own notifier; they must not both take the same entries
+        read_queue = DiscordNotifier._read_queue
+
+        def slow_read(notifier):
+            entries = read_queue(notifier)
+            time.sleep(0.05)
+            return entries
+
+        with patch.object(DiscordNotifier, '_read_queue', slow_read):
+            threads = [threading.Thread(target=self.notifier(server).flush_queue) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(server.received), queued)
+        self.assertFalse(os.path.exists(self.queue_file))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# tests/test_parsers.py
+import unittest
+
+from scraper.parsers import available_engines, get_engine, parse_cards
+
+TRICKY_HTML = '''<html><body><div data-automation="normalJob"><h3><a data-automation="jobTitle" href="">  Eng &amp; <b>Intern</b> <!-- c --> x</a></h3>
+<a data-automation="jobCompany">&nbsp;ACME&nbsp;<script>var a=1;</script> Co</a><br/><img src=x>
+<span data-automation="jobSalary"><span>RM&nbsp;1,000</span> <span>- 2</span></span></p>
+<a data-automation="jobLocation">A</a><a data-automation="jobLocation"><i>B</i></a></div>
+<article data-automation="normalJob"><a data-automation="jobTitle" href="/job/2">T2</a></article>
+</body></html>'''
+
+class TestParsers(unittest.TestCase):
+
+    def setUp(self):
+        with open('tests/mock_jobstreet.html', 'r', encoding='utf-8') as file:
+            self.html = file.read()
+
+    def test_every_engine_matches_beautifulsoup(self):
+        for html in (self.html, TRICKY_HTML):
+            expected = parse_cards(html, 'bs4')
+            for engine in available_engines():
+                with self.subTest(engine=engine):
+                    self.assertEqual(parse_cards(html, engine), expected)
+
+    def test_card_lookup(self):
+        card = parse_cards(TRICKY_HTML, 'stream')[0]
+        self.assertEqual(card.find('a', 'jobTitle').text, 'Eng &Internx')
+        self.assertEqual(card.find('a', 'jobTitle').href, '')
+        self.assertEqual(card.find('a', 'jobCompany').text, 'ACMECo')
+        self.assertEqual(card.find('span', 'jobSalary').text, 'RM\xa01,000- 2')
+        self.assertEqual([l.text for l in card.find_all('a', 'jobLocation')], ['A', 'B'])
+        self.assertIsNone(card.find('span', 'jobTitle'))
+
+    def test_fixture_cards(self):
+        cards = parse_cards(self.html, 'stream')
+        self.assertEqual(len(cards), 30)
+        self.assertEqual(cards[0].find('a', 'jobTitle').text, 'Electrical Engineering Intern')
+
+    def test_auto_and_unknown_engine(self):
+        self.assertIs(get_engine('auto'), get_engine(available_engines()[0]))
+        with self.assertRaises(ValueError):
+            get_engine('nope')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# tests/test_persistence.py
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from persistence.persistence import JOB_FIELDS, JobArchive, JobWriter, save_to_csv, write_csv
+
+WORKER_JOB = {'jobTitle': 'Intern', 'jobCompany': 'ACME', 'jobLocation': 'KL', 'jobSalary': 'RM 1,000',
+              'jobURL': 'https://x/job/1', 'uniqueId': 'a1'}
+SCRAPER_JOB = {'jobTitle': 'Engineer', 'jobCompany': 'Widgets', 'jobCategory': 'Engineering',
+               'jobListingDate': '2d ago', 'jobURL': 'https://x/job/2', 'uniqueId': 'b2'}
+
+class TestCsv(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'jobs.csv')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self):
+        with open(self.path, newline='', encoding='utf-8') as file:
+            return list(csv.DictReader(file))
+
+    def test_mixed_field_sets_keep_columns_aligned(self):
+        save_to_csv([WORKER_JOB], self.path)
+        save_to_csv([SCRAPER_JOB], self.path)
+        rows = self.read()
+        self.assertEqual(list(rows[0].keys()), list(JOB_FIELDS))
+        self.assertEqual(rows[0]['jobSalary'], 'RM 1,000')
+        self.assertEqual(rows[1]['jobSalary'], '')
+        self.assertEqual(rows[1]['jobCategory'], 'Engineering')
+        self.assertTrue(rows[1]['scrapedAt'])
+
+    def test_existing_header_is_kept(self):
+        with open(self.path, 'w', newline='', encoding='utf-8') as file:
+            file.write("jobTitle,jobCompany,uniqueId\nOld,Co,z9\n")
+        save_to_csv([WORKER_JOB], self.path)
+        rows = self.read()
+        self.assertEqual(rows[1], {'jobTitle': 'Intern', 'jobCompany': 'ACME', 'uniqueId': 'a1'})
+
+    def test_write_csv_overwrites(self):
+        write_csv([WORKER_JOB, SCRAPER_JOB], self.path)
+        write_csv([WORKER_JOB], self.path)
+        self.assertEqual([row['uniqueId'] for row in self.read()], ['a1'])
+
+class TestJobArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.archive = JobArchive(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_batches_are_indexed_gzip_members(self):
+        self.archive.append([WORKER_JOB])
+        self.archive.append([SCRAPER_JOB, WORKER_JOB])
+        (month,) = self.archive.months()
+        index = self.archive.index(month)
+        self.assertEqual([entry['count'] for entry in index], [1, 2])
+        self.assertEqual(index[1]['offset'], index[0]['offset'] + index[0]['length'])
+
+        # Plain gzip sees one stream of every batch
+        with gzip.open(os.path.join(self.tmp_dir.name, f"jobs-{month}.jsonl.gz"), 'rt', encoding='utf-8') as file:
+            ids = [json.loads(line)['uniqueId'] for line in file]
+        self.assertEqual(ids, ['a1', 'b2', 'a1'])
+        self.assertEqual([row['uniqueId'] for row in self.archive.read()], ids)
+
+    def test_read_skips_batches_outside_range(self):
+        with patch('persistence.persistence.time.gmtime', return_value=(2026, 9, 1, 0, 0, 0, 1, 244, 0)):
+            self.archive.append([WORKER_JOB])
+        with patch('persistence.persistence.time.gmtime', return_value=(2026, 10, 1, 0, 0, 0, 3, 274, 0)):
+            self.archive.append([SCRAPER_JOB])
+
+        self.assertEqual(self.archive.months(), ['2026-09', '2026-10'])
+        self.assertEqual([row['uniqueId'] for row in self.archive.read(since='2026-10-01')], ['b2'])
+        self.assertEqual([row['uniqueId'] for row in self.archive.read(until='2026-09-30')], ['a1'])
+
+    def test_torn_batch_is_ignored(self):
+        self.archive.append([WORKER_JOB])
+        (month,) = self.archive.months()
+        with open(os.path.join(self.tmp_dir.name, f"jobs-{month}.jsonl.gz"), 'ab') as file:
+            file.write(b'\x1f\x8b partial')
+        self.archive.append([SCRAPER_JOB])
+        self.assertEqual([row['uniqueId'] for row in self.archive.read()], ['a1', 'b2'])
+
+class TestJobWriter(unittest.TestCase):
+
+    def test_writes_csv_and_archive(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'jobs.csv')
+            writer = JobWriter(csv_path, JobArchive(os.path.join(tmp_dir, 'archive')))
+            writer.write([WORKER_JOB])
+            writer.write([SCRAPER_JOB])
+            writer.write([])
+            with open(csv_path, newline='', encoding='utf-8') as file:
+                self.assertEqual(len(list(csv.DictReader(file))), 2)
+            self.assertEqual(len(list(writer.archive.read())), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# tests/test_pipeline.py
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from database.database import close_connections, create_table
+from database.known_ids import KnownIds
+from scraper.crawler import Crawler
+from test_crawler import FakeSession, results_page
+from worker.pipeline import run_pipeline
+from worker.worker import parse_jobs, run_scraping_cycle
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = {}
+        for base in ('a-jobs', 'b-jobs'):
+            self.pages[f'https://jobs.test/{base}'] = results_page(base, 1, 3)
+            for page in (2, 3):
+                self.pages[f'https://jobs.test/{base}?page={page}'] = results_page(base, page, 3)
+
+    def test_pipeline_crawls_parses_and_drains_to_sinks(self):
+        batches = []
+        completed = []
+
+        def slow_sink(jobs):
+            time.sleep(0.02)  # Simulates a slow DB write or Discord post
+            batches.append(jobs)
+
+        jobs = run_pipeline(['https://jobs.test/a-jobs', 'https://jobs.test/b-jobs'], parse_jobs,
+                            session=FakeSession(self.pages), on_batch=slow_sink, on_complete=completed.append,
+                            fetch_workers=4, parse_workers=1, queue_size=1)
+
+        self.assertEqual(len(jobs), 18)
+        self.assertEqual(sum(len(batch) for batch in batches), 18)
+        self.assertEqual(completed, [jobs])
+
+    def test_pipeline_matches_threaded_crawl(self):
+        seeds = ['https://jobs.test/a-jobs']
+        expected = list(Crawler(parse=parse_jobs, session=FakeSession(self.pages)).crawl(seeds))
+        jobs = run_pipeline(seeds, parse_jobs, session=FakeSession(self.pages), parse_workers=1)
+        self.assertEqual(sorted(job['uniqueId'] for job in jobs), sorted(job['uniqueId'] for job in expected))
+
+    def test_pipeline_flags_missed_pages(self):
+        for seeds, max_pages, missed in ((['https://jobs.test/a-jobs'], 5, False), (['https://jobs.test/a-jobs'], 2, True),
+                                         (['https://jobs.test/a-jobs', 'https://jobs.test/missing'], 5, True)):
+            with self.subTest(seeds=seeds, max_pages=max_pages):
+                incomplete = threading.Event()
+                run_pipeline(seeds, parse_jobs, session=FakeSession(self.pages), max_pages=max_pages, parse_workers=1,
+                             incomplete=incomplete)
+                self.assertEqual(incomplete.is_set(), missed)
+
+    def test_pipeline_with_no_pages(self):
+        self.assertEqual(run_pipeline(['https://jobs.test/missing'], parse_jobs,
+                                      session=FakeSession({}), parse_workers=1), [])
+
+class SlowSeedSession(FakeSession):
+    """FakeSession that answers one URL late."""
+
+    def __init__(self, pages, slow_url, slow_delay):
+        super().__init__(pages)
+        self.slow_url = slow_url
+        self.slow_delay = slow_delay
+
+    def get(self, url, headers=None, timeout=None):
+        if url == self.slow_url:
+            time.sleep(self.slow_delay)
+        return super().get(url, headers, timeout)
+
+class TestStopWhenSeen(unittest.TestCase):
+
+    def setUp(self):
+        close_connections()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_patch = patch('database.database.DATABASE_FILE', os.path.join(self.tmp_dir.name, 'jobs.db'))
+        self.db_patch.start()
+        create_table()
+
+        # b-jobs repeats the a-jobs postings on its first page, then has new ones on page 2
+        self.pages = {
+            'https://jobs.test/a-jobs': results_page('a-jobs', 1, 1),
+            'https://jobs.test/b-jobs': results_page('a-jobs', 1, 2).replace('/a-jobs?page=2', '/b-jobs?page=2'),
+            'https://jobs.test/b-jobs?page=2': results_page('b-jobs', 2, 2),
+        }
+
+    def tearDown(self):
+        close_connections()
+        self.db_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def run_cycle(self, mode, seeds=('https://jobs.test/a-jobs', 'https://jobs.test/b-jobs'), search=None):
+        # b-jobs answers after a-jobs has already been stored
+        session = SlowSeedSession(self.pages, 'https://jobs.test/b-jobs', 0.5)
+        with patch('worker.worker.PIPELINE_MODE', mode), \
+                patch('worker.worker.get_session', return_value=session), \
+                patch('worker.worker.get_page_cache', return_value=None), \
+                patch('worker.worker.get_known_ids', return_value=KnownIds('set').load()), \
+                patch('worker.worker.get_job_writer', return_value=MagicMock()), \
+                patch('worker.worker.get_near_duplicates', return_value=None), \
+                patch('worker.worker.get_enricher', return_value=None), \
+                patch('worker.worker.publish_jobs'):
+            new_jobs = run_scraping_cycle(list(seeds), 'https://hook.test', search)
+        return session, new_jobs
+
+    def test_overlapping_seeds_do_not_cut_each_other_short(self):
+        for mode in ('threaded', 'asyncio'):
+            with self.subTest(mode=mode):
+                close_connections()
+                os.remove(os.path.join(self.tmp_dir.name, 'jobs.db'))
+                create_table()
+                session, new_jobs = self.run_cycle(mode)
+                self.assertIn('https://jobs.test/b-jobs?page=2', session.requested)
+                self.assertEqual(len(new_jobs), 6)
+
+    def test_jobs_expire_only_after_runs_that_saw_every_page(self):
+        seeds = ('https://jobs.test/a-jobs', 'https://jobs.test/b-jobs')
+        for mode in ('threaded', 'asyncio'):
+            for extra_seeds, expires in (((), True), (('https://jobs.test/missing',), False)):
+                with self.subTest(mode=mode, extra_seeds=extra_seeds), \
+                        patch('worker.worker.FRONTIER_ENABLED', False), \
+                        patch('worker.worker.expire_unseen') as expire:
+                    close_connections()
+                    os.remove(os.path.join(self.tmp_dir.name, 'jobs.db'))
+                    create_table()
+                    self.run_cycle(mode, seeds + extra_seeds, 'kl')
+                    self.assertEqual(expire.called, expires)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# tests/test_records.py
+import csv
+import io
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from database.database import _job_params
+from persistence.persistence import JOB_FIELDS, save_to_csv, to_row
+from records.records import JobRecord, to_record
+from scraper.cache import PageCache
+from worker.worker import parse_jobs
+
+JOB = {'uniqueId': 'id-1', 'jobTitle': 'Engineer', 'jobCompany': 'Acme', 'jobLocation': 'Kuala Lumpur',
+       'jobSalary': 'RM 4,000', 'jobURL': 'https://jobs.test/job/1'}
+
+class TestJobRecord(unittest.TestCase):
+
+    def test_behaves_like_the_dict_it_replaces(self):
+        job = JobRecord(JOB)
+        self.assertEqual(job, JOB)
+        self.assertEqual(dict(job), JOB)
+        self.assertEqual(job['jobTitle'], 'Engineer')
+        self.assertIsNone(job.get('canonicalId'))
+        self.assertNotIn('canonicalId', job)
+        with self.assertRaises(KeyError):
+            job['jobCategory']
+
+        job['canonicalId'] = 'id-0'
+        job['source'] = 'feed'
+        self.assertEqual(job.get('canonicalId'), 'id-0')
+        self.assertEqual(list(job)[-2:], ['canonicalId', 'source'])
+        self.assertEqual(len(job), len(JOB) + 2)
+        del job['source']
+        self.assertEqual(dict(job, canonicalId=None), dict(JOB, canonicalId=None))
+        self.assertEqual(job.setdefault('jobCategory', 'Engineering'), 'Engineering')
+
+    def test_repeated_values_share_one_string(self):
+        first = JobRecord(JOB)
+        second = JobRecord({key: ''.join(value) for key, value in JOB.items()})
+        self.assertIs(first['jobCompany'], second['jobCompany'])
+        self.assertIs(first['jobSalary'], second['jobSalary'])
+
+    def test_pickles_and_serializes(self):
+        job = JobRecord(JOB, scrapedAt='2026-01-01T00:00:00Z')
+        self.assertEqual(pickle.loads(pickle.dumps(job)), job)
+        self.assertIsInstance(pickle.loads(pickle.dumps(job)), JobRecord)
+        self.assertEqual(json.loads(json.dumps(job, default=dict)), dict(job))
+        self.assertIs(to_record(job), job)
+        self.assertIsInstance(to_record(dict(JOB)), JobRecord)
+
+    def test_parsers_build_records(self):
+        with open('tests/mock_jobstreet.html', 'r', encoding='utf-8') as file:
+            jobs = parse_jobs(file.read())
+        self.assertTrue(jobs)
+        self.assertTrue(all(isinstance(job, JobRecord) for job in jobs))
+
+    def test_cached_page_round_trips(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = PageCache(tmp_dir)
+            response = MagicMock(status_code=200, text='<html></html>', headers={})
+            cache.put('https://jobs.test/a', parse_jobs, response, [JobRecord(JOB)], None)
+            self.assertEqual(cache.get('https://jobs.test/a', parse_jobs)['jobs'], [JOB])
+
+class TestSerialization(unittest.TestCase):
+
+    def test_db_params_and_rows_match_the_dict_path(self):
+        record = JobRecord(JOB)
+        self.assertEqual(_job_params(record), _job_params(dict(JOB)))
+        self.assertEqual(to_row(record, 'now'), to_row(dict(JOB), 'now'))
+        with self.assertRaises(KeyError):
+            _job_params(JobRecord(jobTitle='No id'))
+
+    def test_csv_rows_are_the_same_for_records_and_dicts(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, name) for name in ('records.csv', 'dicts.csv')]
+            save_to_csv([JobRecord(JOB, scrapedAt='t')], paths[0])
+            save_to_csv([dict(JOB, scrapedAt='t')], paths[1])
+            contents = []
+            for path in paths:
+                with open(path, newline='', encoding='utf-8') as file:
+                    contents.append(file.read())
+        self.assertEqual(contents[0], contents[1])
+        rows = list(csv.reader(io.StringIO(contents[0])))
+        self.assertEqual(rows[0], list(JOB_FIELDS))
+        self.assertEqual(rows[1][:3], ['id-1', 'Engineer', 'Acme'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+# tests/test_robots.py
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from scraper.crawler import Crawler, HostPacer
+from scraper.robots import RobotsPolicy
+from test_crawler import FakeSession, results_page
+from worker.worker import parse_jobs
+
+ROBOTS = """User-agent: *
+Disallow: /private
+Crawl-delay: 3
+
+User-agent: SlowBot
+Request-rate: 1/2
+"""
+
+class RobotsSession:
+    """Serve a robots.txt per host and count how often each is fetched."""
+
+    def __init__(self, files, delay=0.0):
+        self.files = files
+        self.delay = delay
+        self.fetches = {}
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.fetches[url] = self.fetches.get(url, 0) + 1
+        time.sleep(self.delay)
+        status, body = self.files.get(url, (404, ''))
+        if isinstance(status, Exception):
+            raise status
+        response = MagicMock()
+        response.status_code = status
+        response.text = body
+        return response
+
+class TestRobotsPolicy(unittest.TestCase):
+
+    def test_rules_fetched_once_per_host(self):
+        session = RobotsSession({'https://a.test/robots.txt': (200, ROBOTS)}, delay=0.02)
+        policy = RobotsPolicy(session=session)
+
+        threads = [threading.Thread(target=policy.allowed, args=(f'https://a.test/jobs?page={i}',)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        policy.allowed('https://b.test/jobs')
+
+        self.assertEqual(session.fetches, {'https://a.test/robots.txt': 1, 'https://b.test/robots.txt': 1})
+        self.assertTrue(policy.allowed('https://a.test/jobs'))
+        self.assertFalse(policy.allowed('https://a.test/private/x'))
+
+    def test_rules_refetched_after_ttl(self):
+        session = RobotsSession({'https://a.test/robots.txt': (200, ROBOTS)})
+        policy = RobotsPolicy(session=session, ttl=0)
+        policy.allowed('https://a.test/jobs')
+        policy.allowed('https://a.test/jobs')
+        self.assertEqual(session.fetches['https://a.test/robots.txt'], 2)
+
+    def test_crawl_delay_and_request_rate(self):
+        policy = RobotsPolicy(session=RobotsSession({'https://a.test/robots.txt': (200, ROBOTS)}))
+        self.assertEqual(policy.crawl_delay('https://a.test/jobs'), 3.0)
+        self.assertEqual(policy.crawl_delay('https://a.test/jobs', 'SlowBot'), 2.0)
+        self.assertEqual(RobotsPolicy(session=RobotsSession({})).crawl_delay('https://a.test/jobs'), 0.0)
+
+    def test_status_handling(self):
+        session = RobotsSession({
+            'https://missing.test/robots.txt': (404, ''),
+            'https://denied.test/robots.txt': (403, ''),
+            'https://broken.test/robots.txt': (requests.ConnectionError('down'), ''),
+        })
+        policy = RobotsPolicy(session=session, error_ttl=0)
+        self.assertTrue(policy.allowed('https://missing.test/x'))
+        self.assertFalse(policy.allowed('https://denied.test/x'))
+        self.assertTrue(policy.allowed('https://broken.test/x'))
+        # Errors are only trusted briefly
+        policy.allowed('https://broken.test/x')
+        self.assertEqual(session.fetches['https://broken.test/robots.txt'], 2)
+        self.assertEqual(session.fetches['https://missing.test/robots.txt'], 1)
+
+class TestCrawlerRobots(unittest.TestCase):
+
+    def test_disallowed_pages_skipped_and_host_paced(self):
+        pages = {'https://jobs.test/a-jobs': results_page('a-jobs', 1, 3)}
+        pages.update({f'https://jobs.test/a-jobs?page={p}': results_page('a-jobs', p, 3) for p in (2, 3)})
+        policy = RobotsPolicy(session=RobotsSession({
+            'https://jobs.test/robots.txt': (200, "User-agent: *\nDisallow: /a-jobs?page=3\nRequest-rate: 10/1\n"),
+        }))
+        session = FakeSession(pages, delay=0)
+
+        started = time.monotonic()
+        jobs = list(Crawler(parse=parse_jobs, session=session, robots=policy).crawl(['https://jobs.test/a-jobs']))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(session.requested, ['https://jobs.test/a-jobs', 'https://jobs.test/a-jobs?page=2'])
+        self.assertEqual(len(jobs), 6)
+        self.assertGreaterEqual(elapsed, 0.1)
+
+    def test_shared_pacer_caps_concurrent_crawlers_together(self):
+        pages = {}
+        for base in ('a-jobs', 'b-jobs'):
+            pages[f'https://jobs.test/{base}'] = results_page(base, 1, 3)
+            pages.update({f'https://jobs.test/{base}?page={p}': results_page(base, p, 3) for p in (2, 3)})
+        session = FakeSession(pages, delay=0.02)
+        pacer = HostPacer(host_concurrency=1)
+
+        # Two searches at once, as the scheduler runs them
+        threads = [threading.Thread(target=lambda seed=seed: list(
+            Crawler(parse=parse_jobs, session=session, pacer=pacer).crawl([seed])))
+            for seed in ('https://jobs.test/a-jobs', 'https://jobs.test/b-jobs')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(session.requested), 6)
+        self.assertEqual(session.max_in_flight, 1)
+
+    def test_pacer_spaces_requests_per_host(self):
+        pacer = HostPacer()
+        started = time.monotonic()
+        for _ in range(3):
+            pacer.wait('https://a.test/x', 0.05)
+        pacer.wait('https://b.test/x', 0.05)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertLess(time.monotonic() - started, 0.3)
+
+if __name__ == '__main__':
+    unittest.main()
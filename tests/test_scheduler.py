@@ -0,0 +1,76 @@
+# tests/test_scheduler.py
+import threading
+import time
+import unittest
+
+from worker.scheduler import Scheduler
+
+class TestScheduler(unittest.TestCase):
+
+    def run_for(self, scheduler, seconds):
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        time.sleep(seconds)
+        scheduler.stop()
+        thread.join(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+    def test_each_search_runs_on_its_own_interval(self):
+        runs = {'fast': 0, 'slow': 0}
+        lock = threading.Lock()
+
+        def run_search(search):
+            with lock:
+                runs[search['name']] += 1
+
+        searches = [
+            {'name': 'fast', 'urls': [], 'interval': 0.05},
+            {'name': 'slow', 'urls': [], 'interval': 10},
+        ]
+        self.run_for(Scheduler(searches, run_search), 0.5)
+        self.assertGreaterEqual(runs['fast'], 4)
+        self.assertEqual(runs['slow'], 1)
+
+    def test_failures_do_not_stop_the_scheduler(self):
+        calls = []
+
+        def run_search(search):
+            calls.append(search['name'])
+            raise RuntimeError("boom")
+
+        self.run_for(Scheduler([{'name': 'flaky', 'urls': [], 'interval': 0.05}], run_search), 0.3)
+        self.assertGreaterEqual(len(calls), 2)
+
+    def test_stop_drains_in_flight_searches(self):
+        finished = threading.Event()
+        started = threading.Event()
+
+        def run_search(search):
+            started.set()
+            time.sleep(0.3)
+            finished.set()
+
+        scheduler = Scheduler([{'name': 'slow', 'urls': [], 'interval': 60}], run_search)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        started.wait(timeout=5)
+        scheduler.stop_event.set()  # Same as the daemon's SIGTERM / Ctrl+C handler
+        thread.join(timeout=5)
+        self.assertTrue(finished.is_set())
+
+    def test_a_search_never_overlaps_itself(self):
+        active = []
+        overlaps = []
+
+        def run_search(search):
+            if active:
+                overlaps.append(search['name'])
+            active.append(1)
+            time.sleep(0.1)
+            active.pop()
+
+        self.run_for(Scheduler([{'name': 'a', 'urls': [], 'interval': 0}], run_search, max_workers=4), 0.4)
+        self.assertEqual(overlaps, [])
+
+if __name__ == '__main__':
+    unittest.main()
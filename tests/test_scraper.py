@@ -1,7 +1,8 @@
 # tests/test_scraper.py
 import unittest
-from scraper.scraper import fetch_data
+from scraper.scraper import fetch_data, find_app_state, parse_app_state_jobs
 from unittest.mock import patch
+from worker.worker import parse_jobs
 
 class TestScraper(unittest.TestCase):
 
@@ -31,6 +32,48 @@ class TestScraper(unittest.TestCase):
         #self.assertEqual(result[0]['jobTitle'], 'Software Developer')  # First job title should match
         #self.assertEqual(result[1]['jobTitle'], 'Data Scientist')  # Second job title should match
         self.assertIn('jobCompany', result[0])  # Job company should be in the first item
+        # Same listing, same uniqueId, whether the standalone scraper or the worker read it
+        self.assertEqual([job['uniqueId'] for job in result], [job['uniqueId'] for job in parse_jobs(real_html_content)])
+
+class TestAppStateExtraction(unittest.TestCase):
+
+    def setUp(self):
+        with open('tests/mock_jobstreet_state.html', 'r', encoding='utf-8') as file:
+            self.html = file.read()
+
+    def test_state_fills_card_only_gaps(self):
+        jobs = parse_app_state_jobs(self.html)
+        self.assertEqual(len(jobs), 30)
+        self.assertEqual(jobs[0]['jobCategory'], 'Engineering')
+        self.assertEqual(jobs[0]['jobSubCategory'], 'Electrical/Electronic Engineering')
+        self.assertEqual(jobs[0]['jobListingDate'], '2024-03-14T02:11:09Z')
+        self.assertEqual(jobs[0]['jobURL'], 'https://my.jobstreet.com/job/80000000')
+        self.assertEqual(jobs[3]['jobSalary'], 'Not Specified')
+
+    def test_state_matches_card_scraping(self):
+        with patch('scraper.sites.APP_STATE_EXTRACTION', False):
+            card_jobs = parse_jobs(self.html)
+        # The standalone scraper's default ids are the ones the worker's sites assign
+        state_jobs = parse_app_state_jobs(self.html)
+        for card_job, state_job in zip(card_jobs, state_jobs):
+            for field in ('jobTitle', 'jobCompany', 'jobLocation', 'jobSalary', 'uniqueId'):
+                self.assertEqual(card_job[field], state_job[field])
+
+    def test_javascript_undefined_is_tolerated(self):
+        state = find_app_state('<script>window.SEEK_REDUX_DATA = {"a":undefined,"b":[1,undefined]};</script>')
+        self.assertEqual(state, {'a': None, 'b': [1, None]})
+
+    def test_missing_state_falls_back_to_cards(self):
+        with open('tests/mock_jobstreet.html', 'r', encoding='utf-8') as file:
+            html = file.read()
+        self.assertIsNone(parse_app_state_jobs(html))
+
+        with patch('scraper.scraper.requests.get') as mock_get, patch('builtins.open'):
+            mock_get.return_value.status_code = 200
+            mock_get.return_value.text = html
+            result = fetch_data("http://example.com/jobs")
+        self.assertEqual(len(result), 30)
+        self.assertNotIn('jobCategory', result[0])
 
 if __name__ == '__main__':
     unittest.main()
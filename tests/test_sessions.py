@@ -0,0 +1,100 @@
+# tests/test_sessions.py
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scraper.sessions import NoHealthySession, SessionPool, parse_cookie_header
+
+class FakeSite(ThreadingHTTPServer):
+    """Local site that records (cookie, user agent) per request.
+
+    A session whose cookie contains id=bad gets a captcha page, and /refresh
+    hands out a new token cookie.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SiteHandler)
+        self.lock = threading.Lock()
+        self.seen = []
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+class SiteHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        cookie = self.headers.get('Cookie', '')
+        with self.server.lock:
+            self.server.seen.append((parse_cookie_header(cookie), self.headers['User-Agent']))
+        body = b'<div id="challenge-platform"></div>' if 'id=bad' in cookie else b'<html>jobs</html>'
+        self.send_response(200)
+        if self.path == '/refresh':
+            self.send_header('Set-Cookie', 'token=fresh; Path=/')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def is_blocked(html):
+    return 'challenge-platform' in html
+
+class TestSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.site = FakeSite()
+        threading.Thread(target=self.site.serve_forever, daemon=True).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cookie_file = os.path.join(self.tmp_dir.name, 'sessions.json')
+
+    def tearDown(self):
+        self.site.shutdown()
+        self.site.server_close()
+        self.tmp_dir.cleanup()
+
+    def pool(self, cookies, **kwargs):
+        return SessionPool(cookies, user_agents=['agent-a', 'agent-b'], is_blocked=is_blocked,
+                           cookie_file=self.cookie_file, **kwargs)
+
+    def test_rotates_sessions_with_their_own_cookie_and_agent(self):
+        pool = self.pool(['id=a; x=1', 'id=b'])
+        for _ in range(4):
+            pool.get(self.site.url('/jobs'), headers={'User-Agent': 'crawler', 'Cookie': 'id=global'}, timeout=5)
+        self.assertEqual([(cookies['id'], agent) for cookies, agent in self.site.seen],
+                         [('a', 'agent-a'), ('b', 'agent-b')] * 2)
+        self.assertEqual([stat['requests'] for stat in pool.stats()], [2, 2])
+
+    def test_captcha_retires_the_session(self):
+        pool = self.pool(['id=bad', 'id=good'])
+        self.assertTrue(is_blocked(pool.get(self.site.url('/jobs'), timeout=5).text))
+        for _ in range(3):
+            self.assertFalse(is_blocked(pool.get(self.site.url('/jobs'), timeout=5).text))
+        self.assertEqual([cookies['id'] for cookies, _ in self.site.seen], ['bad', 'good', 'good', 'good'])
+        self.assertEqual([stat['healthy'] for stat in pool.stats()], [False, True])
+
+        # Still retired after a restart, until the retirement lapses
+        self.assertEqual([stat['healthy'] for stat in self.pool(['id=bad', 'id=good']).stats()], [False, True])
+        self.assertEqual([stat['healthy'] for stat in self.pool(['id=bad'], retire_ttl=0).stats()], [True])
+
+    def test_all_sessions_retired(self):
+        pool = self.pool(['id=bad'])
+        pool.get(self.site.url('/jobs'), timeout=5)
+        with self.assertRaises(NoHealthySession):
+            pool.get(self.site.url('/jobs'), timeout=5)
+
+    def test_refreshed_cookies_persist(self):
+        self.pool(['id=a']).get(self.site.url('/refresh'), timeout=5)
+        self.pool(['id=a']).get(self.site.url('/jobs'), timeout=5)
+        self.assertEqual(self.site.seen[-1][0], {'id': 'a', 'token': 'fresh'})
+
+        # A new seed cookie starts from scratch
+        self.pool(['id=c']).get(self.site.url('/jobs'), timeout=5)
+        self.assertEqual(self.site.seen[-1][0], {'id': 'c'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# tests/test_sites.py
+import unittest
+
+from scraper.crawler import Crawler
+from scraper.parsers import Field, compile_selectors
+from scraper.sites import Site, get_site, registered_sites, search_urls, site_for_url
+from test_crawler import FakeSession
+from worker.worker import parse_jobs
+
+def site_page(page, last_page, card='normalJob'):
+    cards = "".join(
+        f'<article data-automation="{card}"><a data-automation="jobTitle" href="/job/{page}{i}">Job {page}-{i}</a>'
+        f'<a data-automation="jobCompany">Co</a><span data-automation="jobSalary">RM\xa01,000</span></article>'
+        for i in range(2)
+    )
+    next_link = f'<a href="?page={page + 1}" rel="nofollow next">Next</a>' if page < last_page else ''
+    return f'<html><body>{cards}{next_link}</body></html>'
+
+class TestSites(unittest.TestCase):
+
+    def test_jobstreet_sites_are_registered(self):
+        self.assertTrue({'jobstreet-my', 'jobstreet-sg', 'jobstreet-id'} <= {site.name for site in registered_sites()})
+        self.assertIs(site_for_url('https://sg.jobstreet.com/engineer-jobs?page=2'), get_site('jobstreet-sg'))
+        self.assertIsNone(site_for_url('https://jobs.test/a-jobs'))
+        with self.assertRaises(ValueError):
+            get_site('nowhere')
+
+    def test_search_url(self):
+        site = get_site('jobstreet-my')
+        self.assertEqual(site.search_url('Electrical Engineering intern', 'Kuala Lumpur'),
+                         'https://my.jobstreet.com/electrical-engineering-intern-jobs/in-Kuala-Lumpur')
+        self.assertEqual(get_site('jobstreet-id').search_url('data, analyst', page=3),
+                         'https://id.jobstreet.com/data-analyst-jobs?page=3')
+
+    def test_search_fans_out_to_every_site(self):
+        urls = search_urls({'keywords': 'engineer', 'sites': ['jobstreet-my', 'jobstreet-sg'],
+                            'urls': ['https://jobs.test/a-jobs']})
+        self.assertEqual(urls, ['https://jobs.test/a-jobs', 'https://my.jobstreet.com/engineer-jobs',
+                                'https://sg.jobstreet.com/engineer-jobs'])
+
+    def test_selectors_are_compiled_once(self):
+        self.assertIs(compile_selectors('normalJob'), compile_selectors('normalJob'))
+
+    def test_crawl_uses_each_sites_parser_and_headers(self):
+        custom = Site('custom', 'https://custom.test', card_automation='posting', user_agent='custom-agent',
+                      card_fields=(Field('jobTitle', 'a', 'jobTitle'), Field('jobCompany', 'a', 'jobCompany')))
+        sites = [get_site('jobstreet-sg'), custom]
+        pages = {
+            'https://sg.jobstreet.com/engineer-jobs': site_page(1, 2),
+            'https://sg.jobstreet.com/engineer-jobs?page=2': site_page(2, 2),
+            'https://custom.test/engineer-jobs': site_page(1, 1, card='posting'),
+        }
+        headers_seen = {}
+
+        class RecordingSession(FakeSession):
+            def get(self, url, headers=None, timeout=None):
+                headers_seen[url] = headers['User-Agent']
+                return super().get(url, headers, timeout)
+
+        crawler = Crawler(parse=parse_jobs, headers={'User-Agent': 'default-agent'},
+                          session=RecordingSession(pages), sites=sites)
+        jobs = list(crawler.crawl(['https://sg.jobstreet.com/engineer-jobs', 'https://custom.test/engineer-jobs']))
+
+        self.assertEqual(len(jobs), 6)
+        sg_jobs = [job for job in jobs if job['jobURL'].startswith('https://sg.jobstreet.com/job/')]
+        custom_jobs = [job for job in jobs if job['jobURL'].startswith('https://custom.test/job/')]
+        self.assertEqual((len(sg_jobs), len(custom_jobs)), (4, 2))
+        self.assertEqual(sg_jobs[0]['jobSalary'], 'RM 1,000')
+        self.assertNotIn('jobSalary', custom_jobs[0])
+        self.assertEqual(headers_seen['https://custom.test/engineer-jobs'], 'custom-agent')
+        self.assertEqual(headers_seen['https://sg.jobstreet.com/engineer-jobs'], 'default-agent')
+
+if __name__ == '__main__':
+    unittest.main()
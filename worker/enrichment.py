@@ -0,0 +1,142 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from config.config import (DETAIL_CACHE_DIR, DETAIL_CACHE_TTL, DETAIL_HOST_BUDGET, DETAIL_MAX_WORKERS,
+                           REQUEST_TIMEOUT)
+from database.database import jobs_to_enrich, update_enrichment
+from metrics import metrics
+from scraper.cache import PageCache, PageStore
+from scraper.crawler import HostPacer, HostPaused, create_session, is_block_response, retry_after
+from scraper.details import parse_job_detail
+
+logger = logging.getLogger(__name__)
+
+DETAIL_PAGES = metrics.counter('enrich_pages_total', 'Detail pages by outcome (fetched, unchanged, cached, failed, over_budget)')
+DETAIL_SECONDS = metrics.histogram('enrich_fetch_seconds', 'Time to get a detail page response, by host')
+
+class Enricher:
+    """Fill newly stored jobs from their detail pages, in the background.
+
+    submit(unique_ids) queues a batch and returns at once, so announcing new
+    jobs never waits on it. Each batch fetches its pages on max_workers
+    threads through the shared HostPacer (rate limit and breaker) and at
+    most host_budget pages per host, then writes every result with one bulk
+    update. Detail pages are stored gzip'd once per distinct content in
+    PageStore; the PageCache remembers each URL's validators and parse, so a
+    page fetched within cache_ttl is not requested again and an unchanged
+    one (304 or same body hash) is not parsed or stored again.
+    """
+
+    def __init__(self, session=None, headers=None, is_blocked=None, pacer=None, cache=None, store=None,
+                 max_workers=DETAIL_MAX_WORKERS, host_budget=DETAIL_HOST_BUDGET, cache_ttl=DETAIL_CACHE_TTL,
+                 timeout=REQUEST_TIMEOUT):
+        self.session = session or create_session(max_workers)
+        self.headers = headers or {}
+        self.is_blocked = is_blocked
+        self.pacer = pacer or HostPacer()
+        self.cache = cache or PageCache(DETAIL_CACHE_DIR)
+        self.store = store or PageStore()
+        self.max_workers = max_workers
+        self.host_budget = host_budget
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        # One batch at a time, so batches share the host budget and the fetch pool instead of racing
+        self._batches = ThreadPoolExecutor(1, thread_name_prefix='enrich')
+        self._fetchers = ThreadPoolExecutor(max_workers, thread_name_prefix='enrich-fetch')
+
+    def submit(self, unique_ids):
+        """Queue jobs for enrichment in the background; returns a Future of the number enriched."""
+        return self._batches.submit(self._run, list(unique_ids))
+
+    def _run(self, unique_ids):
+        try:
+            return self.enrich(unique_ids)
+        except Exception as e:
+            logger.error("Error enriching %s jobs: %s", len(unique_ids), e)
+            return 0
+
+    def enrich(self, unique_ids):
+        """Fetch, parse and store the detail pages of these jobs now; returns how many were enriched."""
+        rows = jobs_to_enrich(unique_ids)
+        if not rows:
+            return 0
+
+        budget = Counter()
+        urls = OrderedDict()
+        for unique_id, url in rows:
+            host = urlparse(url).netloc
+            if url not in urls:
+                if budget[host] >= self.host_budget:
+                    DETAIL_PAGES.inc(outcome='over_budget')
+                    continue
+                budget[host] += 1
+                urls[url] = []
+            urls[url].append(unique_id)
+        skipped = len(rows) - sum(len(ids) for ids in urls.values())
+        if skipped:
+            logger.warning("Detail page budget reached, %s jobs left without details.", skipped)
+
+        details = {}
+        for url, detail in zip(urls, self._fetchers.map(self.fetch_detail, urls)):
+            if detail is not None:
+                for unique_id in urls[url]:
+                    details[unique_id] = detail
+        enriched = update_enrichment(details)
+        logger.info("Enriched %s of %s new jobs from their detail pages.", enriched, len(rows))
+        return enriched
+
+    def fetch_detail(self, url):
+        """Return the parsed detail page at url, from the cache when it's fresh or unchanged, or None."""
+        entry = self.cache.get(url, parse_job_detail)
+        if entry and time.time() - entry.get('stored_at', 0) < self.cache_ttl:
+            DETAIL_PAGES.inc(outcome='cached')
+            return entry['jobs'][0]
+
+        host = urlparse(url).netloc
+        headers = dict(self.headers, **PageCache.request_headers(entry))
+        try:
+            self.pacer.acquire(url)
+        except HostPaused as e:
+            DETAIL_PAGES.inc(outcome='failed')
+            logger.warning("Skipping detail page %s: %s", url, e)
+            return None
+        try:
+            with self.pacer.slot(url), DETAIL_SECONDS.time(host=host):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            self.pacer.cancel(url)
+            DETAIL_PAGES.inc(outcome='failed')
+            logger.error("Error fetching detail page %s: %s", url, e)
+            return None
+
+        cached = self.cache.match(url, entry, response)
+        blocked = not cached and is_block_response(response, self.is_blocked)
+        self.pacer.record(url, blocked, retry_after(response))
+        if cached:
+            DETAIL_PAGES.inc(outcome='unchanged')
+            return cached['jobs'][0]
+        if blocked or response.status_code != 200:
+            DETAIL_PAGES.inc(outcome='failed')
+            logger.warning("Could not fetch detail page %s (status %s)", url, response.status_code)
+            return None
+
+        try:
+            detail = parse_job_detail(response.text)
+        except Exception as e:
+            DETAIL_PAGES.inc(outcome='failed')
+            logger.error("Error parsing detail page %s: %s", url, e)
+            return None
+        self.store.put(response.text)
+        self.cache.put(url, parse_job_detail, response, [detail], None)
+        DETAIL_PAGES.inc(outcome='fetched')
+        return detail
+
+    def close(self, wait=True):
+        """Stop taking batches; with wait, finish the queued ones first."""
+        self._batches.shutdown(wait=wait)
+        self._fetchers.shutdown(wait=wait)
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from config.config import (CRAWL_HOST_CONCURRENCY, CRAWL_MAX_PAGES, CRAWL_MAX_WORKERS,
+                           PIPELINE_PARSE_WORKERS, PIPELINE_QUEUE_SIZE, REQUEST_TIMEOUT)
+from scraper.cache import PageCache
+from metrics import metrics
+from scraper.crawler import (CARDS_PARSED, FETCH_ERRORS, PARSE_ERRORS, PARSE_SECONDS, SKIPPED, HostPacer, HostPaused,
+                             create_session, find_next_page, is_block_response, record_response, retry_after)
+from records.records import to_record
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+QUEUE_DEPTH = metrics.gauge('pipeline_queue_depth', 'Items waiting between asyncio pipeline stages, by queue (urls, pages, results)')
+
+def parse_page(parse, next_page, html, url):
+    """Parse one page in a pool process, returning (jobs, next_page_url)."""
+    return parse(html), next_page(html, url)
+
+class Pipeline:
+    """Asyncio fetch -> parse -> persist pipeline joined by bounded queues.
+
+    Fetchers run blocking requests calls on a thread pool, parsing runs on a
+    process pool so it never holds the event loop, and a single persist stage
+    drains parsed jobs into the sinks. A full queue makes the stage upstream
+    wait, so memory stays bounded however slow the sinks are. Like Crawler,
+    pages on a registered site's host use that site's parser, pagination
+    rule and headers, and incomplete is set when a page is skipped or fails
+    or a next page is past max_pages.
+    """
+
+    def __init__(self, parse, headers=None, session=None, is_blocked=None,
+                 should_follow=None, cache=None, robots=None, pacer=None, sites=None, on_batch=None, on_complete=None,
+                 max_pages=CRAWL_MAX_PAGES, fetch_workers=CRAWL_MAX_WORKERS, host_concurrency=CRAWL_HOST_CONCURRENCY,
+                 parse_workers=PIPELINE_PARSE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE,
+                 timeout=REQUEST_TIMEOUT, incomplete=None):
+        self.parse = parse
+        self.sites = {site.host: site for site in sites or ()}
+        self.headers = headers or {}
+        self.session = session or create_session(fetch_workers)
+        self.is_blocked = is_blocked
+        self.should_follow = should_follow
+        self.cache = cache
+        self.robots = robots
+        self.on_batch = on_batch
+        self.on_complete = on_complete
+        self.max_pages = max_pages
+        self.fetch_workers = fetch_workers
+        # Threads wait for the host slot on the I/O pool, so a shared pacer caps every crawler together
+        self.pacer = pacer or HostPacer(host_concurrency)
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.incomplete = incomplete
+
+    async def run(self, seed_urls):
+        """Crawl the seed URLs through every stage and return the de-duplicated jobs."""
+        self._loop = asyncio.get_running_loop()
+        self._urls = asyncio.Queue()
+        self._pages = asyncio.Queue(self.queue_size)
+        self._results = asyncio.Queue(self.queue_size)
+        self._visited = set()
+        self._outstanding = 0
+        self._idle = asyncio.Event()
+
+        for url in seed_urls:
+            self._enqueue(url, 1)
+        if not self._outstanding:
+            self._idle.set()
+
+        with ThreadPoolExecutor(self.fetch_workers, thread_name_prefix='fetch') as io_pool, \
+                ProcessPoolExecutor(self.parse_workers) as cpu_pool, \
+                ThreadPoolExecutor(1, thread_name_prefix='persist') as sink_pool:
+            workers = [asyncio.ensure_future(self._fetcher(io_pool)) for _ in range(self.fetch_workers)]
+            workers += [asyncio.ensure_future(self._parser(cpu_pool, io_pool)) for _ in range(self.parse_workers)]
+            persister = asyncio.ensure_future(self._persister(sink_pool))
+
+            try:
+                await self._idle.wait()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+            await self._results.put(_DONE)
+            return await persister
+
+    def _enqueue(self, url, page):
+        if url in self._visited:
+            return
+        self._visited.add(url)
+        self._outstanding += 1
+        self._urls.put_nowait((url, page))
+
+    def _finish_url(self, missed=False):
+        # missed: the page was skipped or failed, so the crawl can't tell which jobs are gone
+        if missed and self.incomplete is not None:
+            self.incomplete.set()
+        self._outstanding -= 1
+        if not self._outstanding:
+            self._idle.set()
+
+    def _for_url(self, url):
+        site = self.sites.get(urlparse(url).netloc)
+        if site is None:
+            return self.parse, find_next_page, self.headers
+        return site.parse, site.next_page, dict(self.headers, **site.headers())
+
+    def _fetch(self, url):
+        # Runs on the I/O pool: robots check and pacing, cache lookup, rate limit, conditional request,
+        # unchanged and block checks
+        parse, _, headers = self._for_url(url)
+        if self.robots:
+            user_agent = headers.get('User-Agent', '*')
+            if not self.robots.allowed(url, user_agent):
+                return None, None, False
+            self.pacer.wait(url, self.robots.crawl_delay(url, user_agent))
+        entry = self.cache.get(url, parse) if self.cache else None
+        headers = dict(headers, **PageCache.request_headers(entry))
+        self.pacer.acquire(url)
+        try:
+            with self.pacer.slot(url):
+                start = time.perf_counter()
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except Exception:
+            self.pacer.cancel(url)
+            FETCH_ERRORS.inc(host=urlparse(url).netloc)
+            raise
+        cached = self.cache.match(url, entry, response) if self.cache else None
+        blocked = not cached and is_block_response(response, self.is_blocked)
+        record_response(url, response, time.perf_counter() - start, cached, blocked)
+        self.pacer.record(url, blocked, retry_after(response))
+        return response, cached, blocked
+
+    def _gauge_queues(self):
+        QUEUE_DEPTH.set(self._urls.qsize(), queue='urls')
+        QUEUE_DEPTH.set(self._pages.qsize(), queue='pages')
+        QUEUE_DEPTH.set(self._results.qsize(), queue='results')
+
+    async def _fetcher(self, io_pool):
+        while True:
+            url, page = await self._urls.get()
+            self._gauge_queues()
+            try:
+                response, cached, blocked = await self._loop.run_in_executor(io_pool, self._fetch, url)
+            except HostPaused as e:
+                logger.warning("Skipping %s: %s", url, e)
+                SKIPPED.inc(host=urlparse(url).netloc, reason='paused')
+                self._finish_url(missed=True)
+                continue
+            except Exception as e:
+                logger.error("Error fetching %s: %s", url, e)
+                self._finish_url(missed=True)
+                continue
+
+            if response is None:
+                logger.warning("robots.txt disallows %s, skipping it.", url)
+                SKIPPED.inc(host=urlparse(url).netloc, reason='robots')
+                self._finish_url(missed=True)
+            elif cached:
+                logger.debug("%s is unchanged, reusing the cached parse", url)
+                jobs = [to_record(job) for job in cached['jobs']]
+                await self._deliver(url, page, jobs, cached['next_url'], io_pool)
+            elif blocked:
+                logger.warning("%s was blocked (status %s)", url, response.status_code)
+                self._finish_url(missed=True)
+            elif response.status_code != 200:
+                logger.error("Failed to fetch %s. Status Code: %s", url, response.status_code)
+                self._finish_url(missed=True)
+            else:
+                # Waits here when parsers fall behind
+                await self._pages.put((url, page, response))
+                self._gauge_queues()
+
+    async def _parser(self, cpu_pool, io_pool):
+        while True:
+            url, page, response = await self._pages.get()
+            self._gauge_queues()
+            parse, next_page, _ = self._for_url(url)
+            host = urlparse(url).netloc
+            try:
+                # Includes the hop to the parser process, which is part of what parsing costs here
+                with PARSE_SECONDS.time(host=host):
+                    jobs, next_url = await self._loop.run_in_executor(cpu_pool, parse_page, parse, next_page, response.text, url)
+                CARDS_PARSED.inc(len(jobs), host=host)
+                if self.cache:
+                    await self._loop.run_in_executor(io_pool, self.cache.put, url, parse, response, jobs, next_url)
+            except Exception as e:
+                PARSE_ERRORS.inc(host=host)
+                logger.error("Error parsing %s: %s", url, e)
+                self._finish_url(missed=True)
+                continue
+            await self._deliver(url, page, jobs, next_url, io_pool)
+
+    async def _deliver(self, url, page, jobs, next_url, io_pool):
+        try:
+            if next_url and self.should_follow and not await self._loop.run_in_executor(io_pool, self.should_follow, jobs):
+                logger.info("Every job on %s is already known, not following its next page.", url)
+                next_url = None
+        except Exception as e:
+            logger.error("Error checking known jobs for %s: %s", url, e)
+
+        if next_url and page < self.max_pages:
+            self._enqueue(next_url, page + 1)
+        elif next_url and next_url not in self._visited:
+            logger.info("Stopping at %s: the crawl reached %s pages.", url, self.max_pages)
+            if self.incomplete is not None:
+                self.incomplete.set()
+        if jobs:
+            # Waits here when the persist stage falls behind
+            await self._results.put(jobs)
+            self._gauge_queues()
+        self._finish_url()
+
+    async def _persister(self, sink_pool):
+        jobs = OrderedDict()
+        while True:
+            batch = await self._results.get()
+            self._gauge_queues()
+            if batch is _DONE:
+                break
+            fresh = [job for job in batch if job['uniqueId'] not in jobs]
+            for job in fresh:
+                jobs[job['uniqueId']] = job
+            if fresh and self.on_batch:
+                await self._run_sink(sink_pool, self.on_batch, fresh)
+
+        jobs = list(jobs.values())
+        if self.on_complete:
+            await self._run_sink(sink_pool, self.on_complete, jobs)
+        return jobs
+
+    async def _run_sink(self, sink_pool, sink, jobs):
+        try:
+            await self._loop.run_in_executor(sink_pool, sink, jobs)
+        except Exception as e:
+            logger.error("Error in pipeline sink %s: %s", getattr(sink, '__name__', sink), e)
+
+def run_pipeline(seed_urls, parse, **kwargs):
+    """Run the asyncio pipeline to completion from synchronous code."""
+    return asyncio.run(Pipeline(parse, **kwargs).run(seed_urls))
@@ -0,0 +1,83 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import SCHEDULER_WORKERS
+
+logger = logging.getLogger(__name__)
+
+class Scheduler:
+    """Run every configured search on its own interval, with jitter, on a worker pool.
+
+    Each search is a dict with a "name", its "keywords", an optional
+    "location" and "sites" (defaulting to SITES; see sites.search_urls, which
+    also takes explicit "urls"), an "interval" and an optional "jitter" (both
+    in seconds). A search never overlaps with itself:
+    its next run is scheduled interval + random(0, jitter) seconds after the
+    previous one finishes. Setting stop_event stops scheduling new runs and
+    run() returns once the in-flight ones have drained.
+    """
+
+    def __init__(self, searches, run_search, max_workers=SCHEDULER_WORKERS, stop_event=None):
+        self.searches = list(searches)
+        self.run_search = run_search
+        self.max_workers = max_workers
+        self.stop_event = stop_event or threading.Event()
+        self._queue = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def _schedule(self, index, delay):
+        with self._lock:
+            heapq.heappush(self._queue, (time.monotonic() + delay, index))
+        self._wakeup.set()
+
+    def _next_delay(self, search):
+        return search['interval'] + random.uniform(0, search.get('jitter', 0))
+
+    def _run(self, index):
+        search = self.searches[index]
+        started = time.monotonic()
+        try:
+            self.run_search(search)
+        except Exception:
+            logger.exception("Search '%s' failed", search['name'])
+        finally:
+            delay = self._next_delay(search)
+            logger.info("Search '%s' took %.1fs, next run in %.0fs", search['name'], time.monotonic() - started, delay)
+            if not self.stop_event.is_set():
+                self._schedule(index, delay)
+
+    def run(self):
+        """Block, running searches as they fall due, until stop_event is set."""
+        for index, search in enumerate(self.searches):
+            # Spread the first runs a little so searches don't all hit the site at once
+            self._schedule(index, random.uniform(0, min(search.get('jitter', 0), 5)))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='search') as pool:
+            while not self.stop_event.is_set():
+                with self._lock:
+                    due = []
+                    while self._queue and self._queue[0][0] <= time.monotonic():
+                        due.append(heapq.heappop(self._queue)[1])
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._wakeup.clear()
+
+                for index in due:
+                    logger.info("Running search '%s'", self.searches[index]['name'])
+                    pool.submit(self._run, index)
+
+                if not due:
+                    # Wake up for the next due search or a re-schedule, and poll the stop event
+                    self._wakeup.wait(1.0 if timeout is None else min(max(timeout, 0), 1.0))
+
+            logger.info("Scheduler stopping, waiting for in-flight searches to finish...")
+        logger.info("Scheduler stopped.")
+
+    def stop(self):
+        """Stop scheduling; run() returns once in-flight searches finish."""
+        self.stop_event.set()
+        self._wakeup.set()
@@ -1,159 +1,370 @@
-import requests
-import csv
-from bs4 import BeautifulSoup
-import json
 import logging
 import os
 import sys  # Added to force-fail the build on error
+import threading
 import time
 from collections import OrderedDict
-from hashlib import sha256
-from urllib.parse import urljoin
 
-# --- CONFIGURATION ---
-USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 18_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.5 Mobile/15E148 Safari/604.1"
-BASE_URL = "https://my.jobstreet.com"
+from config.config import (CHECK_ROBOTS, DETAIL_ENRICHMENT, FRONTIER_ENABLED, NEAR_DUP_DETECTION, PIPELINE_MODE,
+                           SEARCHES, STOP_WHEN_SEEN, SUBSCRIPTIONS_FILE, USER_AGENT, ensure_directories_exist)
+from database.database import close_connections, create_table, expire_unseen, insert_jobs, utc_now
+from database.duplicates import NearDuplicates
+from database.frontier import Frontier, new_owner
+from database.known_ids import KnownIds
+from matching.matching import Matcher, load_subscriptions
+from metrics import metrics
+from notifier.notifier import DiscordNotifier
+from persistence.persistence import JobWriter, write_csv
+from scraper.cache import PageCache
+from scraper.crawler import Crawler, HostPacer
+from scraper.robots import shared_policy
+from scraper.sessions import SessionPool
+from scraper.sites import generate_hashed_id, get_site, registered_sites, search_urls
+from worker.enrichment import Enricher
+from worker.pipeline import run_pipeline
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def generate_hashed_id(job_info):
-    raw_id = f"{job_info.get('jobTitle', '')}|{job_info.get('jobCompany', '')}|{job_info.get('jobLocation', '')}"
-    return sha256(raw_id.encode('utf-8')).hexdigest()
+# Long-lived state, shared by every cycle when running under the scheduler
+_known_ids = None
+_page_cache = None
+_session = None
+_job_writer = None
+_pacer = None
+_near_duplicates = None
+_enricher = None
+_matcher = None
+_matcher_mtime = None
+_frontier = None
+_state_lock = threading.Lock()
 
-def fetch_data(url):
-    # 1. Check for Cookie
-    cookie_value = os.environ.get("JOBSTREET_COOKIE")
-    if not cookie_value:
-        logger.error("❌ CRITICAL: 'JOBSTREET_COOKIE' secret is missing. The bot will be blocked.")
-        # We don't exit here, we try anyway, but expect failure.
-    
-    headers = {
-        'User-Agent': USER_AGENT,
-        'Cookie': cookie_value if cookie_value else '' 
-    }
+STAGE_SECONDS = metrics.histogram('worker_stage_seconds', 'Time spent per stage (crawl, store, discord); asyncio mode overlaps them')
+JOBS_FOUND = metrics.counter('worker_jobs_total', 'Jobs found by a cycle, by outcome (new, known, repost)')
+SEARCH_SECONDS = metrics.histogram('worker_search_seconds', 'Duration of a whole search run, by search', buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+
+def is_blocked(html):
+    # Check for "Verify you are human" (Cloudflare Block)
+    if "challenge-platform" in html or "Verify you are human" in html:
+        logger.error("⛔ BLOCKED: JobStreet is asking for a Captcha. Your Cookie is invalid/expired.")
+        return True
+    return False
+
+def parse_jobs(html):
+    # Pages outside any registered site are read as JobStreet Malaysia
+    return get_site('jobstreet-my').parse(html)
+
+def get_known_ids():
+    # Loaded once, then kept current as new jobs are stored
+    global _known_ids
+    with _state_lock:
+        if _known_ids is None:
+            _known_ids = KnownIds().load()
+        return _known_ids
+
+def get_near_duplicates():
+    global _near_duplicates
+    if not NEAR_DUP_DETECTION:
+        return None
+    with _state_lock:
+        if _near_duplicates is None:
+            _near_duplicates = NearDuplicates().load()
+        return _near_duplicates
+
+def get_session():
+    # One session per cookie in JOBSTREET_COOKIES, rotated, retired on a captcha and saved to data/
+    global _session
+    with _state_lock:
+        if _session is None:
+            _session = SessionPool(is_blocked=is_blocked)
+        return _session
+
+def alert_host_state(host, state):
+    if state['breaker'] == 'open':
+        logger.error(f"🚨 {host} keeps blocking us, paused for {state['paused_for']:.0f}s. Check the cookie.")
+    else:
+        logger.info(f"✅ {host} recovered, crawling at {state['rate']:.2f} requests/s.")
+
+def get_pacer():
+    # Per-host concurrency cap, Crawl-delay spacing, adaptive rate and circuit breaker,
+    # shared by every search running at once; get_pacer().state() shows each host's rate and breaker
+    global _pacer
+    with _state_lock:
+        if _pacer is None:
+            _pacer = HostPacer(on_alert=alert_host_state)
+        return _pacer
+
+def get_page_cache():
+    global _page_cache
+    with _state_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
+
+def get_job_writer():
+    global _job_writer
+    with _state_lock:
+        if _job_writer is None:
+            _job_writer = JobWriter()
+        return _job_writer
+
+def get_enricher():
+    # Detail pages are fetched on background threads, through the crawl's sessions and per-host limits
+    global _enricher
+    if not DETAIL_ENRICHMENT:
+        return None
+    session, pacer = get_session(), get_pacer()
+    with _state_lock:
+        if _enricher is None:
+            _enricher = Enricher(session=session, headers={'User-Agent': USER_AGENT}, is_blocked=is_blocked, pacer=pacer)
+        return _enricher
 
-    logger.info(f"Fetching data from: {url}")
+def close_enricher():
+    # Lets queued detail pages finish, so a one-off run doesn't exit with them half done
+    global _enricher
+    with _state_lock:
+        enricher, _enricher = _enricher, None
+    if enricher is not None:
+        enricher.close()
 
+def get_matcher():
+    # Rebuilt whenever the subscriptions file changes, so edits apply from the next batch
+    global _matcher, _matcher_mtime
     try:
-        response = requests.get(url=url, headers=headers, timeout=10)
-
-        # 2. Check for "Verify you are human" (Cloudflare Block)
-        if "challenge-platform" in response.text or "Verify you are human" in response.text:
-            logger.error("⛔ BLOCKED: JobStreet is asking for a Captcha. Your Cookie is invalid/expired.")
-            return []
-
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, "html.parser")
-            job_listings = soup.select("[data-automation='normalJob']")
-            
-            if not job_listings:
-                logger.warning("⚠️ Access Successful, but NO jobs found. (Check CSS Selectors)")
-                return []
-
-            job_data = []
-            for job in job_listings:
-                try:
-                    job_info = OrderedDict()
-                    
-                    title_elem = job.find('a', {'data-automation': 'jobTitle'})
-                    company_elem = job.find('a', {'data-automation': 'jobCompany'})
-                    loc_elem = job.find_all('a', {'data-automation': 'jobLocation'})
-                    salary_elem = job.find('span', {'data-automation': 'jobSalary'})
-                    date_elem = job.find('span', {'data-automation': 'jobListingDate'})
-
-                    job_info['jobTitle'] = title_elem.get_text(strip=True) if title_elem else "N/A"
-                    job_info['jobCompany'] = company_elem.get_text(strip=True) if company_elem else "N/A"
-                    job_info['jobLocation'] = ", ".join([l.get_text(strip=True) for l in loc_elem]) if loc_elem else "N/A"
-                    
-                    # Safe replace for non-breaking spaces
-                    salary_text = salary_elem.get_text(strip=True) if salary_elem else "Not Specified"
-                    job_info['jobSalary'] = salary_text.replace(u'\xa0', ' ').replace('\\xa', '')
-
-                    if title_elem and title_elem.get('href'):
-                        raw_link = title_elem.get('href')
-                        job_info['jobURL'] = urljoin(BASE_URL, raw_link) if not raw_link.startswith('http') else raw_link
-                    else:
-                        job_info['jobURL'] = "N/A"
-
-                    job_info['uniqueId'] = generate_hashed_id(job_info)
-                    job_data.append(job_info)
-
-                except Exception:
-                    continue
-
-            logger.info(f"✅ Found {len(job_data)} valid jobs.")
-            return job_data
-        else:
-            logger.error(f"❌ Failed to fetch page. Status Code: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"❌ Network Request Error: {e}")
-        return []
+        mtime = os.path.getmtime(SUBSCRIPTIONS_FILE)
+    except OSError:
+        mtime = None
+    with _state_lock:
+        if _matcher is None or mtime != _matcher_mtime:
+            _matcher = Matcher(load_subscriptions(SUBSCRIPTIONS_FILE))
+            _matcher_mtime = mtime
+        return _matcher
+
+def get_frontier():
+    global _frontier
+    with _state_lock:
+        if _frontier is None:
+            _frontier = Frontier().load()
+        return _frontier
+
+def get_robots_policy():
+    # One robots.txt fetch per host per ROBOTS_TTL, shared by every search
+    return shared_policy() if CHECK_ROBOTS else None
+
+def follow_rule(known_ids, stored_this_run=None, cut_short=None):
+    if known_ids is None or not STOP_WHEN_SEEN:
+        return None
+    if stored_this_run is None:
+        rule = known_ids.has_unseen
+    else:
+        def rule(jobs):
+            # Jobs this same run already stored (e.g. from another search URL) still count as new,
+            # so overlapping seeds aren't cut short by each other
+            return any(job['uniqueId'] in stored_this_run for job in jobs) or known_ids.has_unseen(jobs)
+    if cut_short is None:
+        return rule
+
+    def should_follow(jobs):
+        follow = rule(jobs)
+        if not follow:
+            cut_short.set()
+        return follow
+    return should_follow
+
+def crawl_jobs(seed_urls, known_ids=None, cache=None, cut_short=None):
+    start = time.perf_counter()
+    crawler = Crawler(parse=parse_jobs, headers={'User-Agent': USER_AGENT}, session=get_session(), is_blocked=is_blocked,
+                      should_follow=follow_rule(known_ids, cut_short=cut_short), cache=cache, robots=get_robots_policy(),
+                      pacer=get_pacer(), sites=registered_sites(), incomplete=cut_short)
+
+    # The same posting often shows up under several searches; keep the first copy
+    jobs = OrderedDict()
+    for job in crawler.crawl(seed_urls):
+        jobs.setdefault(job['uniqueId'], job)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage='crawl')
+    return list(jobs.values())
+
+def crawl_search(search, seed_urls, known_ids=None, cache=None, cut_short=None):
+    # Each page's jobs are stored before the frontier marks it done, so a run that dies resumes
+    # where it stopped, and workers running the same search split its pages between them
+    frontier = get_frontier()
+    run = frontier.start(search, seed_urls)
+    if run['resumed']:
+        logger.info(f"⏯️ Resuming search '{search}' started at {run['started_at']}.")
+    start = time.perf_counter()
+    stored_this_run = set()
+    crawler = Crawler(parse=parse_jobs, headers={'User-Agent': USER_AGENT}, session=get_session(), is_blocked=is_blocked,
+                      should_follow=follow_rule(known_ids, stored_this_run, cut_short), cache=cache,
+                      robots=get_robots_policy(), pacer=get_pacer(), sites=registered_sites())
+
+    jobs = OrderedDict()
+    new_jobs = []
+    for page_jobs in crawler.crawl_frontier(frontier, search, new_owner()):
+        page_jobs = [job for job in page_jobs if job['uniqueId'] not in jobs]
+        if not page_jobs:
+            continue
+        for job in page_jobs:
+            jobs[job['uniqueId']] = job
+        stored = store_new_jobs(page_jobs, known_ids, search)
+        stored_this_run.update(job['uniqueId'] for job in stored)
+        new_jobs.extend(stored)
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage='crawl')
+
+    if cut_short is not None and cut_short.is_set():
+        frontier.mark_cut_short(search)
+    # None while another worker still holds pages of this run; it closes the run instead
+    return list(jobs.values()), new_jobs, frontier.finish(search)
+
+def store_new_jobs(jobs, known_ids, search=None):
+    with STAGE_SECONDS.time(stage='store'):
+        return _store_new_jobs(jobs, known_ids, search)
+
+def _store_new_jobs(jobs, known_ids, search):
+    # Known jobs are stored too: their changes are logged and they are marked seen by this search
+    new_ids = set(insert_jobs(jobs, search))
+    known_ids.add(new_ids)
+    new_jobs = [job for job in jobs if job['uniqueId'] in new_ids]
+    near_duplicates = get_near_duplicates()
+    if near_duplicates is not None:
+        # Reposts are kept (so they're known next time) but linked to the first copy and not announced
+        reposts = near_duplicates.link(new_jobs)
+        for job in new_jobs:
+            if job['uniqueId'] in reposts:
+                job['canonicalId'] = reposts[job['uniqueId']]
+    # History is appended as each batch is stored, never rewritten
+    try:
+        get_job_writer().write(new_jobs)
+    except OSError as e:
+        logger.error(f"❌ Failed to append job history: {e}")
+    return new_jobs
 
 def save_to_csv(job_data, filename="job_results.csv"):
     if not job_data: return None
     try:
-        file_path = os.path.join(os.getcwd(), filename)
-        keys = job_data[0].keys()
-        with open(file_path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(job_data)
-        return file_path
+        return write_csv(job_data, os.path.join(os.getcwd(), filename))
     except Exception as e:
         logger.error(f"❌ Failed to save CSV: {e}")
         return None
 
-def send_chunk_to_discord(webhook_url, job_chunk, page_num, total_pages, file_path=None):
-    embed = {
-        "title": f"🚀 Job Scraper Report (Page {page_num}/{total_pages})",
-        "color": 3066993,
-        "fields": [],
-        "footer": {"text": "JobStreet Automator"}
-    }
-
-    for job in job_chunk:
-        salary_text = f" • {job['jobSalary']}" if job['jobSalary'] != "Not Specified" else ""
-        field_value = f"🏢 **{job['jobCompany']}**\n📍 {job['jobLocation']}{salary_text}\n[👉 View Job]({job['jobURL']})"
-        
-        embed["fields"].append({
-            "name": f"🔹 {job['jobTitle']}", 
-            "value": field_value,
-            "inline": False
-        })
-
-    payload_dict = {"embeds": [embed]}
+def send_to_discord(file_path, webhook_url, job_data):
+    if not job_data: return
+    with STAGE_SECONDS.time(stage='discord'):
+        failed = DiscordNotifier(webhook_url).send(job_data, file_path)
+    if failed:
+        logger.error(f"❌ {failed} Discord messages failed, queued for the next run.")
+    else:
+        logger.info(f"✅ Sent {len(job_data)} jobs to Discord.")
 
-    try:
-        # Only attach the file on the LAST page
-        if file_path and page_num == total_pages:
-            with open(file_path, "rb") as f:
-                multipart_data = {
-                    "file": (os.path.basename(file_path), f),
-                    "payload_json": (None, json.dumps(payload_dict))
-                }
-                requests.post(webhook_url, files=multipart_data)
+def publish_jobs(jobs, webhook_url):
+    reposts = [job for job in jobs if job.get('canonicalId')]
+    if reposts:
+        JOBS_FOUND.inc(len(reposts), outcome='repost')
+        logger.info(f"🔁 Skipping {len(reposts)} reposts of jobs already announced.")
+        jobs = [job for job in jobs if not job.get('canonicalId')]
+    if not jobs: return
+    csv_path = save_to_csv(jobs)
+    if csv_path:
+        send_to_discord(csv_path, webhook_url, jobs)
+
+def enrich_later(new_jobs):
+    # Queued only once the jobs are announced, so detail pages never hold up an alert
+    enricher = get_enricher()
+    if enricher is not None and new_jobs:
+        enricher.submit([job['uniqueId'] for job in new_jobs])
+
+def notify_subscribers(new_jobs):
+    # One digest per subscriber per batch, however many of their subscriptions a job matches
+    jobs = [job for job in new_jobs if not job.get('canonicalId')]
+    if not jobs: return
+    digests = get_matcher().digests(jobs)
+    # Sent one after another: every notifier shares the failed-message queue file
+    for subscriber, digest in digests.items():
+        if not digest['webhook']:
+            continue
+        title = f"🔔 {len(digest['jobs'])} new jobs for {subscriber}"
+        failed = DiscordNotifier(digest['webhook']).send(digest['jobs'], title=title)
+        if failed:
+            logger.error(f"❌ {failed} messages to {subscriber} failed, queued for the next run.")
         else:
-            requests.post(webhook_url, json=payload_dict)
-            
-        logger.info(f"✅ Sent Page {page_num}/{total_pages} to Discord.")
-        
-    except Exception as e:
-        logger.error(f"❌ Discord Chunk Error: {e}")
+            logger.info(f"🔔 Sent {len(digest['jobs'])} matching jobs to {subscriber}.")
 
-def send_to_discord(file_path, webhook_url, job_data):
-    if not job_data: return
-    CHUNK_SIZE = 10
-    chunks = [job_data[i:i + CHUNK_SIZE] for i in range(0, len(job_data), CHUNK_SIZE)]
-    total_pages = len(chunks)
+def announce_jobs(new_jobs, webhook_url):
+    publish_jobs(new_jobs, webhook_url)
+    notify_subscribers(new_jobs)
+    enrich_later(new_jobs)
+
+def run_scraping_cycle(seed_urls, webhook_url, search=None):
+    known_ids = get_known_ids()
+    cache = get_page_cache()
+    started = utc_now()
+    cut_short = threading.Event()
 
-    logger.info(f"📤 Sending {len(job_data)} jobs in {total_pages} batches...")
+    if PIPELINE_MODE == "asyncio":
+        # Fetch, parse and the DB/CSV/Discord sinks overlap instead of running back to back
+        new_jobs = []
+        stored_this_run = set()
 
-    for i, chunk in enumerate(chunks):
-        send_chunk_to_discord(webhook_url, chunk, i + 1, total_pages, file_path)
-        if i + 1 < total_pages:
-            time.sleep(1)
+        def store_batch(batch):
+            stored = store_new_jobs(batch, known_ids, search)
+            stored_this_run.update(job['uniqueId'] for job in stored)
+            new_jobs.extend(stored)
+
+        jobs = run_pipeline(seed_urls, parse_jobs, headers={'User-Agent': USER_AGENT}, session=get_session(), is_blocked=is_blocked,
+                            should_follow=follow_rule(known_ids, stored_this_run, cut_short), cache=cache,
+                            robots=get_robots_policy(), pacer=get_pacer(), sites=registered_sites(), on_batch=store_batch,
+                            on_complete=lambda _: announce_jobs(new_jobs, webhook_url), incomplete=cut_short)
+        complete = bool(jobs) and not cut_short.is_set()
+    elif FRONTIER_ENABLED and search:
+        jobs, new_jobs, run = crawl_search(search, seed_urls, known_ids, cache, cut_short)
+        announce_jobs(new_jobs, webhook_url)
+        # Judged over the whole run, including pages crawled before a restart or by other workers;
+        # a page dropped after its retries hides whatever jobs were on it
+        complete = run is not None and run['jobs_found'] > 0 and not run['cut_short'] and run['failed'] == 0
+        started = run['started_at'] if run is not None else started
+    else:
+        jobs = crawl_jobs(seed_urls, known_ids, cache, cut_short)
+        new_jobs = store_new_jobs(jobs, known_ids, search)
+        announce_jobs(new_jobs, webhook_url)
+        complete = bool(jobs) and not cut_short.is_set()
+
+    # A job counts as missed only when the run saw every page it could: not when stop-when-seen
+    # cut pagination short or a page was skipped, failed or past CRAWL_MAX_PAGES (all set cut_short),
+    # and not when nothing came back (blocked)
+    if search and complete:
+        expire_unseen(search, started)
+
+    JOBS_FOUND.inc(len(new_jobs), outcome='new')
+    JOBS_FOUND.inc(len(jobs) - len(new_jobs), outcome='known')
+    if not jobs:
+        logger.info("💤 No jobs found this run.")
+    elif not new_jobs:
+        logger.info(f"💤 No new jobs this run ({len(jobs)} already known).")
+    else:
+        logger.info(f"🆕 {len(new_jobs)} new jobs out of {len(jobs)} found.")
+    return new_jobs
+
+def run_summary(snapshot):
+    # One line on where a run's time went, from the change in the metrics over the run
+    total = lambda name, **labels: metrics.total(snapshot, name, **labels)
+    return (f"📊 {total('scraper_responses_total'):.0f} pages ({total('scraper_response_bytes_total') / 1e6:.1f} MB, "
+            f"{total('scraper_cache_hits_total'):.0f} unchanged), {total('scraper_cards_parsed_total'):.0f} jobs read, "
+            f"{total('db_jobs_total', outcome='new'):.0f} new and {total('db_jobs_total', outcome='duplicate'):.0f} duplicate. "
+            f"Time: fetch {total('scraper_fetch_seconds_sum'):.1f}s, parse {total('scraper_parse_seconds_sum'):.2f}s, "
+            f"db {total('db_insert_seconds_sum'):.2f}s, history {total('persistence_write_seconds_sum'):.2f}s, "
+            f"discord {total('worker_stage_seconds_sum', stage='discord'):.1f}s. "
+            f"Errors: {total('scraper_blocked_total'):.0f} blocked ({total('scraper_throttled_total'):.0f} were 429s), "
+            f"{total('scraper_fetch_errors_total'):.0f} fetch, {total('scraper_parse_errors_total'):.0f} parse.")
+
+def run_search(search, webhook_url):
+    # Entry point for the scheduler; session, cache and known ids stay warm between runs
+    logger.info(f"--- Search '{search['name']}' Started ---")
+    before = metrics.REGISTRY.snapshot() if metrics.enabled() else None
+    with SEARCH_SECONDS.time(search=search['name']):
+        run_scraping_cycle(search_urls(search), webhook_url, search['name'])
+    if before is not None:
+        # Searches running at the same time share the registry, so their figures overlap here
+        logger.info(run_summary(metrics.REGISTRY.snapshot(since=before)))
+    logger.info(f"--- Search '{search['name']}' Finished ---")
 
 def start_scraping_worker():
     logger.info("--- Worker Started ---")
@@ -164,18 +375,16 @@ def start_scraping_worker():
         logger.error("❌ FATAL: DISCORD_WEBHOOK is missing. Check GitHub Secrets and YAML file.")
         sys.exit(1) # This forces the GitHub Action to fail Red ❌
 
-    TARGET_URL = "https://my.jobstreet.com/electrical-engineering-intern-jobs/in-Kuala-Lumpur"
-    
-    jobs = fetch_data(TARGET_URL)
-
-    if jobs:
-        csv_path = save_to_csv(jobs)
-        if csv_path:
-            send_to_discord(csv_path, DISCORD_WEBHOOK, jobs)
-    else:
-        logger.info("💤 No jobs found this run.")
+    ensure_directories_exist()
+    create_table()
+    for search in SEARCHES:
+        run_search(search, DISCORD_WEBHOOK)
+    close_enricher()
 
     logger.info("--- Worker Finished ---")
 
 if __name__ == "__main__":
-    start_scraping_worker()
\ No newline at end of file
+    try:
+        start_scraping_worker()
+    finally:
+        close_connections() # Checkpoints the WAL back into jobs.db
\ No newline at end of file